@@ -0,0 +1,227 @@
+# replay/bench.py
+"""Benchmarks headless do pipeline (captura -> disco, busca, decodificação do _tick, exportação).
+
+    python -m replay.bench --out bench.json
+    python -m replay.bench --baseline bench.json --tolerance 0.2   # falha (exit 1) se regredir
+"""
+import argparse, json, os, platform, shutil, sys, tempfile, threading, time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import cv2
+
+from .config import PLAYBACK_FPS, WRITE_FPS, BUFFER_SECONDS
+from .buffer import DiskRingBuffer
+from .encoder import EncodePipeline
+from .export import MultiExportThread, GRID_VIEW
+from .sources import SyntheticSource
+
+# --- utilidades ---
+def _pct(xs, q: float) -> float:
+    return float(np.percentile(np.asarray(xs, dtype=np.float64), q)) if len(xs) else 0.0
+
+def _lat(prefix: str, xs, scale: float = 1000.0, unit: str = "ms") -> Dict[str, float]:
+    return {f"{prefix}.p50_{unit}": round(_pct(xs, 50) * scale, 4),
+            f"{prefix}.p99_{unit}": round(_pct(xs, 99) * scale, 4)}
+
+def _frames(size: Tuple[int, int], n: int, seed: int = 0) -> List[np.ndarray]:
+    src = SyntheticSource(size, realtime=False, seed=seed)
+    return [src.read()[1] for _ in range(n)]
+
+def _timed_writes(ring: DiskRingBuffer) -> List[float]:
+    # mede a latência de cada append no buffer (segmento + índice + remoção)
+    lat: List[float] = []
+    orig = ring.write_jpeg
+    def timed(*a, **k):
+        t = time.perf_counter(); orig(*a, **k); lat.append(time.perf_counter() - t)
+    ring.write_jpeg = timed
+    return lat
+
+def _fill(ring: DiskRingBuffer, frames: List[np.ndarray], n: int, t0: float = 1000.0):
+    # codifica poucos frames distintos e repete os bytes com timestamps novos
+    jpgs = [cv2.imencode(".jpg", f, [int(cv2.IMWRITE_JPEG_QUALITY), ring.jpeg_quality])[1] for f in frames]
+    proxies = [ring.encode_proxy(f) if ring.proxy_every else None for f in frames]
+    size = (frames[0].shape[1], frames[0].shape[0])
+    for i in range(n):
+        k = i % len(jpgs)
+        ring.write_jpeg(jpgs[k], t0 + i / WRITE_FPS, size, proxies[k])
+
+def process_stats() -> Dict[str, Optional[float]]:
+    """RSS de pico e bytes lidos/escritos pelo processo (quando o SO expõe)."""
+    out: Dict[str, Optional[float]] = {"peak_rss_mb": None, "io_read_mb": None, "io_write_mb": None}
+    try:
+        import resource
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        out["peak_rss_mb"] = round(r / (1024.0 * 1024.0) if sys.platform == "darwin" else r / 1024.0, 1)
+    except Exception:
+        pass
+    try:
+        with open("/proc/self/io") as f:
+            kv = dict(line.split(":") for line in f.read().splitlines() if ":" in line)
+        out["io_read_mb"] = round(int(kv["read_bytes"]) / 1e6, 1)
+        out["io_write_mb"] = round(int(kv["write_bytes"]) / 1e6, 1)
+    except Exception:
+        pass
+    return out
+
+# --- cenários ---
+def bench_write(root: str, size, cams: int, seconds: float) -> Dict[str, float]:
+    """Gravação sustentada: N câmeras sintéticas em velocidade máxima -> EncodePipeline -> buffer."""
+    frames = _frames(size, 24)
+    rings = [DiskRingBuffer(f"w{cams}_{i}", WRITE_FPS * BUFFER_SECONDS, root=root) for i in range(cams)]
+    lats = [_timed_writes(r) for r in rings]
+    pipes = [EncodePipeline(r, size=size, name=f"bench{i}-") for i, r in enumerate(rings)]
+    stop = threading.Event()
+    def feed(p: EncodePipeline, seed: int):
+        i = 0; t0 = time.time()
+        while not stop.is_set():
+            while p.depth() >= p.queue_size and not stop.is_set(): time.sleep(0.0005)
+            p.submit(frames[(i + seed) % len(frames)], t0 + i / WRITE_FPS); i += 1
+    ths = [threading.Thread(target=feed, args=(p, k), daemon=True) for k, p in enumerate(pipes)]
+    t0 = time.perf_counter()
+    for th in ths: th.start()
+    time.sleep(seconds)
+    stop.set()
+    for th in ths: th.join()
+    written0 = [p.written for p in pipes]
+    wall = time.perf_counter() - t0
+    for p in pipes: p.close(None)
+    res = {}
+    tag = f"write.{cams}cam"
+    per = [w / wall for w in written0]
+    res[f"{tag}.total_fps"] = round(sum(per), 2)
+    res[f"{tag}.per_cam_fps"] = round(min(per), 2)
+    res[f"{tag}.encode_avg_ms"] = round(float(np.mean([p.stats()["encode_ms_avg"] for p in pipes])), 3)
+    res.update(_lat(tag + ".append", sum(lats, [])))
+    for r in rings: r.close()
+    return res
+
+def bench_lookup(root: str, n_frames: int, queries: int = 20000) -> Dict[str, float]:
+    """nearest/step_from/nearest_many num índice cheio (ex.: 72k frames = 1 h a 20 fps)."""
+    ring = DiskRingBuffer("lookup", n_frames, root=root)
+    ring.proxy_every = 0
+    tiny = _frames((64, 36), 1)
+    _fill(ring, tiny, n_frames)
+    lo, hi = ring.oldest_ts(), ring.latest_ts()
+    qs = np.random.default_rng(1).uniform(lo, hi, queries)
+    res = {"lookup.frames": len(ring)}
+    for name, fn in (("nearest", lambda t: ring.nearest(t)), ("step_from", lambda t: ring.step_from(t, 1))):
+        lat = []
+        for t in qs:
+            a = time.perf_counter(); fn(float(t)); lat.append(time.perf_counter() - a)
+        res.update(_lat(f"lookup.{name}", lat, 1e6, "us"))
+    a = time.perf_counter(); ring.nearest_many(qs[:600]); dt = time.perf_counter() - a
+    res["lookup.nearest_many_600.ms"] = round(dt * 1000.0, 3)
+    ring.close()
+    return res
+
+def bench_tick(root: str, size, seconds: float, pane=(640, 360), ticks: int = 150) -> Dict[str, float]:
+    """Custo do caminho do _tick: decodificação fria (cheia/reduzida/proxy) e reprodução 1x com cache."""
+    ring = DiskRingBuffer("tick", WRITE_FPS * BUFFER_SECONDS, root=root)
+    n = max(20, int(seconds * WRITE_FPS))
+    _fill(ring, _frames(size, 20), n)
+    refs = ring.nearest_many(np.linspace(ring.oldest_ts(), ring.latest_ts(), 40))
+    res = {}
+    for name, kw in (("full", {}), ("pane", {"target": pane}), ("proxy", {"target": pane, "proxy": True})):
+        lat = []
+        for r in refs:
+            a = time.perf_counter(); ring.load_qimage(r, **kw); lat.append(time.perf_counter() - a)
+        res.update(_lat(f"tick.decode_{name}", lat))
+    # reprodução 1x: só o tempo gasto na "thread da GUI" conta
+    ts = ring.oldest_ts(); dt = 1.0 / PLAYBACK_FPS; lat = []
+    for _ in range(ticks):
+        a = time.perf_counter()
+        ref = ring.nearest(ts); ring.get_qimage(ref, pane); ring.prefetch(ts, +1, 1.0, pane)
+        el = time.perf_counter() - a; lat.append(el)
+        time.sleep(max(0.0, dt - el)); ts += dt
+    res.update(_lat("tick.play_1x", lat))
+    st = ring.cache_stats()
+    res["tick.play_1x.cache_hit_ratio"] = round(st["hits"] / max(1, st["hits"] + st["misses"]), 3)
+    ring.close()
+    return res
+
+def bench_export(root: str, size, seconds: float, cams: int = 2) -> Dict[str, float]:
+    """FPS de exportação por view_mode e da exportação completa do Enter (câmeras + grade)."""
+    rings = [DiskRingBuffer(f"exp{i}", WRITE_FPS * BUFFER_SECONDS, root=root) for i in range(cams)]
+    n = max(20, int((seconds + 1) * WRITE_FPS))
+    for i, r in enumerate(rings): _fill(r, _frames(size, 20, seed=i), n)
+    end = min(r.latest_ts() for r in rings); start = end - seconds
+    out = os.path.join(root, "exports"); os.makedirs(out, exist_ok=True)
+    res = {}
+    cases = [(f"cam{i+1}", [(i + 1, f"c{i+1}.mp4")]) for i in range(cams)]
+    cases += [("grid", [(GRID_VIEW, "grid.mp4")]),
+              ("all", [(i + 1, f"a{i+1}.mp4") for i in range(cams)] + [(GRID_VIEW, "agrid.mp4")])]
+    for name, outs in cases:
+        th = MultiExportThread(rings, start, end, [(vm, os.path.join(out, p)) for vm, p in outs], size=size)
+        a = time.perf_counter(); th.run(); wall = time.perf_counter() - a
+        res[f"export.{name}.fps"] = round(th.last_stats.get("frames", 0) / wall, 2) if wall > 0 else 0.0
+    for r in rings: r.close()
+    return res
+
+# --- comparação com baseline ---
+def _direction(key: str) -> int:
+    """+1 = maior é melhor, -1 = menor é melhor, 0 = informativo."""
+    if key.endswith("fps") or key.endswith("ratio"): return +1
+    if key.endswith(("_ms", "_us", ".ms", "_mb")): return -1
+    return 0
+
+def compare(results: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    regressions = []
+    for k, base in baseline.items():
+        cur = results.get(k); d = _direction(k)
+        if d == 0 or not isinstance(base, (int, float)) or not isinstance(cur, (int, float)) or base == 0:
+            continue
+        change = (cur - base) / abs(base) * d
+        if change < -tolerance:
+            regressions.append(f"{k}: {base} -> {cur} ({change*100:+.1f}%)")
+    return regressions
+
+def run(only: List[str], size, cams: int, seconds: float, lookup_frames: int) -> dict:
+    root = tempfile.mkdtemp(prefix="replay-bench-")
+    metrics: Dict[str, float] = {}
+    try:
+        if "write" in only:
+            metrics.update(bench_write(root, size, 1, seconds))
+            if cams > 1: metrics.update(bench_write(root, size, cams, seconds))
+        if "lookup" in only: metrics.update(bench_lookup(root, lookup_frames))
+        if "tick" in only: metrics.update(bench_tick(root, size, seconds))
+        if "export" in only: metrics.update(bench_export(root, size, seconds, cams))
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+    metrics.update({f"process.{k}": v for k, v in process_stats().items() if v is not None})
+    return {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "host": platform.node(),
+            "python": platform.python_version(), "opencv": cv2.__version__, "cpus": os.cpu_count(),
+            "params": {"size": list(size), "cams": cams, "seconds": seconds, "lookup_frames": lookup_frames},
+            "metrics": metrics}
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="dualcam-bench", description=__doc__.split("\n\n")[0])
+    ap.add_argument("--only", default="write,lookup,tick,export", help="cenários separados por vírgula")
+    ap.add_argument("--size", default="1920x1080", help="resolução dos frames sintéticos")
+    ap.add_argument("--cams", type=int, default=2, help="número de câmeras no cenário de gravação")
+    ap.add_argument("--seconds", type=float, default=5.0, help="duração de cada cenário")
+    ap.add_argument("--lookup-frames", type=int, default=WRITE_FPS * BUFFER_SECONDS)
+    ap.add_argument("--out", default=None, help="grava o resultado em JSON")
+    ap.add_argument("--baseline", default=None, help="JSON de uma execução anterior para comparar")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="piora relativa tolerada (0.2 = 20%%)")
+    args = ap.parse_args(argv)
+
+    w, h = (int(x) for x in args.size.lower().split("x"))
+    report = run([s.strip() for s in args.only.split(",") if s.strip()], (w, h), max(1, args.cams),
+                 args.seconds, args.lookup_frames)
+    text = json.dumps(report, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f: f.write(text)
+    print(text)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            base = json.load(f)
+        regressions = compare(report["metrics"], base.get("metrics", base), args.tolerance)
+        if regressions:
+            print("[BENCH] Regressões em relação ao baseline:")
+            for r in regressions: print("  " + r)
+            return 1
+        print("[BENCH] Sem regressões em relação ao baseline.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,122 +1,648 @@
 # replay/buffer.py
 import os, shutil, threading, time
 from dataclasses import dataclass
-from typing import List, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 import numpy as np
 import cv2
 from PySide6 import QtGui
 import atexit
 
-from .config import BUFFER_DIR, JPEG_QUALITY
+from .config import (BUFFER_DIR, PERSIST_BUFFER, JPEG_QUALITY, SEGMENT_SECONDS, WRITE_FPS, PLAYBACK_FPS,
+                     BUFFER_SECONDS, BUFFER_MAX_MB, BUFFER_TOTAL_MB, HOT_BUFFER_MB, HOT_SECONDS, RAM_ONLY,
+                     FRAME_CACHE_MB, PREFETCH_FRAMES, PREFETCH_WORKERS,
+                     PROXY_SIZE, PROXY_EVERY, PROXY_QUALITY)
+from .activity import score as activity_score, thumbnail
+from .cache import FrameCache, FramePool, Prefetcher
+from .index import FrameIndex
+from .journal import IndexJournal
+from .metrics import METRICS
+from .segments import HotArena, MemSegment, Segment
 
 @dataclass
 class DiskFrameRef:
     ts: float
-    path: str
+    seg: int               # id do segmento
+    offset: int            # posição do JPEG dentro do segmento
+    length: int            # tamanho do JPEG em bytes
     size: Tuple[int, int]  # (w, h)
+    proxy: Optional[Tuple[int, int]] = None  # (offset, length) do JPEG reduzido, se houver
+
+    @property
+    def key(self) -> Tuple[int, int]:
+        """Identidade do frame armazenado (chave de cache)."""
+        return (self.seg, self.offset)
+
+class ByteBudget:
+    """Teto de bytes em disco compartilhado por vários buffers (BUFFER_TOTAL_MB).
+
+    Ao estourar, descarta o segmento mais antigo entre todas as câmeras, de modo que
+    a retenção encolhe por igual em vez de sacrificar uma câmera só.
+    """
+    def __init__(self, max_bytes: int = BUFFER_TOTAL_MB * 1024 * 1024):
+        self.max_bytes = max(0, int(max_bytes))
+        self.rings: List["DiskRingBuffer"] = []
+        self._lock = threading.Lock()
+        self.evicted = 0
+
+    def add(self, ring: "DiskRingBuffer"): self.rings.append(ring)
+
+    def used(self) -> int: return sum(r.nbytes for r in self.rings)
+
+    def enforce(self):
+        # chamado fora do lock do buffer; quem já está descartando cobre o excesso dos outros
+        if not self.max_bytes or not self._lock.acquire(blocking=False): return
+        try:
+            while self.used() > self.max_bytes:
+                old = [(ts, r) for r in self.rings for ts in [r.oldest_segment_ts()] if ts is not None]
+                if not old or not min(old, key=lambda o: o[0])[1].drop_oldest(): break
+                self.evicted += 1
+        finally:
+            self._lock.release()
+
+    def projected_seconds(self) -> Optional[float]:
+        """Retenção que o teto comporta na taxa de bytes/s atual de todas as câmeras."""
+        rate = sum(r.byte_rate() for r in self.rings)
+        return self.max_bytes / rate if self.max_bytes and rate > 0 else None
 
 class DiskRingBuffer:
-    """Buffer circular em disco de frames JPEG com índice em memória."""
-    def __init__(self, cam_label: str, capacity: int, jpeg_quality: int = JPEG_QUALITY):
-        self.root = os.path.join(BUFFER_DIR, f"cam_{cam_label}")
+    """Buffer circular em disco: JPEGs anexados a segmentos de duração fixa + índice colunar em memória.
+
+    Só a captura escreve (sob `_lock`); leitores (`nearest`, `step_from`, `latest_ts`,
+    exportação) usam snapshots do índice e nunca bloqueiam o escritor.
+    A retenção é limitada por frames (`capacity`), por tempo (`max_seconds`), por bytes
+    da câmera (`max_bytes`) e, opcionalmente, por um teto compartilhado (`budget`).
+    Com `hot_mb`, os segmentos novos nascem numa arena na RAM e uma thread os grava no
+    disco depois de `hot_seconds`; com `ram_only` eles nunca vão ao disco. No modo
+    persistente a camada quente fica desligada (uma queda perderia a arena).
+    Frames repetidos (`write_dup`) são só uma linha do índice apontando para o último JPEG;
+    cada segmento conta as linhas que usam seus bytes (`refs`) e só é apagado quando
+    nenhuma linha viva aponta para ele, mesmo que sua fatia de tempo já tenha saído.
+    """
+    # seg: segmento com os bytes do JPEG; own: segmento corrente ao gravar (dono da fatia de tempo),
+    # diferente de seg nos repetidos de `write_dup`
+    COLUMNS = {"ts": np.float64, "seg": np.int32, "own": np.int32, "offset": np.int64, "length": np.int32,
+               "w": np.int16, "h": np.int16, "poffset": np.int64, "plength": np.int32, "act": np.float32}
+
+    def __init__(self, cam_label: str, capacity: int, jpeg_quality: int = JPEG_QUALITY,
+                 segment_seconds: float = SEGMENT_SECONDS, root: Optional[str] = None,
+                 persist: bool = PERSIST_BUFFER, max_seconds: float = BUFFER_SECONDS,
+                 max_bytes: int = BUFFER_MAX_MB * 1024 * 1024, budget: Optional[ByteBudget] = None,
+                 hot_mb: int = HOT_BUFFER_MB, hot_seconds: float = HOT_SECONDS, ram_only: bool = RAM_ONLY):
+        self.label = str(cam_label)
+        self.root = os.path.join(root or BUFFER_DIR, f"cam_{cam_label}")
         os.makedirs(self.root, exist_ok=True)
         self.capacity = max(2, int(capacity))
         self.jpeg_quality = int(max(0, min(100, jpeg_quality)))
-        self._frames: List[DiskFrameRef] = []
-        self._lock = threading.RLock()
-        # limpa restos
+        self.segment_seconds = max(1.0, float(segment_seconds))
+        self.proxy_size = tuple(PROXY_SIZE)
+        self.proxy_every = max(0, int(PROXY_EVERY))   # 0 = sem proxy
+        self.max_seconds = max(0.0, float(max_seconds or 0))   # 0 = sem limite de tempo
+        self.max_bytes = max(0, int(max_bytes or 0))           # 0 = sem teto próprio
+        self.budget = budget
+        self.nbytes = 0                   # bytes dos segmentos vivos
+        self._thumb = None                # miniatura do último frame (escore de atividade)
+        self._written = 0
+        self.deduped = 0                  # linhas gravadas sem bytes novos (write_dup)
+        # folga de ~2 segmentos: a remoção é por segmento inteiro
+        slack = int(2 * self.segment_seconds * WRITE_FPS) + 16
+        self._index = FrameIndex(self.capacity + slack, self.COLUMNS)
+        self._segs: Dict[int, Segment] = {}
+        self._seg_order: List[int] = []   # ids do mais antigo ao mais novo
+        self._cur: Optional[Segment] = None
+        self._next_seg = 0
+        self._lock = threading.RLock()    # serializa escritores (não leitores)
+        # frames decodificados para a UI + leitura antecipada
+        self.cache = FrameCache(FRAME_CACHE_MB * 1024 * 1024)
+        self.prefetcher = Prefetcher(self.cache, self._decode_qimage, PREFETCH_WORKERS)
+        self.pool = FramePool()           # destino reaproveitável do resize até o painel
+        self._decode_ms = {False: 0.0, True: 0.0}   # custo médio (EWMA) por frame: cheio/reduzido e proxy
+        # camada quente: segmentos novos na RAM, gravados no disco ao envelhecer
+        if ram_only and hot_mb <= 0: raise ValueError("RAM_ONLY exige HOT_BUFFER_MB > 0")
+        self.ram_only = bool(ram_only)
+        if self.ram_only: persist = False
+        # persistente: o diário só pode citar bytes já no disco, então nada fica na arena
+        if persist and hot_mb > 0:
+            print(f"[BUFFER] cam_{cam_label}: camada quente desligada no modo persistente")
+            hot_mb = 0
+        self.hot_seconds = max(0.0, float(hot_seconds or 0))
+        self.arena: Optional[HotArena] = HotArena(int(hot_mb) * 1024 * 1024) if hot_mb > 0 else None
+        self.spilled = 0
+        self._spill_evt = threading.Event()
+        self._spill_stop = False
+        self._spill_lock = threading.Lock()   # uma passada de spill por vez (thread ou close)
+        if self.arena is not None and not self.ram_only:
+            threading.Thread(target=self._spill_loop, name=f"spill-{self.label}", daemon=True).start()
+        # persistente: reabre o buffer anterior pelo diário; senão limpa restos
+        self.persist = persist
+        self._journal: Optional[IndexJournal] = None
+        if budget is not None: budget.add(self)
+        if persist:
+            self._journal = IndexJournal(os.path.join(self.root, "index.journal"), self.COLUMNS)
+            self._recover()
+            return
         for f in os.listdir(self.root):
             p = os.path.join(self.root, f)
             if os.path.isfile(p):
                 try: os.remove(p)
                 except: pass
 
+    def _recover(self):
+        """Reconstrói índice e segmentos a partir do diário (custo ~ tamanho do diário, não nº de arquivos)."""
+        t0 = time.perf_counter()
+        cols, torn = self._journal.load()
+        # marcas de descarte (seg = -1, length = linhas): a frente do diário já saiu do buffer,
+        # mesmo quando um repetido mantém vivo o arquivo do segmento
+        mark = cols["seg"] < 0
+        gone = int(cols["length"][mark].sum())
+        cols = {k: v[~mark][gone:] for k, v in cols.items()}
+        seg_ids = np.unique(np.concatenate([cols["seg"], cols["own"]]))
+        sizes = np.array([os.path.getsize(self._seg_path(s)) if os.path.isfile(self._seg_path(s)) else -1
+                          for s in seg_ids], dtype=np.int64)
+        size_of = lambda ids: sizes[np.searchsorted(seg_ids, ids)] if len(seg_ids) else np.zeros(0, np.int64)
+        seg_size = size_of(cols["seg"])
+        present = (seg_size >= 0) & (size_of(cols["own"]) >= 0)
+        # ainda sem arquivo na frente: descartados sem marca (queda entre o descarte e a marca)
+        first = int(np.argmax(present)) if present.any() else len(present)
+        cols = {k: v[first:] for k, v in cols.items()}; seg_size = seg_size[first:]; present = present[first:]
+        # só frames cujos bytes chegaram ao disco, em ordem de tempo: o primeiro segmento sem
+        # arquivo (camada quente ainda não gravada) ou incompleto corta o resto do diário
+        end = np.maximum(cols["offset"] + cols["length"], cols["poffset"] + cols["plength"])
+        ok = present & (end <= seg_size)
+        cut = int(np.argmin(ok)) if not ok.all() else len(ok)
+        back = np.flatnonzero((np.diff(cols["ts"][:cut]) < 0) | (np.diff(cols["own"][:cut]) < 0))
+        if len(back): cut = int(back[0]) + 1
+        cols = {k: v[:cut] for k, v in cols.items()}
+        # todo segmento dono de uma fatia viva ou com bytes usados por uma linha viva fica
+        kept = np.unique(np.concatenate([cols["seg"], cols["own"]]))
+        # remove segmentos que o diário não referencia mais (já descartados ou órfãos)
+        for f in os.listdir(self.root):
+            if f.startswith("seg_") and f.endswith(".mjpeg"):
+                try: sid = int(f[4:-6])
+                except ValueError: continue
+                if sid not in kept:
+                    try: os.remove(os.path.join(self.root, f))
+                    except OSError: pass
+        if cut:
+            own = cols["own"]
+            counts = np.bincount(np.searchsorted(kept, own), minlength=len(kept))
+            refs = np.bincount(np.searchsorted(kept, cols["seg"]), minlength=len(kept))
+            firsts = np.searchsorted(own, kept)
+            for sid, n, r, i in zip(kept, counts, refs, firsts):
+                sid = int(sid)
+                self._segs[sid] = Segment.reopen(sid, self._seg_path(sid), float(cols["ts"][min(i, cut - 1)]),
+                                                 int(n), int(r))
+                if n: self._seg_order.append(sid)
+                self.nbytes += self._segs[sid].nbytes
+            self._next_seg = int(kept[-1]) + 1
+            self._index.extend(**cols)
+            self._written = cut
+        self._journal.rewrite(cols)   # já compactado, sem a cauda rasgada
+        if cut or torn:
+            print(f"[BUFFER] {os.path.basename(self.root)}: {cut} frames recuperados "
+                  f"({torn} registros descartados) em {(time.perf_counter() - t0) * 1000:.0f} ms")
+
+    def close(self):
+        """Encerra o pool de prefetch (os arquivos ficam para cleanup_buffer_dir)."""
+        self.prefetcher.shutdown()
+        self.cache.clear()
+        self._spill_stop = True; self._spill_evt.set()
+        with self._lock:
+            if self._cur is not None: self._cur.seal()
+            if self._journal is not None: self._journal.close()
+
     def clear(self):
         with self._lock:
-            for ref in self._frames:
-                try: os.remove(ref.path)
-                except: pass
-            self._frames.clear()
+            self.cache.clear()
+            self._index.clear()
+            for seg in self._segs.values():
+                seg.close()
+            self._segs.clear(); self._seg_order.clear()
+            self._cur = None; self.nbytes = 0
+            if self._journal is not None: self._journal.rewrite({})
 
-    def __len__(self):
-        with self._lock: return len(self._frames)
+    def __len__(self): return len(self._index)
 
     def latest_ts(self) -> Optional[float]:
-        with self._lock:
-            return self._frames[-1].ts if self._frames else None
+        return self._index.read(lambda v: float(v.get("ts", v.n - 1)) if v.n else None)
 
     def oldest_ts(self) -> Optional[float]:
-        with self._lock:
-            return self._frames[0].ts if self._frames else None
+        return self._index.read(lambda v: float(v.get("ts", 0)) if v.n else None)
 
     def write_frame(self, frame_bgr, ts: float):
-        fname = f"{int(ts*1e6)}.jpg"
-        fpath = os.path.join(self.root, fname)
         try:
-            cv2.imwrite(fpath, frame_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
+            ok, buf = cv2.imencode(".jpg", frame_bgr, [int(cv2.IMWRITE_JPEG_QUALITY), self.jpeg_quality])
         except Exception:
             return
+        if not ok: return
         h, w = frame_bgr.shape[:2]
+        proxy = None
+        if self.proxy_every and self._written % self.proxy_every == 0:
+            proxy = self.encode_proxy(frame_bgr)
+        self.write_jpeg(buf, ts, (w, h), proxy, thumbnail(frame_bgr))
+
+    def encode_proxy(self, frame_bgr):
+        """JPEG em baixa resolução (PROXY_SIZE) para navegação rápida."""
+        try:
+            small = cv2.resize(frame_bgr, self.proxy_size, interpolation=cv2.INTER_AREA)
+            ok, buf = cv2.imencode(".jpg", small, [int(cv2.IMWRITE_JPEG_QUALITY), PROXY_QUALITY])
+        except Exception:
+            return None
+        return buf if ok else None
+
+    def write_jpeg(self, data, ts: float, size: Tuple[int, int], proxy=None, thumb=None):
+        """Anexa um JPEG já codificado (e o proxy opcional) ao segmento corrente.
+
+        `thumb` (ver `activity.thumbnail`) dá o escore de atividade contra o frame anterior.
+        """
+        on = METRICS.enabled
         with self._lock:
-            self._frames.append(DiskFrameRef(ts=ts, path=fpath, size=(w, h)))
-            if len(self._frames) > self.capacity:
-                old = self._frames.pop(0)
-                try: os.remove(old.path)
-                except: pass
+            t0 = time.perf_counter() if on else 0.0
+            seg = self._segment_for(ts)
+            try:
+                off = seg.append(data)
+                poff, plen = (seg.append(proxy), len(proxy)) if proxy is not None else (-1, 0)
+            except Exception:
+                return
+            t1 = time.perf_counter() if on else 0.0
+            self._add_row(seg, dict(ts=ts, seg=seg.id, offset=off, length=len(data), w=size[0], h=size[1],
+                                    poffset=poff, plength=plen), thumb)
+            self.nbytes += len(data) + plen
+            t2 = time.perf_counter() if on else 0.0
+            self._evict(ts)
+        if self.budget is not None: self.budget.enforce()
+        if on:
+            METRICS.observe("write", self.label, t1 - t0)
+            METRICS.observe("index", self.label, t2 - t1)
+            METRICS.observe("evict", self.label, time.perf_counter() - t2)
 
-    # --- busca binária por timestamp ---
-    def _bsearch_ts(self, ts: float) -> int:
-        lo, hi = 0, len(self._frames)
-        while lo < hi:
-            mid = (lo + hi)//2
-            if self._frames[mid].ts < ts: lo = mid + 1
-            else: hi = mid
-        return lo
+    def write_dup(self, ts: float, thumb=None) -> bool:
+        """Frame visualmente igual ao último gravado: só uma linha de índice apontando para o
+        mesmo JPEG (e proxy). `nearest`/`step_from`/exportação o veem como um frame qualquer.
 
-    def nearest(self, ts: float) -> Optional[DiskFrameRef]:
+        False se não há frame anterior para repetir (buffer vazio).
+        """
+        on = METRICS.enabled
         with self._lock:
-            n = len(self._frames)
-            if n == 0: return None
-            if ts <= self._frames[0].ts: return self._frames[0]
-            if ts >= self._frames[-1].ts: return self._frames[-1]
-            i = self._bsearch_ts(ts)
-            a, b = self._frames[i-1], self._frames[i]
-            return a if abs(a.ts - ts) <= abs(b.ts - ts) else b
+            t0 = time.perf_counter() if on else 0.0
+            last = self._index.read(lambda v: self._ref(v, v.n - 1) if v.n else None)
+            if last is None or last.seg not in self._segs: return False
+            poff, plen = last.proxy if last.proxy else (-1, 0)
+            # a fatia de tempo avança mesmo sem bytes: a remoção segue por idade
+            owner = self._segment_for(ts)
+            self._add_row(owner, dict(ts=ts, seg=last.seg, offset=last.offset, length=last.length,
+                                      w=last.size[0], h=last.size[1], poffset=poff, plength=plen), thumb)
+            self.deduped += 1
+            t1 = time.perf_counter() if on else 0.0
+            self._evict(ts)
+        if self.budget is not None: self.budget.enforce()
+        if on:
+            METRICS.observe("index", self.label, t1 - t0)
+            METRICS.observe("evict", self.label, time.perf_counter() - t1)
+        return True
 
-    def step_from(self, ts: float, step: int) -> Optional[DiskFrameRef]:
+    def _add_row(self, owner: Segment, row: dict, thumb):
+        act = 0.0
+        if thumb is not None:
+            act = activity_score(self._thumb, thumb); self._thumb = thumb
+        row["act"] = act; row["own"] = owner.id
+        self._index.append(**row)
+        if self._journal is not None: self._journal.append(**row)
+        owner.count += 1; self._segs[row["seg"]].refs += 1
+        self._written += 1
+
+    # --- segmentos ---
+    def _segment_for(self, ts: float) -> Segment:
+        cur = self._cur
+        if cur is not None and ts - cur.start_ts < self.segment_seconds:
+            return cur
+        if cur is not None: cur.seal()
+        sid = self._next_seg; self._next_seg += 1
+        if self.arena is not None:
+            seg = MemSegment(sid, self._seg_path(sid), ts, self.arena)
+            self._spill_evt.set()
+        else:
+            seg = Segment(sid, self._seg_path(sid), ts)
+        self._segs[sid] = seg; self._seg_order.append(sid)
+        self._cur = seg
+        return seg
+
+    def _spill_loop(self):
+        while not self._spill_stop:
+            self._spill_evt.wait(0.5); self._spill_evt.clear()
+            if not self._spill_stop: self._spill_due()
+
+    def _spill_due(self, everything: bool = False) -> int:
+        """Grava no disco os segmentos quentes já selados que passaram de `hot_seconds`
+        (todos, se a arena está apertada ou `everything`), do mais antigo ao mais novo."""
+        n = 0
+        with self._spill_lock:
+            while True:
+                with self._lock: order = [self._segs[s] for s in sorted(self._segs)]
+                latest = self.latest_ts() or 0.0
+                tight = self.arena.free_fraction() < 0.25
+                ends = [b.start_ts for b in order[1:]] + [None]
+                seg = next((a for a, end in zip(order, ends) if getattr(a, "hot", False) and a.sealed
+                            and (everything or tight or (end is not None and latest - end >= self.hot_seconds))), None)
+                if seg is None or not seg.spill(): break
+                n += 1
+            self.spilled += n
+        return n
+
+    def _evict(self, ts: float):
+        # descarta segmentos inteiros (O(1) no índice) enquanto o restante ainda cobre a capacidade
+        # em frames e a janela de tempo, ou enquanto a câmera passa do seu teto de bytes
+        while len(self._seg_order) > 1:
+            old = self._segs[self._seg_order[0]]
+            nxt = self._segs[self._seg_order[1]]
+            if not (len(self._index) - old.count >= self.capacity
+                    or (self.max_seconds and ts - nxt.start_ts >= self.max_seconds)
+                    or (self.max_bytes and self.nbytes > self.max_bytes)
+                    or (self.ram_only and self.arena.free_fraction() < 0.1)): break
+            self._drop(old)
+        # compactação periódica do diário: quando metade dos registros já é de frames descartados;
+        # aqui só o snapshot das colunas, a gravação (CRCs, fsync, troca) roda numa thread
+        j = self._journal
+        if j is not None and not j.compacting and j.records > 2 * len(self._index) + 64:
+            j.compact(self._index.read(lambda v: {k: v.column(k) for k in self.COLUMNS}))
+
+    def _drop(self, old: Segment):
+        # sai a fatia de tempo de `old`; os bytes de cada segmento só saem sem referências vivas
+        segs = self._index.read(lambda v: v.column("seg", 0, min(old.count, v.n)))
+        # marca no diário antes de apagar arquivos: a recuperação pula as linhas descartadas
+        if self._journal is not None: self._journal.append(ts=0.0, seg=-1, own=-1, offset=0, length=len(segs))
+        self._index.pop_front(old.count)
+        self._seg_order.pop(0)
+        ids, n = np.unique(segs, return_counts=True)
+        for sid, k in zip(ids.tolist(), n.tolist()): self._segs[sid].refs -= k
+        for sid in set(ids.tolist()) | {old.id}:
+            seg = self._segs.get(sid)
+            if seg is None or seg.refs > 0 or seg is self._cur or (self._seg_order and sid >= self._seg_order[0]):
+                continue
+            del self._segs[sid]
+            self.nbytes -= seg.nbytes
+            seg.close()
+
+    def oldest_segment_ts(self) -> Optional[float]:
+        """Início do segmento mais antigo que ainda pode ser descartado (o corrente nunca é)."""
+        with self._lock:
+            return self._segs[self._seg_order[0]].start_ts if len(self._seg_order) > 1 else None
+
+    def drop_oldest(self) -> bool:
+        """Descarta o segmento mais antigo (teto compartilhado); False se só resta o corrente."""
         with self._lock:
-            if not self._frames: return None
-            i = self._bsearch_ts(ts)
-            if i == len(self._frames): i -= 1
-            elif i > 0 and abs(self._frames[i].ts - ts) > abs(self._frames[i-1].ts - ts):
+            if len(self._seg_order) <= 1: return False
+            self._drop(self._segs[self._seg_order[0]])
+            return True
+
+    def byte_rate(self) -> float:
+        """Bytes por segundo de vídeo gravado, medido sobre o que está no buffer."""
+        lo, hi = self.oldest_ts(), self.latest_ts()
+        return self.nbytes / (hi - lo) if lo is not None and hi > lo else 0.0
+
+    def retention(self) -> dict:
+        """Retenção real: o que está no buffer agora e a janela que os limites comportam."""
+        lo, hi = self.oldest_ts(), self.latest_ts()
+        span = hi - lo if lo is not None else 0.0
+        n = len(self._index)
+        limits = [self.max_seconds] if self.max_seconds else []
+        if span > 0 and n > 1: limits.append(self.capacity * span / (n - 1))
+        rate = self.nbytes / span if span > 0 else 0.0
+        if self.max_bytes and rate > 0: limits.append(self.max_bytes / rate)
+        if self.ram_only and rate > 0: limits.append(self.arena.max_bytes * 0.9 / rate)
+        shared = self.budget.projected_seconds() if self.budget is not None else None
+        if shared: limits.append(shared)
+        return {"seconds": round(span, 3), "bytes": self.nbytes, "byte_rate": round(rate, 1),
+                "projected_s": round(min(limits), 1) if limits else None}
+
+    def tier_stats(self) -> dict:
+        """Ocupação da camada quente (RAM) e quantos segmentos já foram gravados no disco."""
+        if self.arena is None: return {"tier": "disk"}
+        with self._lock: hot = [s for s in self._segs.values() if getattr(s, "hot", False)]
+        return {"tier": "ram" if self.ram_only else "ram+disk", "hot_segments": len(hot),
+                "hot_bytes": sum(s.nbytes for s in hot), "arena_bytes": self.arena.max_bytes,
+                "arena_free": round(self.arena.free_fraction(), 3), "arena_overflow": self.arena.overflow,
+                "spilled": self.spilled}
+
+    def _seg_path(self, sid: int) -> str:
+        return os.path.join(self.root, f"seg_{int(sid):06d}.mjpeg")
+
+    # --- busca por timestamp (searchsorted sobre snapshot) ---
+    @staticmethod
+    def _ref(v, i: int) -> DiskFrameRef:
+        p = v.phys(i); c = v.cols
+        poff = int(c["poffset"][p])
+        return DiskFrameRef(ts=float(c["ts"][p]), seg=int(c["seg"][p]), offset=int(c["offset"][p]),
+                            length=int(c["length"][p]), size=(int(c["w"][p]), int(c["h"][p])),
+                            proxy=(poff, int(c["plength"][p])) if poff >= 0 else None)
+
+    def nearest(self, ts: float) -> Optional[DiskFrameRef]:
+        def q(v):
+            if v.n == 0: return None
+            return self._ref(v, int(v.nearest("ts", ts)))
+        return self._index.read(q)
+
+    def nearest_many(self, ts_array) -> List[Optional[DiskFrameRef]]:
+        """Versão vetorizada de `nearest` para vários instantes (exportação)."""
+        ts_array = np.asarray(ts_array, dtype=np.float64)
+        def q(v):
+            if v.n == 0: return [None] * len(ts_array)
+            idx = v.nearest("ts", ts_array)
+            uniq = {}
+            return [uniq.setdefault(int(i), self._ref(v, int(i))) for i in idx]
+        return self._index.read(q)
+
+    def step_from(self, ts: float, step: int) -> Optional[DiskFrameRef]:
+        def q(v):
+            if v.n == 0: return None
+            i = int(v.searchsorted("ts", ts))
+            if i == v.n: i -= 1
+            elif i > 0 and abs(v.get("ts", i) - ts) > abs(v.get("ts", i-1) - ts):
                 i -= 1
-            ni = max(0, min(len(self._frames)-1, i + step))
-            return self._frames[ni]
+            return self._ref(v, max(0, min(v.n-1, i + step)))
+        return self._index.read(q)
+
+    # --- numeração absoluta dos frames (linha do tempo conjunta) ---
+    def frame_range(self) -> Tuple[int, int]:
+        """[primeiro, fim) em números absolutos; o número de um frame não muda com a remoção."""
+        return self._index.read(lambda v: (v.base, v.base + v.n))
+
+    def frames_from(self, no: int) -> Tuple[int, np.ndarray]:
+        """(número do primeiro, timestamps) dos frames ainda no buffer com número >= `no`."""
+        def q(v):
+            lo = max(0, int(no) - v.base)
+            return v.base + lo, (v.column("ts", lo) if lo < v.n else np.zeros(0))
+        return self._index.read(q)
+
+    def activity_from(self, no: int) -> Tuple[int, np.ndarray]:
+        """(número do primeiro, escores de atividade) dos frames com número >= `no`."""
+        def q(v):
+            lo = max(0, int(no) - v.base)
+            return v.base + lo, (v.column("act", lo) if lo < v.n else np.zeros(0, np.float32))
+        return self._index.read(q)
+
+    def match_many(self, ts_array) -> Tuple[np.ndarray, np.ndarray]:
+        """Número absoluto e timestamp do frame mais próximo de cada instante (-1/NaN com buffer vazio)."""
+        ts_array = np.asarray(ts_array, dtype=np.float64)
+        def q(v):
+            if v.n == 0: return np.full(len(ts_array), -1, np.int64), np.full(len(ts_array), np.nan)
+            idx = v.nearest("ts", ts_array)
+            return v.base + idx, v.get("ts", idx)
+        return self._index.read(q)
+
+    def refs_by_no(self, nos) -> List[Optional[DiskFrameRef]]:
+        """Refs pelos números absolutos (None se o frame já saiu do buffer)."""
+        def q(v):
+            out, uniq = [], {}
+            for no in nos:
+                i = int(no) - v.base
+                if no < 0 or not 0 <= i < v.n: out.append(None); continue
+                if i not in uniq: uniq[i] = self._ref(v, i)
+                out.append(uniq[i])
+            return out
+        return self._index.read(q)
 
     # --- carregadores ---
-    def load_qimage(self, ref: DiskFrameRef) -> Optional[QtGui.QImage]:
-        if ref is None or not os.path.exists(ref.path): return None
+    def load_jpeg(self, ref: DiskFrameRef, proxy: bool = False, scratch: bool = False):
+        """Bytes JPEG do frame (ou do seu proxy), lidos do segmento via mmap.
+
+        Com `scratch`, devolve uma view do buffer reaproveitável da thread (sem alocar),
+        válida só até a próxima leitura com `scratch` na mesma thread.
+        """
+        if ref is None: return None
+        seg = self._segs.get(ref.seg)
+        if seg is None: return None
+        off, n = ref.proxy if proxy and ref.proxy else (ref.offset, ref.length)
         try:
-            buf = np.fromfile(ref.path, dtype=np.uint8)
-            bgr = cv2.imdecode(buf, cv2.IMREAD_COLOR)
+            if not scratch: return seg.read(off, n)
+            buf = _scratch(n)
+            return buf if seg.read_into(off, n, buf) else None
         except Exception:
-            bgr = cv2.imread(ref.path, cv2.IMREAD_COLOR)
+            return None
+
+    def load_qimage(self, ref: DiskFrameRef, target: Optional[Tuple[int, int]] = None,
+                    proxy: bool = False) -> Optional[QtGui.QImage]:
+        """Decodifica para QImage; `target` (w, h) permite decodificar reduzido, `proxy` usa o JPEG pequeno.
+
+        O QImage (BGR888) aponta direto para o array decodificado, sem conversão nem cópia,
+        e mantém uma referência a ele (ver FramePool).
+        """
+        if ref is None: return None
+        t0 = time.perf_counter() if METRICS.enabled else 0.0
+        bgr = self.load_bgr(ref, *self._tier(ref, target, proxy))
         if bgr is None: return None
-        rgb = cv2.cvtColor(bgr, cv2.COLOR_BGR2RGB)
-        h, w = rgb.shape[:2]
-        qimg = QtGui.QImage(rgb.data, w, h, w*3, QtGui.QImage.Format.Format_RGB888)
-        return qimg.copy()
+        if target:
+            # escala final até o painel aqui (thread de decodificação), num array do pool
+            h, w = bgr.shape[:2]
+            fw, fh = fit_size((w, h), target)
+            if (fw, fh) != (w, h):
+                out = self.pool.acquire((fh, fw, 3))
+                cv2.resize(bgr, (fw, fh), dst=out, interpolation=cv2.INTER_AREA if fw < w else cv2.INTER_LINEAR)
+                bgr = out
+        h, w = bgr.shape[:2]
+        if t0: METRICS.observe("decode", self.label, time.perf_counter() - t0)
+        return QtGui.QImage(bgr.data, w, h, bgr.strides[0], QtGui.QImage.Format.Format_BGR888)
+
+    def _tier(self, ref: DiskFrameRef, target, proxy: bool) -> Tuple[int, bool]:
+        # (fator de redução JPEG, usa proxy); sem proxy gravado, reduz até o tamanho do proxy
+        if proxy:
+            if ref.proxy: return 1, True
+            return max(reduce_for(ref.size, target), reduce_for(ref.size, self.proxy_size)), False
+        return reduce_for(ref.size, target), False
+
+    # --- cache de frames decodificados (UI) ---
+    def _decode_qimage(self, ref: DiskFrameRef, target=None, proxy: bool = False):
+        t0 = time.perf_counter()
+        img = self.load_qimage(ref, target, proxy)
+        ms = (time.perf_counter() - t0) * 1000.0
+        prev = self._decode_ms[bool(proxy)]
+        self._decode_ms[bool(proxy)] = ms if prev <= 0 else prev + 0.2 * (ms - prev)
+        return img, (img.sizeInBytes() if img is not None else 0)
+
+    def decode_ms(self, proxy: bool = False) -> float:
+        """Custo médio medido de decodificar um frame para a UI (0 enquanto não houve nenhum)."""
+        return self._decode_ms[bool(proxy)]
+
+    def frame_key(self, ref: DiskFrameRef, target=None, proxy: bool = False):
+        """Identidade da imagem que `get_qimage` devolve (frame, nível de decodificação, tamanho)."""
+        return (ref.key, self._tier(ref, target, proxy), tuple(target) if target else None)
+
+    def request_qimage(self, ref: Optional[DiskFrameRef], target=None, proxy: bool = False):
+        """Agenda a decodificação sem bloquear (faltas de várias câmeras decodificam em paralelo)."""
+        if ref is None: return
+        self.prefetcher.submit(self.frame_key(ref, target, proxy), ref, target, proxy)
+
+    def get_qimage(self, ref: DiskFrameRef, target: Optional[Tuple[int, int]] = None,
+                   proxy: bool = False, timeout: Optional[float] = None) -> Optional[QtGui.QImage]:
+        """`load_qimage` com cache LRU; reaproveita decodificações já em curso no prefetch.
 
-    def load_bgr(self, ref: DiskFrameRef):
-        if ref is None or not os.path.exists(ref.path): return None
+        Com `timeout` (s) não decodifica na thread chamadora: devolve None se o frame não
+        ficou pronto no prazo (a decodificação continua e o próximo tick o encontra no cache).
+        """
+        if ref is None: return None
+        key = self.frame_key(ref, target, proxy)
+        img = self.cache.get(key)
+        if img is not None: return img
+        img = self.prefetcher.wait(key, timeout)
+        if img is not None or timeout is not None: return img
+        img, nb = self._decode_qimage(ref, target, proxy)
+        self.cache.put(key, img, nb)
+        return img
+
+    def prefetch(self, ts: float, direction: int, speed: float, target: Optional[Tuple[int, int]] = None,
+                 proxy: bool = False, fps: float = PLAYBACK_FPS, ahead: int = PREFETCH_FRAMES):
+        """Agenda a decodificação dos frames que os próximos `ahead` ticks vão pedir."""
+        step = direction * max(1e-3, speed) / max(1.0, fps)
+        seen = set()
+        for ref in self.nearest_many(ts + step * np.arange(1, ahead + 1)):
+            if ref is None or ref.key in seen: continue
+            seen.add(ref.key)
+            self.prefetcher.submit(self.frame_key(ref, target, proxy), ref, target, proxy)
+
+    def cache_stats(self) -> dict:
+        st = self.cache.stats()
+        pf = self.prefetcher
+        st.update(prefetch_scheduled=pf.scheduled, prefetch_inflight=pf.inflight(),
+                  prefetch_lag=pf.lag, prefetch_lag_ms=round(pf.lag_wait * 1000.0, 1))
+        st.update(self.pool.stats())
+        return st
+
+    def load_bgr(self, ref: DiskFrameRef, reduce: int = 1, proxy: bool = False):
+        data = self.load_jpeg(ref, proxy, scratch=True)
+        if data is None: return None
         try:
-            buf = np.fromfile(ref.path, dtype=np.uint8)
-            return cv2.imdecode(buf, cv2.IMREAD_COLOR)
+            return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), _IMREAD_REDUCED.get(reduce, cv2.IMREAD_COLOR))
         except Exception:
-            return cv2.imread(ref.path, cv2.IMREAD_COLOR)
+            return None
+
+_IMREAD_REDUCED = {1: cv2.IMREAD_COLOR, 2: cv2.IMREAD_REDUCED_COLOR_2,
+                   4: cv2.IMREAD_REDUCED_COLOR_4, 8: cv2.IMREAD_REDUCED_COLOR_8}
+
+def reduce_for(size: Tuple[int, int], target: Optional[Tuple[int, int]]) -> int:
+    """Maior fator de decodificação reduzida (1/2/4/8) cuja imagem ainda cobre `target` (w, h)."""
+    if not target or target[0] <= 0 or target[1] <= 0: return 1
+    s = min(target[0] / size[0], target[1] / size[1])   # escala de exibição (KeepAspectRatio)
+    r = 1
+    while r < 8 and 2 * r * s <= 1.0: r *= 2
+    return r
+
+_tls = threading.local()
+
+def _scratch(n: int) -> memoryview:
+    """Buffer de bytes reaproveitável por thread (cresce só quando um JPEG maior aparece)."""
+    buf = getattr(_tls, "buf", None)
+    if buf is None or len(buf) < n:
+        buf = _tls.buf = bytearray(max(n, 2 * len(buf) if buf is not None else 1 << 20))
+    return memoryview(buf)[:n]
+
+def fit_size(size: Tuple[int, int], target: Tuple[int, int]) -> Tuple[int, int]:
+    """Maior (w, h) com o aspecto de `size` que cabe em `target` (KeepAspectRatio)."""
+    s = min(target[0] / size[0], target[1] / size[1])
+    return max(1, int(size[0] * s)), max(1, int(size[1] * s))
 
 # --- limpeza do diretório inteiro ---
-def cleanup_buffer_dir():
+def cleanup_buffer_dir(force: bool = False):
+    """Apaga o diretório do buffer (não faz nada em modo persistente, salvo `force`)."""
+    if PERSIST_BUFFER and not force: return
     try:
         if os.path.isdir(BUFFER_DIR):
             shutil.rmtree(BUFFER_DIR, ignore_errors=False)
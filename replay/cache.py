@@ -0,0 +1,134 @@
+# replay/cache.py
+import sys, threading, time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+
+class FrameCache:
+    """LRU de frames decodificados com teto de memória em bytes."""
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max(0, int(max_bytes))
+        self._d: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            item = self._d.get(key)
+            if item is None:
+                self.misses += 1; return None
+            self._d.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def __contains__(self, key):
+        with self._lock: return key in self._d
+
+    def put(self, key, value, nbytes: int):
+        if value is None or nbytes > self.max_bytes: return
+        with self._lock:
+            old = self._d.pop(key, None)
+            if old is not None: self._bytes -= old[1]
+            self._d[key] = (value, nbytes); self._bytes += nbytes
+            while self._bytes > self.max_bytes and self._d:
+                _, (_, nb) = self._d.popitem(last=False)
+                self._bytes -= nb
+
+    def clear(self):
+        with self._lock:
+            self._d.clear(); self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._d), "bytes": self._bytes, "max_bytes": self.max_bytes,
+                    "hits": self.hits, "misses": self.misses}
+
+class Prefetcher:
+    """Decodifica frames futuros num pool pequeno e deposita no FrameCache."""
+    def __init__(self, cache: FrameCache, decode: Callable, workers: int = 2):
+        self.cache = cache
+        self._decode = decode            # decode(*args) -> (valor, nbytes)
+        self.workers = max(1, int(workers))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._inflight: Dict[Hashable, Future] = {}
+        self._lock = threading.Lock()
+        self.scheduled = 0
+        self.lag = 0                     # frames pedidos pela UI ainda em decodificação
+        self.lag_wait = 0.0              # tempo total esperando esses frames (s)
+
+    def _job(self, key, args):
+        try:
+            val, nb = self._decode(*args)
+            self.cache.put(key, val, nb)
+            return val
+        finally:
+            with self._lock: self._inflight.pop(key, None)
+
+    def submit(self, key, *args):
+        if key in self.cache: return
+        with self._lock:
+            if key in self._inflight: return
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="prefetch")
+            self._inflight[key] = self._pool.submit(self._job, key, args)
+            self.scheduled += 1
+
+    def wait(self, key, timeout: Optional[float] = None):
+        """Se o frame já está sendo decodificado, espera por ele (até `timeout` s) em vez de decodificar de novo."""
+        with self._lock: fut = self._inflight.get(key)
+        if fut is None: return None
+        t0 = time.perf_counter()
+        try: val = fut.result(timeout)
+        except Exception: val = None   # inclui o prazo esgotado: a decodificação segue no pool
+        self.lag += 1; self.lag_wait += time.perf_counter() - t0
+        return val
+
+    def inflight(self) -> int:
+        with self._lock: return len(self._inflight)
+
+    def shutdown(self):
+        with self._lock: pool, self._pool = self._pool, None
+        if pool is not None: pool.shutdown(wait=False, cancel_futures=True)
+
+class FramePool:
+    """Arrays de frame reaproveitáveis por forma (decodificação sem alocação em regime).
+
+    Propriedade: um array só é entregue de novo quando ninguém além do pool o referencia.
+    O QImage criado sobre ele guarda uma referência, assim como o cache e o painel que o
+    exibe; enquanto qualquer um deles existir o array não é sobrescrito.
+    """
+    _FREE_REFS = 3   # lista do pool + variável do laço + argumento de getrefcount
+
+    def __init__(self, per_shape: int = 256, shapes: int = 4):
+        self.per_shape = per_shape
+        self.shapes = shapes
+        self._arrays: "OrderedDict[Tuple[int, ...], List[np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.allocated = 0
+        self.reused = 0
+
+    def acquire(self, shape: Tuple[int, ...]) -> np.ndarray:
+        with self._lock:
+            lst = self._arrays.get(shape)
+            if lst is None:
+                lst = self._arrays[shape] = []
+                # tamanho de painel mudou: formas antigas deixam o pool (liberadas quando soltas)
+                while len(self._arrays) > self.shapes: self._arrays.popitem(last=False)
+            else:
+                self._arrays.move_to_end(shape)
+            for a in lst:
+                if sys.getrefcount(a) <= self._FREE_REFS:
+                    self.reused += 1
+                    return a
+            a = np.empty(shape, dtype=np.uint8)
+            self.allocated += 1
+            if len(lst) < self.per_shape: lst.append(a)
+            return a
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pool_arrays": sum(len(v) for v in self._arrays.values()),
+                    "pool_allocated": self.allocated, "pool_reused": self.reused}
@@ -1,52 +1,161 @@
 # replay/capture.py
-import time, os
-from typing import List
-import cv2
+import threading, time
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple, Union
+import numpy as np
 from PySide6 import QtCore
-from .config import CAPTURE_SIZE, WRITE_FPS, SCAN_RANGE
+from .config import WRITE_FPS, CAPTURE_SYNC
+from .encoder import EncodePipeline
+from .metrics import METRICS
+from .sources import FrameSource, open_source
 
-class CaptureWriterThread(QtCore.QThread):
-    """Captura frames e grava no DiskRingBuffer no ritmo WRITE_FPS."""
-    def __init__(self, cam_index: int, ring, parent=None):
-        super().__init__(parent)
-        self.cam_index = cam_index
+class _CamState:
+    """Estado de agendamento e contadores de uma câmera dentro do CaptureScheduler."""
+    def __init__(self, source, ring):
+        self.source = open_source(source)
+        self.label = source if isinstance(source, (int, str)) else str(self.source)
         self.ring = ring
+        self.pipeline: Optional[EncodePipeline] = None
+        self.alive = False
+        self.next_write: Optional[float] = None
+        self.grabbed = 0          # grabs bem-sucedidos (fila do driver drenada)
+        self.retrieved = 0        # frames decodificados e enviados ao pipeline
+        self.skipped = 0          # grabs descartados sem retrieve (fora da cadência WRITE_FPS)
+        self.failed = 0           # grab/retrieve sem frame
+        self._lock = threading.Lock()
+        self._written_ts: Deque[float] = deque(maxlen=2 * WRITE_FPS + 1)   # ~2 s de janela
+
+    def mark(self, ts: float):
+        with self._lock: self._written_ts.append(ts)
+
+    def stats(self) -> dict:
+        with self._lock: w = np.asarray(self._written_ts, dtype=np.float64)
+        d = np.diff(w) if len(w) > 1 else np.zeros(0)
+        st = {"source": str(self.source), "grabbed": self.grabbed, "retrieved": self.retrieved,
+              "skipped": self.skipped, "grab_failed": self.failed,
+              "effective_fps": round((len(w) - 1) / (w[-1] - w[0]), 2) if len(w) > 1 and w[-1] > w[0] else 0.0,
+              "jitter_ms": round(float(d.std()) * 1000.0, 2) if len(d) else 0.0,
+              "interval_ms_max": round(float(d.max()) * 1000.0, 2) if len(d) else 0.0}
+        if self.pipeline: st.update(self.pipeline.stats())
+        return st
+
+class CaptureScheduler(QtCore.QThread):
+    """Agenda grab/retrieve de uma ou mais câmeras no ritmo WRITE_FPS.
+
+    A cada volta faz `grab()` de todas as câmeras em sequência (drena a fila do driver e
+    deixa os timestamps próximos entre câmeras) e só então `retrieve()` das que têm frame
+    a gravar; o resto é descartado sem decodificar. Resize + JPEG ficam no EncodePipeline.
+    O ritmo vem do próprio grab (bloqueante em câmeras e fontes em tempo real); o fps de
+    gravação de cada câmera pode ser reduzido pelo controle adaptativo do seu pipeline.
+    """
+    def __init__(self, sources: Sequence[Union[int, str, FrameSource]], rings: Sequence, parent=None):
+        super().__init__(parent)
+        self.cams = [_CamState(src, ring) for src, ring in zip(sources, rings)]
         self._running = True
+        self.rounds = 0
+        self._skew_sum = 0.0; self._skew_max = 0.0; self._skew_n = 0
 
     def stop(self): self._running = False
 
-    def run(self):
-        cap = cv2.VideoCapture(self.cam_index, cv2.CAP_DSHOW)
-        cap.set(cv2.CAP_PROP_FRAME_WIDTH, CAPTURE_SIZE[0])
-        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, CAPTURE_SIZE[1])
-        if not cap.isOpened():
-            print(f"[Cam {self.cam_index}] Não abriu.")
-            return
+    def stats(self) -> List[dict]:
+        """Por câmera: fps efetivo, grabs descartados, jitter do intervalo gravado e fila de codificação."""
+        skew = {"sync_skew_ms_avg": round(self._skew_sum / self._skew_n * 1000.0, 2) if self._skew_n else 0.0,
+                "sync_skew_ms_max": round(self._skew_max * 1000.0, 2)}
+        return [dict(c.stats(), **(skew if len(self.cams) > 1 else {})) for c in self.cams]
 
-        frame_period = 1.0 / WRITE_FPS
-        next_write = time.time()
+    def run(self):
+        for c in self.cams:
+            c.alive = c.source.open()
+            if not c.alive:
+                print(f"[Cam {c.label}] Não abriu.")
+                c.source.release(); continue
+            c.pipeline = EncodePipeline(c.ring, name=f"{c.label}-")
 
         while self._running:
-            ok, frame = cap.read()
-            ts = time.time()
-            if not ok or frame is None:
-                time.sleep(0.01); continue
-            if (frame.shape[1], frame.shape[0]) != CAPTURE_SIZE:
-                frame = cv2.resize(frame, CAPTURE_SIZE, interpolation=cv2.INTER_AREA)
-            if ts >= next_write:
-                self.ring.write_frame(frame, ts)
-                next_write += frame_period
-            time.sleep(0.001)
-        cap.release()
-
-class CameraScanWorker(QtCore.QThread):
-    scanned = QtCore.Signal(list)  # list[int]
-    def run(self):
-        found: List[int] = []
-        for idx in range(SCAN_RANGE):
-            cap = cv2.VideoCapture(idx, cv2.CAP_DSHOW)
-            ok = cap.isOpened()
-            if ok: ok, _ = cap.read()
-            if ok: found.append(idx)
-            cap.release()
-        self.scanned.emit(found)
+            live = [c for c in self.cams if c.alive]
+            if not live: break
+            # 1) grab de todas em sequência: só avança o driver, sem decodificar
+            on = METRICS.enabled
+            grabs = []
+            for c in live:
+                t0 = time.perf_counter() if on else 0.0
+                ok = c.source.grab()
+                if t0: METRICS.observe("grab", c.ring.label, time.perf_counter() - t0)
+                grabs.append((c, ok, c.source.ts))
+            self.rounds += 1
+            if len(grabs) > 1:
+                tss = [ts for _, ok, ts in grabs if ok]
+                if len(tss) > 1:
+                    sk = max(tss) - min(tss)
+                    self._skew_sum += sk; self._skew_n += 1; self._skew_max = max(self._skew_max, sk)
+            # 2) retrieve só de quem vai gravar
+            any_ok = False
+            for c, ok, ts in grabs:
+                if not ok:
+                    c.failed += 1
+                    if c.source.finished: c.alive = False
+                    continue
+                any_ok = True; c.grabbed += 1
+                if c.next_write is None: c.next_write = ts
+                if ts < c.next_write:
+                    c.skipped += 1; continue
+                t0 = time.perf_counter() if on else 0.0
+                ok, frame = c.source.retrieve()
+                if t0: METRICS.observe("retrieve", c.ring.label, time.perf_counter() - t0)
+                if not ok or frame is None:
+                    c.failed += 1; continue
+                c.pipeline.submit(frame, ts)
+                c.retrieved += 1; c.mark(ts)
+                period = 1.0 / c.pipeline.write_fps
+                c.next_write += period
+                # depois de uma parada, realinha a cadência em vez de gravar em rajada
+                if c.next_write <= ts: c.next_write = ts + period
+            if not any_ok: time.sleep(0.01)
+
+        for c in self.cams:
+            c.source.release()
+            if c.pipeline: c.pipeline.close()
+
+class CaptureWriterThread(CaptureScheduler):
+    """Captura de uma única câmera (thread própria); ver CaptureScheduler.
+
+    `source` é um índice de câmera, uma especificação de fonte (ver `open_source`) ou um FrameSource.
+    """
+    def __init__(self, source: Union[int, str, FrameSource], ring, parent=None):
+        super().__init__([source], [ring], parent)
+        self.source = self.cams[0].source
+        self.cam_index = self.cams[0].label
+        self.ring = ring
+
+    @property
+    def pipeline(self) -> Optional[EncodePipeline]: return self.cams[0].pipeline
+
+    def stats(self) -> dict:
+        return super().stats()[0]
+
+def start_capture(sources: Sequence, rings: Sequence, sync: bool = CAPTURE_SYNC) -> List[CaptureScheduler]:
+    """Cria e inicia as threads de captura: uma para todas as câmeras (sync) ou uma por câmera."""
+    if sync and len(sources) > 1:
+        threads: List[CaptureScheduler] = [CaptureScheduler(sources, rings)]
+    else:
+        threads = [CaptureWriterThread(src, ring) for src, ring in zip(sources, rings)]
+    for th in threads: th.start()
+    return threads
+
+def capture_stats(threads: Sequence[CaptureScheduler]) -> List[dict]:
+    """Estatísticas por câmera, na ordem das câmeras, de uma lista de threads de captura."""
+    out: List[dict] = []
+    for th in threads:
+        st = th.stats()
+        out.extend(st if isinstance(st, list) else [st])
+    return out
+
+def capture_load(threads: Sequence[CaptureScheduler]) -> Tuple[float, int]:
+    """Pressão na captura: maior ocupação (0..1) das filas de codificação e total de frames descartados."""
+    frac, dropped = 0.0, 0
+    for th in threads:
+        for c in th.cams:
+            p = c.pipeline
+            if p is None: continue
+            frac = max(frac, p.depth() / p.queue_size); dropped += p.dropped
+    return frac, dropped
@@ -6,16 +6,75 @@ BUFFER_SECONDS = 60 * 60          # 1 hora
 WRITE_FPS = 20                    # gravação do buffer (por câmera)
 PLAYBACK_FPS = 30                 # FPS da UI e exportação
 JPEG_QUALITY = 80                 # 0..100
+SEGMENT_SECONDS = 30              # duração de cada arquivo de segmento do buffer
 CAPTURE_SIZE = (1920, 1080)       # 1080p
 DEFAULT_CAM_INDEXES = [0, 1]
 SCAN_RANGE = 11                   # varrer 0..10
+SCAN_TIMEOUT = 3.0                # s de prazo da varredura (câmeras testadas em paralelo)
+PERSIST_BUFFER = False            # mantém o buffer entre execuções (diário do índice + recuperação)
+SYNTH_FPS = 30                    # FPS padrão das fontes sintéticas / sequências de imagens
+CAPTURE_SYNC = True               # uma thread para todas as câmeras: grab em sequência, retrieve depois
+BUFFER_MAX_MB = 0                 # teto de disco por câmera (0 = sem teto; só BUFFER_SECONDS)
+BUFFER_TOTAL_MB = 0               # teto de disco somando todas as câmeras (0 = sem teto)
+HOT_BUFFER_MB = 0                 # camada quente na RAM por câmera (0 = só disco; ignorada com PERSIST_BUFFER)
+HOT_SECONDS = 120                 # idade a partir da qual um segmento vai da RAM para o disco
+RAM_ONLY = False                  # buffer inteiro na RAM (retenção limitada por HOT_BUFFER_MB)
+
+# --- codificação (captura) ---
+ENCODE_WORKERS = 2                # threads de resize+JPEG por câmera
+ENCODE_QUEUE = 8                  # frames aguardando codificação (fila limitada)
+OVERFLOW_POLICY = "drop_oldest"   # "drop_oldest" | "drop_newest" | "quality"
+ENCODE_MIN_QUALITY = 50           # piso de qualidade na política "quality" e no controle adaptativo
+ADAPTIVE_ENCODE = True            # baixa qualidade/fps de gravação sob pressão de E/S e sobe com folga
+ADAPT_WRITE_MS = 25               # latência média de gravação (ms) considerada pressão
+ADAPT_QUEUE_FRAC = 0.5            # fração da fila de codificação considerada pressão
+ADAPT_MIN_FPS = 5                 # piso do fps de gravação no controle adaptativo
+ADAPT_WINDOW = 1.0                # s entre decisões do controle adaptativo
+DEDUP_THRESHOLD = 4.0             # maior diferença por pixel (0..255) da miniatura para o frame repetir o anterior (0 = desliga)
+DEDUP_MAX_SECONDS = 10.0          # grava um JPEG novo pelo menos a cada N s mesmo em cena parada
+
+# --- reprodução ---
+FRAME_CACHE_MB = 256              # cache LRU de frames decodificados (por câmera)
+PREFETCH_FRAMES = 12              # ticks à frente decodificados em segundo plano
+PREFETCH_WORKERS = 2              # threads de decodificação antecipada (por câmera)
+SHUTTLE_SPEEDS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0)   # degraus do shuttle (J/L), nos dois sentidos
+PLAYBACK_DECODE_BUDGET_MS = 16    # ms de decodificação por tick (soma das câmeras); acima disso proxy e dizimação (0 = sem orçamento)
+PLAYBACK_MIN_FPS = 5              # piso de frames novos por segundo quando o orçamento não basta
+PROXY_SIZE = (480, 270)           # JPEG reduzido gravado junto do frame (navegação)
+PROXY_EVERY = 1                   # proxy a cada N frames (0 = desliga)
+PROXY_QUALITY = 70
+TIMELINE_SETTLE = 1.0             # s até casar um frame de referência sem esperar as outras câmeras
+DRIFT_WINDOW = 10.0               # janela (s) das estatísticas de desvio entre câmeras
+DRIFT_WARN_MS = 50                # desvio médio que marca uma câmera como atrasada/adiantada
+ACTIVITY_THUMB = (64, 36)         # miniatura em cinza do escore de atividade (captura)
+ACTIVITY_THRESHOLD = 6.0          # escore (diferença média 0..255) que marca um evento ([ / ])
+
+# --- servidor de replay (rede local) ---
+SERVER_HOST = "0.0.0.0"           # interface do servidor HTTP/WebSocket
+SERVER_PORT = 0                   # porta (0 = desligado; também --serve PORTA)
+SERVER_FPS = 30                   # ritmo máximo dos streams por cliente
+SERVER_BACKLOG_KB = 512           # bytes pendentes no socket acima dos quais o cliente perde frames
+
+# --- instrumentação ---
+METRICS_ENABLED = False           # histogramas de latência por etapa (overlay: tecla I)
+METRICS_DUMP_SECONDS = 10         # intervalo do dump JSON/Prometheus (--metrics ARQUIVO)
 
 # --- paths ---
 ROOT = os.path.abspath(os.path.dirname(__file__))
 BUFFER_DIR = os.path.join(ROOT, "buffer_jpeg")
 EXPORT_DIR = os.path.join(ROOT, "exports")
+SCAN_CACHE = os.path.join(ROOT, "cameras.json")   # câmeras da última varredura e última seleção
 
 # --- exportação ---
 EXPORT_SIZE = (1920, 1080)
 FOURCC_MP4 = "mp4v"               # tenta MP4
 FOURCC_AVI = "MJPG"               # fallback AVI
+EXPORT_PASSTHROUGH = True         # cam1/cam2: copia os JPEGs do buffer para AVI MJPEG (sem recodificar)
+ROLLING_EXPORT = False            # mantém a grade dos últimos ROLLING_SECONDS já codificada (Enter instantâneo)
+ROLLING_SECONDS = 30              # janela pré-codificada (cobre o clipe de 20 s)
+ROLLING_CHUNK_SECONDS = 1.0       # duração de cada bloco pré-codificado
+EXPORT_MAX_JOBS = 1               # exportações simultâneas; as demais esperam na fila
+EXPORT_THROTTLE = True            # exportação recua quando a captura ou o tick da UI estão sob pressão
+EXPORT_QUEUE_FRAC = 0.5           # ocupação da fila de codificação da captura considerada pressão
+EXPORT_TICK_MS = 25               # latência do tick da UI (atraso do timer + trabalho) considerada pressão
+EXPORT_MAX_DELAY = 0.25           # s máximos de espera por frame exportado sob pressão
@@ -0,0 +1,100 @@
+# replay/discovery.py
+import json, os, threading, time
+from typing import Callable, Dict, List, Optional, Sequence
+from PySide6 import QtCore
+from .config import SCAN_RANGE, SCAN_TIMEOUT, SCAN_CACHE
+
+# OpenCV só é importado dentro das sondagens: o diálogo de câmeras abre antes dele carregar
+
+def probe_device(index: int) -> Optional[dict]:
+    """Abre a câmera, lê um frame e devolve suas capacidades (None se não respondeu)."""
+    import cv2
+    from .sources import DeviceSource
+    t0 = time.perf_counter()
+    src = DeviceSource(index)
+    try:
+        if not src.open(): return None
+        ok, frame = src.read()
+        if not ok or frame is None: return None
+        fps = src.cap.get(cv2.CAP_PROP_FPS)
+        return {"index": int(index), "width": int(frame.shape[1]), "height": int(frame.shape[0]),
+                "fps": round(float(fps), 2) if fps and fps > 0 else None,
+                "probe_ms": round((time.perf_counter() - t0) * 1000.0, 1)}
+    except Exception:
+        return None
+    finally:
+        try: src.release()
+        except Exception: pass
+
+def scan_devices(indexes: Optional[Sequence[int]] = None, timeout: float = SCAN_TIMEOUT,
+                 on_found: Optional[Callable[[dict], None]] = None,
+                 probe: Callable[[int], Optional[dict]] = probe_device) -> List[dict]:
+    """Testa todas as câmeras ao mesmo tempo, cada uma com até `timeout` segundos.
+
+    Um backend travado não segura a varredura: a thread dele (daemon) é abandonada e o
+    dispositivo conta como ausente. `on_found(info)` é chamado assim que cada câmera responde.
+    """
+    indexes = list(range(SCAN_RANGE) if indexes is None else indexes)
+    found: Dict[int, dict] = {}
+    lock = threading.Lock()
+    closed = [False]
+
+    def run(idx: int):
+        info = probe(idx)
+        if info is None: return
+        with lock:
+            if closed[0]: return      # respondeu depois do prazo
+            found[idx] = info
+        if on_found is not None: on_found(info)
+
+    threads = [threading.Thread(target=run, args=(i,), name=f"scan-{i}", daemon=True) for i in indexes]
+    for th in threads: th.start()
+    deadline = time.perf_counter() + max(0.0, timeout)
+    for th in threads: th.join(max(0.0, deadline - time.perf_counter()))
+    with lock:
+        closed[0] = True
+        return [found[i] for i in sorted(found)]
+
+def device_label(dev: dict) -> str:
+    """Texto de uma câmera na lista ("Câmera 0 — 1920x1080 @ 30 fps")."""
+    s = f"Câmera {dev['index']}"
+    if dev.get("width") and dev.get("height"): s += f" — {dev['width']}x{dev['height']}"
+    if dev.get("fps"): s += f" @ {dev['fps']:g} fps"
+    return s
+
+# --- cache dos dispositivos conhecidos ---
+_cache_lock = threading.Lock()   # varredura e diálogo gravam campos diferentes do mesmo arquivo
+
+def load_cache(path: str = SCAN_CACHE) -> dict:
+    """Última varredura e última seleção ({"devices": [...], "selected": [...]}); vazio se não há."""
+    try:
+        with open(path, encoding="utf-8") as f: data = json.load(f)
+    except (OSError, ValueError):
+        return {"devices": [], "selected": []}
+    if not isinstance(data, dict): data = {}
+    devs = [d for d in data.get("devices") or [] if isinstance(d, dict) and isinstance(d.get("index"), int)]
+    sel = [i for i in data.get("selected") or [] if isinstance(i, int)]
+    return {"devices": devs, "selected": sel, "saved": data.get("saved")}
+
+def update_cache(path: str = SCAN_CACHE, **fields):
+    """Atualiza campos do cache (`devices`, `selected`) com troca atômica do arquivo."""
+    with _cache_lock:
+        data = load_cache(path)
+        data.update(fields); data["saved"] = time.time()
+        tmp = path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f: json.dump(data, f, indent=1)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"[SCAN] Falha ao gravar '{path}': {e}")
+
+class CameraScanWorker(QtCore.QThread):
+    """Varredura em segundo plano: `found` a cada câmera que responde, `scanned` no fim
+    (lista completa, já gravada no cache)."""
+    found = QtCore.Signal(dict)
+    scanned = QtCore.Signal(list)   # list[dict]
+
+    def run(self):
+        devices = scan_devices(on_found=self.found.emit)
+        update_cache(devices=devices)
+        self.scanned.emit(devices)
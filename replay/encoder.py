@@ -0,0 +1,266 @@
+# replay/encoder.py
+import threading, time
+from collections import deque
+from typing import Optional, Tuple
+import cv2
+
+from .config import (CAPTURE_SIZE, ENCODE_WORKERS, ENCODE_QUEUE, OVERFLOW_POLICY, ENCODE_MIN_QUALITY, WRITE_FPS,
+                     ADAPTIVE_ENCODE, ADAPT_WRITE_MS, ADAPT_QUEUE_FRAC, ADAPT_MIN_FPS, ADAPT_WINDOW,
+                     DEDUP_THRESHOLD, DEDUP_MAX_SECONDS)
+from .activity import max_diff, thumbnail
+from .metrics import METRICS
+
+POLICIES = ("drop_oldest", "drop_newest", "quality")
+
+class PressureController:
+    """Controle adaptativo da gravação sob pressão de E/S.
+
+    A cada `window` segundos olha a latência média de gravação no buffer e a fila de
+    codificação. Com pressão, baixa primeiro a qualidade JPEG (até `min_quality`) e
+    depois o fps de gravação (até `min_fps`); com folga por 3 janelas seguidas, desfaz
+    na ordem inversa (fps primeiro, qualidade por último).
+    """
+    Q_DOWN, Q_UP, FPS_FACTOR, CALM_WINDOWS = 10, 5, 0.75, 3
+
+    def __init__(self, quality: int, fps: float = WRITE_FPS, min_quality: int = ENCODE_MIN_QUALITY,
+                 min_fps: float = ADAPT_MIN_FPS, write_ms: float = ADAPT_WRITE_MS,
+                 queue_frac: float = ADAPT_QUEUE_FRAC, window: float = ADAPT_WINDOW):
+        self.max_quality = self.quality = int(quality)
+        self.min_quality = min(int(min_quality), self.max_quality)
+        self.max_fps = self.fps = float(fps)
+        self.min_fps = min(float(min_fps), self.max_fps)
+        self.write_ms = float(write_ms)
+        self.queue_frac = float(queue_frac)
+        self.window = float(window)
+        self._t0: Optional[float] = None
+        self._lat = 0.0; self._n = 0; self._depth = 0.0; self._calm = 0
+        self.lowered = 0
+        self.raised = 0
+        self.last_write_ms = 0.0
+
+    def observe(self, write_s: float, depth_frac: float, now: float):
+        """Uma gravação concluída (chamado em série, no commit)."""
+        if self._t0 is None: self._t0 = now
+        self._lat += write_s; self._n += 1; self._depth = max(self._depth, depth_frac)
+        if now - self._t0 < self.window: return
+        ms = self._lat / self._n * 1000.0
+        self.last_write_ms = ms
+        if ms > self.write_ms or self._depth >= self.queue_frac:
+            self._calm = 0; self._lower()
+        elif ms < self.write_ms / 2 and self._depth < self.queue_frac / 2:
+            self._calm += 1
+            if self._calm >= self.CALM_WINDOWS:
+                self._calm = 0; self._raise()
+        else:
+            self._calm = 0
+        self._t0 = now; self._lat = 0.0; self._n = 0; self._depth = 0.0
+
+    def _lower(self):
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, self.quality - self.Q_DOWN)
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, self.fps * self.FPS_FACTOR)
+        else: return
+        self.lowered += 1
+
+    def _raise(self):
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps / self.FPS_FACTOR)
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + self.Q_UP)
+        else: return
+        self.raised += 1
+
+    def stats(self) -> dict:
+        return {"adapt_quality": self.quality, "adapt_fps": round(self.fps, 2),
+                "adapt_write_ms": round(self.last_write_ms, 2),
+                "adapt_lowered": self.lowered, "adapt_raised": self.raised}
+
+class EncodePipeline:
+    """Estágio codificar+gravar da captura.
+
+    Fila limitada -> pool de encoders (cv2 libera o GIL no resize/imencode) ->
+    commit no DiskRingBuffer na ordem de captura, com o timestamp original do grab.
+    Política de estouro: `drop_oldest`, `drop_newest` ou `quality` (baixa a
+    qualidade JPEG conforme a fila enche e, cheia, descarta o mais antigo).
+    Com `adaptive`, um PressureController ajusta qualidade e fps de gravação.
+    Deduplicação (`dedup`): na entrada, a miniatura de atividade de cada frame é comparada
+    pixel a pixel com a do último frame enviado para codificação; se nenhum pixel passa do
+    limiar o frame nem é codificado e vira só uma linha de índice apontando para aquele JPEG
+    (`write_dup`). Se o estouro descarta um frame real antes de codificá-lo, o primeiro
+    repetido dele ainda na fila é codificado no lugar.
+    """
+    def __init__(self, ring, workers: int = ENCODE_WORKERS, queue_size: int = ENCODE_QUEUE,
+                 policy: str = OVERFLOW_POLICY, min_quality: int = ENCODE_MIN_QUALITY,
+                 size: Tuple[int, int] = CAPTURE_SIZE, name: str = "", adaptive: bool = ADAPTIVE_ENCODE,
+                 dedup: float = DEDUP_THRESHOLD, dedup_max_s: float = DEDUP_MAX_SECONDS):
+        if policy not in POLICIES:
+            raise ValueError(f"política de estouro inválida: {policy!r} (use {', '.join(POLICIES)})")
+        self.ring = ring
+        self.policy = policy
+        self.queue_size = max(1, int(queue_size))
+        self.min_quality = int(max(0, min(100, min_quality)))
+        self.size = size
+        self.controller = PressureController(ring.jpeg_quality, min_quality=self.min_quality) if adaptive else None
+        self._q = deque()
+        self._cv = threading.Condition()
+        self._closed = False
+        self._seq_in = 0          # atribuído na retirada da fila (= ordem de captura)
+        self._seq_out = 0         # próximo a ser gravado
+        self._pending = {}
+        self._commit_lock = threading.Lock()
+        # deduplicação: referência = último frame enfileirado para codificar (tag, miniatura, ts)
+        self.dedup = max(0.0, float(dedup or 0))
+        self.dedup_max_s = float(dedup_max_s)
+        self._ref: Optional[tuple] = None
+        self._persisted = -1      # tag do último frame realmente gravado (commit)
+        # contadores
+        self.submitted = 0
+        self.dropped = 0
+        self.degraded = 0
+        self.written = 0
+        self.failed = 0
+        self.deduped = 0
+        self.max_depth = 0
+        self._enc_total = 0.0
+        self._enc_max = 0.0
+        self._workers = [threading.Thread(target=self._worker, name=f"encode-{name}{i}", daemon=True)
+                         for i in range(max(1, int(workers)))]
+        for th in self._workers: th.start()
+
+    # --- estágio de captura ---
+    def submit(self, frame, ts: float) -> bool:
+        """Enfileira um frame capturado; retorna False se ele foi descartado."""
+        t0 = time.perf_counter()
+        try: thumb = thumbnail(frame)   # escore de atividade: diferença calculada no commit, em ordem
+        except Exception: thumb = None
+        if METRICS.enabled: METRICS.observe("activity", self.ring.label, time.perf_counter() - t0)
+        ref = self._ref
+        dup = (self.dedup > 0 and thumb is not None and ref is not None and ts - ref[2] < self.dedup_max_s
+               and max_diff(ref[1], thumb) < self.dedup)
+        with self._cv:
+            if self._closed: return False
+            self.submitted += 1
+            tag = self.submitted
+            if len(self._q) >= self.queue_size:
+                self.dropped += 1
+                if self.policy == "drop_newest": return False
+                old = self._q.popleft()
+                if old[4] is None:
+                    # saiu um frame real: o primeiro repetido dele ainda na fila vira frame real
+                    # e os demais (e este, se repetido) passam a repeti-lo
+                    new = self._promote(old[3])
+                    if ref is not None and old[3] == ref[0]:
+                        self._ref = ref = new
+                        if ref is None: dup = False
+            # repetido: guarda o frame (pode voltar a ser real, ver `_promote`) e a tag que repete
+            self._q.append((frame, ts, thumb, tag, ref[0] if dup else None))
+            if not dup: self._ref = (tag, thumb, ts)
+            self.max_depth = max(self.max_depth, len(self._q))
+            self._cv.notify()
+            return True
+
+    def _promote(self, tag: int) -> Optional[tuple]:
+        """Referência `tag` descartada da fila (sob `_cv`): o primeiro repetido dela vira frame real.
+
+        Devolve a nova referência (tag, miniatura, ts) ou None se nenhum repetido esperava por ela.
+        """
+        new = None
+        for i, (frame, ts, thumb, t, of) in enumerate(self._q):
+            if of != tag: continue
+            if new is None:
+                self._q[i] = (frame, ts, thumb, t, None); new = (t, thumb, ts)
+            else:
+                self._q[i] = (frame, ts, thumb, t, new[0])
+        return new
+
+    def close(self, timeout: Optional[float] = 2.0):
+        """Para de aceitar frames, drena a fila e espera os encoders."""
+        with self._cv:
+            self._closed = True
+            self._cv.notify_all()
+        deadline = None if timeout is None else time.time() + timeout
+        for th in self._workers:
+            th.join(None if deadline is None else max(0.0, deadline - time.time()))
+
+    @property
+    def write_fps(self) -> float:
+        """fps de gravação pedido à captura (reduzido pelo controle adaptativo)."""
+        return self.controller.fps if self.controller else WRITE_FPS
+
+    # --- estágio de codificação ---
+    def _quality(self, depth: int) -> int:
+        q = self.controller.quality if self.controller else self.ring.jpeg_quality
+        if self.policy != "quality": return q
+        half = self.queue_size / 2.0
+        if depth <= half: return q
+        frac = min(1.0, (depth - half) / max(1.0, half))
+        return int(round(q - frac * max(0, q - self.min_quality)))
+
+    def _worker(self):
+        while True:
+            with self._cv:
+                while not self._q and not self._closed: self._cv.wait()
+                if not self._q: return
+                frame, ts, thumb, tag, of = self._q.popleft()
+                seq = self._seq_in; self._seq_in += 1
+                quality = self._quality(len(self._q) + 1)
+                if of is None and quality < self.ring.jpeg_quality: self.degraded += 1
+            if of is not None:   # repetido: nada a codificar
+                self._commit(seq, None, None, ts, None, 0.0, thumb, of, dup=True); continue
+            t0 = time.perf_counter()
+            buf = proxy = None
+            on = METRICS.enabled; cam = self.ring.label
+            try:
+                if (frame.shape[1], frame.shape[0]) != self.size:
+                    frame = cv2.resize(frame, self.size, interpolation=cv2.INTER_AREA)
+                    if on: METRICS.observe("resize", cam, time.perf_counter() - t0)
+                t1 = time.perf_counter() if on else 0.0
+                ok, enc = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+                if ok: buf = enc
+                every = self.ring.proxy_every
+                if buf is not None and every and seq % every == 0:
+                    proxy = self.ring.encode_proxy(frame)
+                if t1: METRICS.observe("encode", cam, time.perf_counter() - t1)
+            except Exception:
+                pass
+            h, w = frame.shape[:2]
+            self._commit(seq, buf, proxy, ts, (w, h), time.perf_counter() - t0, thumb, tag)
+
+    def _commit(self, seq: int, buf, proxy, ts: float, size, enc_dt: float, thumb=None, tag: int = -1,
+                dup: bool = False):
+        # grava em ordem de captura mesmo que os encoders terminem fora de ordem
+        with self._commit_lock:
+            if not dup:
+                self._enc_total += enc_dt; self._enc_max = max(self._enc_max, enc_dt)
+            self._pending[seq] = (buf, proxy, ts, size, thumb, tag, dup)
+            while self._seq_out in self._pending:
+                buf, proxy, ts, size, thumb, tag, dup = self._pending.pop(self._seq_out)
+                self._seq_out += 1
+                t0 = time.perf_counter()
+                if dup:
+                    # só repete se o JPEG de referência foi mesmo gravado (senão o frame se perde)
+                    if tag != self._persisted or not self.ring.write_dup(ts, thumb):
+                        self.failed += 1; continue
+                    self.deduped += 1
+                else:
+                    if buf is None:
+                        self.failed += 1; continue
+                    self.ring.write_jpeg(buf, ts, size, proxy, thumb)
+                    self._persisted = tag
+                    self.written += 1
+                if self.controller:
+                    now = time.perf_counter()
+                    self.controller.observe(now - t0, self.depth() / self.queue_size, now)
+
+    def depth(self) -> int:
+        with self._cv: return len(self._q)
+
+    def stats(self) -> dict:
+        done = max(1, self.written + self.failed)
+        return {"queue_depth": self.depth(), "queue_max": self.max_depth, "queue_size": self.queue_size,
+                "policy": self.policy, "submitted": self.submitted, "dropped": self.dropped,
+                "degraded": self.degraded, "written": self.written, "deduped": self.deduped, "failed": self.failed,
+                "encode_ms_avg": round(self._enc_total / done * 1000.0, 2),
+                "encode_ms_max": round(self._enc_max * 1000.0, 2),
+                **(self.controller.stats() if self.controller else {})}
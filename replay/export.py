@@ -1,74 +1,315 @@
 # replay/export.py
-import os, time
-from typing import Optional, Tuple
+import math, os, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
 import numpy as np
 import cv2
 from PySide6 import QtCore
-from .config import EXPORT_DIR, EXPORT_SIZE, PLAYBACK_FPS, FOURCC_MP4, FOURCC_AVI
+from .config import EXPORT_DIR, EXPORT_SIZE, PLAYBACK_FPS, FOURCC_MP4, FOURCC_AVI, EXPORT_PASSTHROUGH
+from .mjpeg import MjpegAviWriter
+from .metrics import METRICS
 
-class ExportThread(QtCore.QThread):
+GRID_VIEW = 0   # view_mode da grade com todas as câmeras; 1..N = câmera única
+
+def background_priority():
+    """Baixa a prioridade da thread atual no SO (no Linux o nice vale por thread)."""
+    if hasattr(os, "setpriority"):
+        try: os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except OSError: pass
+
+class ExportCancelled(Exception):
+    """Exportação interrompida por `cancel()`."""
+
+def grid_shape(n: int) -> Tuple[int, int]:
+    """(colunas, linhas) da grade para n câmeras: 2 -> 2x1, 3-4 -> 2x2, 5-6 -> 3x2, 7-9 -> 3x3."""
+    n = max(1, int(n))
+    cols = int(math.ceil(math.sqrt(n)))
+    return cols, int(math.ceil(n / cols))
+
+def view_sources(view_mode: int, n_cams: int) -> List[int]:
+    """Índices das câmeras que um view_mode usa."""
+    if view_mode == GRID_VIEW: return list(range(max(1, int(n_cams))))
+    return [view_mode - 1]
+
+class Compositor:
+    """Monta o frame de saída de um view_mode reaproveitando os buffers entre frames."""
+    def __init__(self, view_mode: int, size: Tuple[int,int], n_cams: int = 2):
+        self.view_mode = view_mode
+        self.size = size
+        self.n_cams = max(1, int(n_cams))
+        W, H = size
+        self._canvas = np.zeros((H, W, 3), dtype=np.uint8)
+        self._tiles = {}   # célula -> (geometria, buffer redimensionado)
+        cols, rows = grid_shape(self.n_cams)
+        xs = [W * c // cols for c in range(cols + 1)]; ys = [H * r // rows for r in range(rows + 1)]
+        self._cells = [(xs[i % cols], ys[i // cols], xs[i % cols + 1] - xs[i % cols], ys[i // cols + 1] - ys[i // cols])
+                       for i in range(self.n_cams)]
+
+    def _fit(self, src, cell: int):
+        # encaixa src centralizado na célula (letterbox), sem realocar
+        x0, y0, tw, th = self._cells[cell]
+        if src is None:
+            self._canvas[y0:y0+th, x0:x0+tw] = 0; self._tiles.pop(cell, None); return
+        h, w = src.shape[:2]
+        s = min(tw/w, th/h); nw, nh = max(1, int(w*s)), max(1, int(h*s))
+        geo = (w, h)
+        tile = self._tiles.get(cell)
+        if tile is None or tile[0] != geo:
+            self._canvas[y0:y0+th, x0:x0+tw] = 0
+            tile = (geo, np.empty((nh, nw, 3), dtype=np.uint8)); self._tiles[cell] = tile
+        buf = tile[1]
+        cv2.resize(src, (nw, nh), dst=buf, interpolation=cv2.INTER_AREA)
+        x, y = x0 + (tw-nw)//2, y0 + (th-nh)//2
+        self._canvas[y:y+nh, x:x+nw] = buf
+
+    def sources(self) -> List[int]:
+        """Índices das câmeras que este view_mode usa."""
+        return view_sources(self.view_mode, self.n_cams)
+
+    def compose(self, frames: Sequence):
+        W, H = self.size
+        if self.view_mode != GRID_VIEW:
+            src = frames[self.view_mode - 1]
+            if src is None:
+                self._canvas[:] = 0; return self._canvas
+            if (src.shape[1], src.shape[0]) == (W, H): return src
+            cv2.resize(src, (W, H), dst=self._canvas, interpolation=cv2.INTER_AREA)
+            return self._canvas
+        # grade (lado a lado com 2 câmeras)
+        for i in range(self.n_cams):
+            self._fit(frames[i], i)
+        return self._canvas
+
+def open_writer(path: str, fps: int, size: Tuple[int,int]):
+    """Abre VideoWriter MP4; cai para AVI/MJPG se o codec não existir."""
+    fourcc = cv2.VideoWriter_fourcc(*FOURCC_MP4)
+    w = cv2.VideoWriter(path, fourcc, fps, size)
+    if w.isOpened(): return w, path
+    path2 = os.path.splitext(path)[0] + ".avi"
+    fourcc2 = cv2.VideoWriter_fourcc(*FOURCC_AVI)
+    w2 = cv2.VideoWriter(path2, fourcc2, fps, size)
+    return (w2, path2) if w2.isOpened() else (None, None)
+
+class MultiExportThread(QtCore.QThread):
+    """Exporta várias saídas (câmeras únicas e grade) numa única passada pela linha do tempo.
+
+    Cada frame de origem é decodificado uma única vez (em paralelo entre câmeras) e
+    distribuído a todos os writers. Com `passthrough`, as saídas de câmera única copiam
+    os JPEGs do buffer para um AVI MJPEG sem decodificar; só a grade é recodificada.
+    Com um `rolling` (RollingEncoder) compatível, as saídas que ele mantém viram concatenação
+    dos blocos pré-codificados, codificando aqui só os frames que faltam nas bordas.
+    Com `throttle` (ExportThrottle) cada frame passa pelo freio antes de ser lido; `cancel()`
+    interrompe no próximo frame e apaga os arquivos ainda incompletos, como qualquer erro.
+    `low_priority` roda a thread e o pool de decodificação com a menor prioridade do SO.
+    """
     done = QtCore.Signal(str)
     error = QtCore.Signal(str)
+    stats = QtCore.Signal(dict)
+    progress = QtCore.Signal(int, int)   # (unidades feitas, total): um frame de uma saída
+    cancelled = QtCore.Signal()
 
-    def __init__(self, ring0, ring1, start_ts: float, end_ts: float, view_mode: int,
-                 out_path: str, fps: int = PLAYBACK_FPS, size: Tuple[int,int] = EXPORT_SIZE, parent=None):
+    def __init__(self, rings: Sequence, start_ts: float, end_ts: float, outputs: List[Tuple[int, str]],
+                 fps: int = PLAYBACK_FPS, size: Tuple[int,int] = EXPORT_SIZE,
+                 passthrough: bool = EXPORT_PASSTHROUGH, timeline=None, rolling=None, throttle=None,
+                 low_priority: bool = False, parent=None):
         super().__init__(parent)
-        self.ring0, self.ring1 = ring0, ring1
+        self.rings = list(rings)
+        self.timeline = timeline      # JointTimeline: uma busca para todas as câmeras
+        self.rolling = rolling        # RollingEncoder: blocos MJPEG já codificados
         self.start_ts, self.end_ts = start_ts, end_ts
-        self.view_mode = view_mode
-        self.out_path = out_path
+        self.outputs = list(outputs)
+        self.passthrough = passthrough
         self.fps = max(1, int(fps))
         self.size = size
+        self.throttle = throttle
+        self.low_priority = bool(low_priority)
+        self.last_stats: dict = {}
+        self._cancel = False
+        self._partial: List[str] = []    # arquivos abertos ainda não concluídos
+        self._done_units = 0; self._total_units = 1; self._pct = -1
 
-    def _compose(self, bgr0, bgr1):
-        W, H = self.size
-        canvas = np.zeros((H, W, 3), dtype=np.uint8)
-        if self.view_mode == 1:
-            return cv2.resize(bgr0, (W, H), interpolation=cv2.INTER_AREA) if bgr0 is not None else canvas
-        if self.view_mode == 2:
-            return cv2.resize(bgr1, (W, H), interpolation=cv2.INTER_AREA) if bgr1 is not None else canvas
-        # lado a lado
-        lw, rw = W//2, W - W//2
-        def fit_center(src, tw, th):
-            if src is None: return np.zeros((th, tw, 3), dtype=np.uint8)
-            h, w = src.shape[:2]
-            s = min(tw/w, th/h); nw, nh = int(w*s), int(h*s)
-            resized = cv2.resize(src, (nw, nh), interpolation=cv2.INTER_AREA)
-            pad = np.zeros((th, tw, 3), dtype=np.uint8)
-            x, y = (tw-nw)//2, (th-nh)//2
-            pad[y:y+nh, x:x+nw] = resized
-            return pad
-        left  = fit_center(bgr0, lw, H)
-        right = fit_center(bgr1, rw, H)
-        canvas[:, :lw] = left
-        canvas[:, lw:] = right
-        return canvas
-
-    def _open_writer(self, path):
-        fourcc = cv2.VideoWriter_fourcc(*FOURCC_MP4)
-        w = cv2.VideoWriter(path, fourcc, self.fps, self.size)
-        if w.isOpened(): return w, path
-        path2 = os.path.splitext(path)[0] + ".avi"
-        fourcc2 = cv2.VideoWriter_fourcc(*FOURCC_AVI)
-        w2 = cv2.VideoWriter(path2, fourcc2, self.fps, self.size)
-        return (w2, path2) if w2.isOpened() else (None, None)
+    def cancel(self): self._cancel = True
+
+    def _pace(self, units: int = 1):
+        """Entre frames: cancelamento, freio das exportações e progresso (emitido a cada 1%)."""
+        if self._cancel: raise ExportCancelled()
+        if self.throttle is not None: self.throttle.wait(lambda: self._cancel)
+        if self._cancel: raise ExportCancelled()
+        self._done_units += units
+        pct = self._done_units * 100 // self._total_units
+        if pct != self._pct:
+            self._pct = pct; self.progress.emit(self._done_units, self._total_units)
+
+    def _passthrough(self, ring, refs, path: str) -> str:
+        """Copia os JPEGs do buffer direto para um AVI MJPEG (sem decode/encode)."""
+        path = os.path.splitext(path)[0] + ".avi"
+        w = MjpegAviWriter(path, self.fps, self.size); self._partial.append(path)
+        key = None; data = None; black = None
+        try:
+            for r in refs:
+                self._pace()
+                if r is None or r.key != key:
+                    key = r.key if r is not None else None
+                    data = ring.load_jpeg(r, scratch=True) if r is not None else None
+                    if data is not None and r.size != self.size:
+                        # tamanho diferente da saída: único caso que recodifica
+                        bgr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+                        bgr = cv2.resize(bgr, self.size, interpolation=cv2.INTER_AREA)
+                        data = cv2.imencode(".jpg", bgr, [int(cv2.IMWRITE_JPEG_QUALITY), ring.jpeg_quality])[1]
+                    if data is None:
+                        if black is None:
+                            W, H = self.size
+                            black = cv2.imencode(".jpg", np.zeros((H, W, 3), dtype=np.uint8))[1]
+                        data = black
+                w.write(data)
+        finally:
+            w.release()
+        self._partial.remove(path)
+        return path
+
+    def _from_chunks(self, roll, vm: int, fnos, refs, path: str) -> Tuple[str, int, int]:
+        """Concatena os blocos pré-codificados num AVI MJPEG; só frames fora deles são codificados."""
+        path = os.path.splitext(path)[0] + ".avi"
+        comp = Compositor(vm, self.size, len(self.rings))
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), roll.quality]
+        keys = [None] * len(self.rings); bgr = [None] * len(self.rings)
+        last = (None, None); chunked = encoded = 0
+        w = MjpegAviWriter(path, self.fps, self.size); self._partial.append(path)
+        try:
+            for k, data in enumerate(roll.frames(vm, fnos)):
+                self._pace()
+                if data is None:
+                    for i in comp.sources():
+                        r = refs[i][k]; key = r.key if r is not None else None
+                        if key != keys[i]:
+                            bgr[i] = self.rings[i].load_bgr(r) if r is not None else None; keys[i] = key
+                    sig = tuple(keys[i] for i in comp.sources())
+                    if sig != last[0]:
+                        last = (sig, cv2.imencode(".jpg", comp.compose(bgr), params)[1])
+                    data = last[1]; encoded += 1
+                else:
+                    chunked += 1
+                w.write(data)
+        finally:
+            w.release()
+        self._partial.remove(path)
+        return path, chunked, encoded
+
+    def _discard(self, writers):
+        """Cancelamento ou erro: fecha os writers abertos e apaga os arquivos incompletos."""
+        for _, w, _ in writers:
+            try: w.release()
+            except Exception: pass
+        for p in self._partial:
+            try: os.remove(p)
+            except OSError: pass
+        self._partial = []
 
     def run(self):
+        writers = []; pool = None
+        if self.low_priority: background_priority()
         try:
             os.makedirs(EXPORT_DIR, exist_ok=True)
-            writer, final_path = self._open_writer(self.out_path)
-            if writer is None:
-                self.error.emit("VideoWriter não abriu (mp4/avi)."); return
+            for _, p in self.outputs: os.makedirs(os.path.dirname(p) or ".", exist_ok=True)
+            n = len(self.rings)
+            roll = self.rolling if self.rolling is not None and self.rolling.matches(self.fps, self.size) else None
+            copy_outs = [(vm, p) for vm, p in self.outputs if self.passthrough and vm != GRID_VIEW]
+            roll_outs = [(vm, p) for vm, p in self.outputs
+                         if roll is not None and vm in roll.views and (vm, p) not in copy_outs]
+            enc_outs = [(vm, p) for vm, p in self.outputs if (vm, p) not in copy_outs and (vm, p) not in roll_outs]
+            comps = [Compositor(vm, self.size, n) for vm, _ in enc_outs]
+            need = sorted(set(i for vm, _ in copy_outs for i in [vm - 1]) | set(i for c in comps for i in c.sources())
+                          | set(i for vm, _ in roll_outs for i in view_sources(vm, n)))
+
+            t = {"lookup": 0.0, "copy": 0.0, "chunks": 0.0, "decode": 0.0, "compose": 0.0, "write": 0.0}
+            t0 = time.perf_counter()
             total = max(1, int(round((self.end_ts - self.start_ts) * self.fps)))
-            dt = 1.0 / self.fps; t = self.start_ts
-            for i in range(total):
-                r0 = self.ring0.nearest(t); r1 = self.ring1.nearest(t)
-                b0 = self.ring0.load_bgr(r0) if r0 else None
-                b1 = self.ring1.load_bgr(r1) if r1 else None
-                frame = self._compose(b0, b1)
-                writer.write(frame)
-                t = min(self.end_ts, self.start_ts + (i+1)*dt)
-            writer.release()
-            self.done.emit(final_path)
+            if roll is not None:
+                # mesma grade absoluta n/fps dos blocos pré-codificados
+                fnos = int(round(self.start_ts * self.fps)) + np.arange(total)
+                ts = fnos / self.fps
+            else:
+                ts = np.minimum(self.end_ts, self.start_ts + np.arange(total) / self.fps)
+            if self.timeline is not None and len(self.timeline):
+                refs = self.timeline.at_many(ts, need)
+            else:
+                refs = {i: self.rings[i].nearest_many(ts) for i in need}
+            t["lookup"] = time.perf_counter() - t0
+            self._total_units = max(1, total * (len(copy_outs) + len(roll_outs) + (1 if enc_outs else 0)))
+
+            # 1) saídas de câmera única: cópia dos bytes JPEG, prontas antes da composição
+            a = time.perf_counter()
+            for vm, path in copy_outs:
+                self.done.emit(self._passthrough(self.rings[vm - 1], refs[vm - 1], path))
+            t["copy"] = time.perf_counter() - a
+
+            # 1b) saídas mantidas pelo RollingEncoder: concatenação de blocos + bordas
+            a = time.perf_counter(); chunked = edge = 0
+            for vm, path in roll_outs:
+                final_path, c, e = self._from_chunks(roll, vm, fnos, refs, path)
+                chunked += c; edge += e
+                self.done.emit(final_path)
+            t["chunks"] = time.perf_counter() - a
+
+            # 2) saídas recodificadas: uma decodificação por frame de origem
+            for comp, (vm, path) in zip(comps, enc_outs):
+                w, final_path = open_writer(path, self.fps, self.size)
+                if w is None: raise RuntimeError("VideoWriter não abriu (mp4/avi).")
+                writers.append((comp, w, final_path)); self._partial.append(final_path)
+            dec = sorted(set(i for c in comps for i in c.sources()))
+            if len(dec) > 1:
+                pool = ThreadPoolExecutor(len(dec), thread_name_prefix="export-decode",
+                                          initializer=background_priority if self.low_priority else None)
+
+            keys = [None] * n; bgr = [None] * n; decoded = 0
+            for k in range(total if writers else 0):
+                self._pace()
+                a = time.perf_counter()
+                # só decodifica quando o frame de origem muda; câmeras em paralelo
+                todo = [(i, refs[i][k]) for i in dec if refs[i][k] is not None and refs[i][k].key != keys[i]]
+                if pool is not None and len(todo) > 1:
+                    outs = list(pool.map(lambda ir: self.rings[ir[0]].load_bgr(ir[1]), todo))
+                else:
+                    outs = [self.rings[i].load_bgr(r) for i, r in todo]
+                for (i, r), b in zip(todo, outs):
+                    bgr[i] = b; keys[i] = r.key
+                decoded += len(todo)
+                b = time.perf_counter(); t["decode"] += b - a
+                frames = [comp.compose(bgr) for comp, _, _ in writers]
+                c = time.perf_counter(); t["compose"] += c - b
+                for frame, (_, w, _) in zip(frames, writers):
+                    w.write(frame)
+                d = time.perf_counter(); t["write"] += d - c
+                METRICS.observe("export_frame", "export", d - a)
+
+            for _, w, _ in writers: w.release()
+            writers_done, writers = writers, []
+            self._partial = []
+            wall = time.perf_counter() - t0
+            st = {"frames": total, "outputs": len(self.outputs), "copied": len(copy_outs), "decoded": decoded,
+                  "wall_s": round(wall, 3), "fps": round(total / wall, 1) if wall > 0 else 0.0}
+            if roll_outs: st.update(chunked_frames=chunked, edge_frames=edge)
+            mult = {"copy": len(copy_outs), "chunks": len(roll_outs)}
+            for k, v in t.items():
+                st[f"{k}_s"] = round(v, 3)
+                st[f"{k}_fps"] = round(total * mult.get(k, 1) / v, 1) if v > 0 else 0.0
+            self.last_stats = st
+            self.stats.emit(st)
+            for _, _, final_path in writers_done:
+                self.done.emit(final_path)
+        except ExportCancelled:
+            self._discard(writers)
+            self.cancelled.emit()
         except Exception as e:
+            self._discard(writers)
             self.error.emit(str(e))
+        finally:
+            if pool is not None: pool.shutdown(wait=False)
+
+class ExportThread(MultiExportThread):
+    """Exportação de uma única saída (view_mode 0 = grade, 1..N = câmera)."""
+    def __init__(self, rings: Sequence, start_ts: float, end_ts: float, view_mode: int,
+                 out_path: str, fps: int = PLAYBACK_FPS, size: Tuple[int,int] = EXPORT_SIZE, parent=None):
+        super().__init__(rings, start_ts, end_ts, [(view_mode, out_path)], fps, size, parent=parent)
+        self.view_mode = view_mode
+        self.out_path = out_path
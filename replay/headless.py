@@ -0,0 +1,96 @@
+# replay/headless.py
+import json, os, shutil, time
+from typing import List, Optional, Sequence
+from PySide6 import QtCore
+
+from .config import (BUFFER_DIR, PERSIST_BUFFER, EXPORT_DIR, BUFFER_SECONDS, WRITE_FPS, JPEG_QUALITY, ROLLING_EXPORT,
+                     SERVER_PORT)
+from .buffer import ByteBudget, DiskRingBuffer, cleanup_buffer_dir
+from .capture import start_capture, capture_stats
+from .export import MultiExportThread, GRID_VIEW
+from .timeline import JointTimeline
+from .rolling import RollingEncoder
+from .server import ReplayServer
+from .metrics import METRICS, STARTUP
+
+def run_headless(sources: Sequence, seconds: float, export_seconds: float = 0.0,
+                 report_every: float = 1.0, out_dir: str = EXPORT_DIR, keep_buffer: bool = False,
+                 rolling: bool = ROLLING_EXPORT, serve_port: int = SERVER_PORT) -> dict:
+    """Roda captura -> buffer (-> exportação) sem janela, para perfilar e testar carga.
+
+    Retorna um resumo por câmera (frames gravados, contadores da fila de codificação)
+    e, se pedido, as estatísticas da exportação dos últimos `export_seconds`.
+    """
+    if os.path.isdir(BUFFER_DIR) and not PERSIST_BUFFER:
+        shutil.rmtree(BUFFER_DIR, ignore_errors=True)
+    os.makedirs(BUFFER_DIR, exist_ok=True)
+    capacity = max(2, int(WRITE_FPS * BUFFER_SECONDS))
+    budget = ByteBudget()
+    rings = [DiskRingBuffer(str(i), capacity, JPEG_QUALITY, budget=budget) for i in range(len(sources))]
+    timeline = JointTimeline(rings)
+    threads = start_capture(sources, rings)
+    roll = RollingEncoder(rings, timeline) if rolling else None
+    if roll is not None: roll.start(QtCore.QThread.Priority.LowestPriority)
+    server = ReplayServer(rings, port=serve_port) if serve_port else None
+    if server is not None and not server.start(): server = None
+
+    t0 = time.time(); next_report = t0 + report_every
+    try:
+        while time.time() - t0 < seconds and any(th.isRunning() for th in threads):
+            time.sleep(0.05)
+            timeline.update()
+            if any(len(r) for r in rings): STARTUP.mark("capture")
+            if report_every > 0 and time.time() >= next_report:
+                next_report += report_every
+                el = time.time() - t0
+                line = "  ".join(f"{st['source']}: {len(r)} fr ({st['effective_fps']:.1f} fps, jitter {st['jitter_ms']:.1f} ms, "
+                                 f"fila {st.get('queue_depth', 0)}, desc {st.get('dropped', 0)}, pulados {st['skipped']})"
+                                 for st, r in zip(capture_stats(threads), rings))
+                print(f"[HEADLESS {el:5.1f}s] {line}")
+    finally:
+        for th in threads: th.stop()
+        for th in threads: th.wait(5000)
+        if roll is not None:
+            roll.stop(); roll.wait(5000)
+        if server is not None: server.stop()
+
+    elapsed = time.time() - t0
+    timeline.update()
+    summary = {"seconds": round(elapsed, 3), "cameras": []}
+    for st, r in zip(capture_stats(threads), rings):
+        span = (r.latest_ts() - r.oldest_ts()) if len(r) > 1 else 0.0
+        summary["cameras"].append({"source": st.pop("source"), "frames": len(r),
+                                   "write_fps": round(len(r) / elapsed, 2) if elapsed > 0 else 0.0,
+                                   "span_s": round(span, 3), "retention": r.retention(),
+                                   "tier": r.tier_stats(), **st})
+    summary["drift"] = timeline.drift_stats()
+    summary["startup"] = STARTUP.snapshot()
+
+    if export_seconds > 0 and rings and all(len(r) for r in rings):
+        end_ts = min(r.latest_ts() for r in rings)
+        start_ts = max([end_ts - export_seconds] + [r.oldest_ts() for r in rings])
+        stamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime())
+        os.makedirs(out_dir, exist_ok=True)
+        outputs = [(i + 1, os.path.join(out_dir, f"headless_cam{i+1}_{stamp}.mp4")) for i in range(len(rings))]
+        outputs.append((GRID_VIEW, os.path.join(out_dir, f"headless_grid_{stamp}.mp4")))
+        exp = MultiExportThread(rings, start_ts, end_ts, outputs, timeline=timeline, rolling=roll)
+        errors: List[str] = []
+        exp.error.connect(errors.append)
+        exp.run()   # síncrono nesta thread
+        summary["export"] = dict(exp.last_stats, errors=errors)
+
+    if roll is not None: summary["rolling"] = roll.stats()
+    if server is not None: summary["server"] = server.stats()
+    if METRICS.enabled: summary["metrics"] = METRICS.snapshot()
+    for r in rings: r.close()
+    if not keep_buffer: cleanup_buffer_dir()
+    return summary
+
+def main_headless(sources: Sequence, seconds: float, export_seconds: float = 0.0,
+                  json_out: Optional[str] = None, serve_port: int = SERVER_PORT) -> int:
+    summary = run_headless(sources, seconds, export_seconds, serve_port=serve_port)
+    text = json.dumps(summary, indent=2, ensure_ascii=False)
+    if json_out:
+        with open(json_out, "w", encoding="utf-8") as f: f.write(text)
+    print(text)
+    return 0
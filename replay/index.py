@@ -0,0 +1,124 @@
+# replay/index.py
+from typing import Callable, Dict
+import numpy as np
+
+class FrameIndex:
+    """Índice circular colunar (arrays NumPy pré-alocados) com leitura estilo seqlock.
+
+    Um único escritor faz append/pop_front; leitores nunca bloqueiam: copiam
+    (head, count), leem as colunas e repetem se o contador de sequência mudou.
+    """
+    def __init__(self, capacity: int, columns: Dict[str, object]):
+        self.capacity = max(2, int(capacity))
+        self._dtypes = dict(columns)
+        self.cols = {k: np.zeros(self.capacity, dtype=dt) for k, dt in self._dtypes.items()}
+        self._head = 0    # slot físico do item mais antigo
+        self._count = 0
+        self._base = 0    # número absoluto do item mais antigo (total já descartado)
+        self._seq = 0     # ímpar = escrita em andamento
+
+    # --- escrita (um único escritor por vez) ---
+    def append(self, **values):
+        if self._count == self.capacity: self._grow()
+        self._seq += 1
+        try:
+            slot = (self._head + self._count) % self.capacity
+            for k, v in values.items():
+                self.cols[k][slot] = v
+            self._count += 1
+        finally:
+            self._seq += 1
+
+    def extend(self, **arrays):
+        """Anexa vários itens de uma vez (colunas como arrays de mesmo tamanho)."""
+        n = len(next(iter(arrays.values()))) if arrays else 0
+        if n == 0: return
+        while self._count + n > self.capacity: self._grow()
+        self._seq += 1
+        try:
+            slots = (self._head + self._count + np.arange(n)) % self.capacity
+            for k, v in arrays.items():
+                self.cols[k][slots] = v
+            self._count += n
+        finally:
+            self._seq += 1
+
+    def pop_front(self, k: int = 1) -> int:
+        k = max(0, min(int(k), self._count))
+        if k == 0: return 0
+        self._seq += 1
+        self._head = (self._head + k) % self.capacity
+        self._count -= k
+        self._base += k
+        self._seq += 1
+        return k
+
+    def clear(self):
+        self._seq += 1
+        self._base += self._count
+        self._head = 0; self._count = 0
+        self._seq += 1
+
+    def _grow(self):
+        # raro: segmentos maiores que o previsto; lineariza e aumenta 50%
+        n, cap = self._count, self.capacity
+        new_cap = cap + cap // 2 + 1
+        order = (self._head + np.arange(n)) % cap
+        cols = {}
+        for k, dt in self._dtypes.items():
+            a = np.zeros(new_cap, dtype=dt); a[:n] = self.cols[k][order]; cols[k] = a
+        self._seq += 1
+        self.cols, self.capacity, self._head = cols, new_cap, 0
+        self._seq += 1
+
+    # --- leitura sem bloqueio ---
+    def read(self, fn: Callable):
+        """Executa fn(view) sobre um snapshot consistente (repete se houve escrita)."""
+        while True:
+            s = self._seq
+            if s & 1: continue
+            try:
+                res = fn(_View(self.cols, self._head, self._count, self.capacity, self._base))
+            except (IndexError, ValueError):
+                if self._seq == s: raise
+                continue
+            if self._seq == s: return res
+
+    def __len__(self): return self._count
+
+class _View:
+    """Snapshot de (head, count) sobre as colunas; índices lógicos 0..n-1 do mais antigo ao mais novo."""
+    __slots__ = ("cols", "head", "n", "cap", "base")
+    def __init__(self, cols, head, n, cap, base):
+        self.cols, self.head, self.n, self.cap, self.base = cols, head, n, cap, base
+
+    def phys(self, i):
+        return (self.head + i) % self.cap
+
+    def get(self, col: str, i):
+        return self.cols[col][self.phys(i)]
+
+    def column(self, col: str, lo: int = 0, hi: int = None) -> np.ndarray:
+        """Cópia contígua da coluna no intervalo lógico [lo, hi)."""
+        hi = self.n if hi is None else hi
+        return self.cols[col][self.phys(np.arange(lo, hi))]
+
+    def searchsorted(self, col: str, x):
+        """searchsorted (lado esquerdo) sobre a coluna ordenada vista como lógica."""
+        a = self.cols[col]
+        end = self.head + self.n
+        first = a[self.head:min(end, self.cap)]
+        second = a[0:max(0, end - self.cap)]
+        x = np.asarray(x)
+        i = np.searchsorted(first, x)
+        if len(second) == 0: return i
+        j = len(first) + np.searchsorted(second, x)
+        return np.where(x > first[-1], j, i)
+
+    def nearest(self, col: str, x):
+        """Índice lógico do item mais próximo de x (empate favorece o anterior)."""
+        x = np.asarray(x, dtype=np.float64)
+        i = np.clip(self.searchsorted(col, x), 1, self.n - 1)
+        if self.n == 1: return np.zeros_like(i)
+        a = self.get(col, i - 1); b = self.get(col, i)
+        return np.where(np.abs(a - x) <= np.abs(b - x), i - 1, i)
@@ -0,0 +1,239 @@
+# replay/jobs.py
+import itertools, threading, time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from PySide6 import QtCore
+from .config import (PLAYBACK_FPS, EXPORT_MAX_JOBS, EXPORT_THROTTLE, EXPORT_QUEUE_FRAC, EXPORT_TICK_MS,
+                     EXPORT_MAX_DELAY)
+from .export import MultiExportThread
+
+PRIORITY_NORMAL = 0
+PRIORITY_URGENT = 10   # passa à frente dos pedidos normais ainda na fila
+
+class ExportThrottle:
+    """Freio das exportações: atraso por frame exportado que cresce sob pressão no pipeline ao vivo.
+
+    A pressão é a maior entre a ocupação das filas de codificação da captura (relativa a
+    `queue_frac`), a latência média do tick da UI (relativa a `tick_ms`) e frames de captura
+    descartados desde a última leitura. Reavaliada a cada 100 ms: acima de 1 o atraso dobra
+    (até `max_delay`), abaixo de 0,5 cai pela metade. Um só freio para todas as exportações.
+    """
+    def __init__(self, capture_load: Optional[Callable[[], Tuple[float, int]]] = None,
+                 queue_frac: float = EXPORT_QUEUE_FRAC, tick_ms: float = EXPORT_TICK_MS,
+                 max_delay: float = EXPORT_MAX_DELAY, enabled: bool = EXPORT_THROTTLE):
+        self.capture_load = capture_load      # () -> (ocupação 0..1 das filas, frames descartados)
+        self.queue_frac = float(queue_frac)
+        self.tick_ms = float(tick_ms)
+        self.max_delay = max(0.0, float(max_delay))
+        self.enabled = bool(enabled)
+        self.delay = 0.0
+        self.pressure = 0.0
+        self.backoffs = 0          # reavaliações que aumentaram o atraso
+        self.throttled_s = 0.0     # tempo total parado no freio
+        self._tick_s = 0.0         # latência do tick (EWMA)
+        self._dropped: Optional[int] = None
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def note_tick(self, seconds: float):
+        """Latência de um tick da UI (atraso do timer + trabalho), chamado pela thread da GUI."""
+        self._tick_s += 0.2 * (float(seconds) - self._tick_s)
+
+    def _update(self):
+        frac, dropped = self.capture_load() if self.capture_load is not None else (0.0, 0)
+        p = max(frac / self.queue_frac if self.queue_frac > 0 else 0.0,
+                self._tick_s * 1000.0 / self.tick_ms if self.tick_ms > 0 else 0.0)
+        if self._dropped is not None and dropped > self._dropped: p = max(p, 2.0)
+        self._dropped = dropped
+        self.pressure = p
+        if p > 1.0:
+            self.delay = min(self.max_delay, max(0.005, self.delay * 2.0)); self.backoffs += 1
+        elif p < 0.5:
+            self.delay = self.delay / 2.0 if self.delay > 0.001 else 0.0
+
+    def wait(self, cancelled: Callable[[], bool] = lambda: False):
+        """Chamado antes de cada frame exportado; dorme o atraso atual (interrompível)."""
+        if not self.enabled: return
+        now = time.perf_counter()
+        with self._lock:
+            if now >= self._next:
+                self._next = now + 0.1
+                try: self._update()
+                except Exception: pass
+            delay = self.delay
+        if delay <= 0: return
+        end = now + delay
+        while not cancelled():
+            left = end - time.perf_counter()
+            if left <= 0: break
+            time.sleep(min(0.02, left))
+        self.throttled_s += time.perf_counter() - now
+
+    def stats(self) -> dict:
+        return {"pressure": round(self.pressure, 2), "delay_ms": round(self.delay * 1000.0, 1),
+                "tick_ms": round(self._tick_s * 1000.0, 1), "backoffs": self.backoffs,
+                "throttled_s": round(self.throttled_s, 2)}
+
+class ExportJob:
+    """Pedido de exportação: janela de tempo, gerador das saídas e estado na fila."""
+    def __init__(self, job_id: int, start_ts: float, end_ts: float,
+                 outputs: Callable[[float, float], List[Tuple[int, str]]], views: Tuple[int, ...], priority: int):
+        self.id = job_id
+        self.start_ts, self.end_ts = start_ts, end_ts
+        self.outputs = outputs            # (start_ts, end_ts) -> [(view_mode, caminho)], chamado ao iniciar
+        self.views = views
+        self.priority = int(priority)
+        self.state = "pending"            # pending | running | done | failed | cancelled
+        self.progress = 0.0
+        self.merged = 0                   # pedidos sobrepostos absorvidos por este
+        self.paths: List[str] = []
+        self.error: Optional[str] = None
+        self.stats: dict = {}
+        self.thread: Optional[MultiExportThread] = None
+
+class ExportQueue(QtCore.QObject):
+    """Fila central de exportações: concorrência limitada, prioridades, cancelamento e progresso.
+
+    No máximo `max_jobs` MultiExportThread rodam ao mesmo tempo, com a menor prioridade do SO
+    e passando pelo ExportThrottle a cada frame; o resto espera, o de maior prioridade (e
+    depois o mais antigo) sai primeiro. Pedido cuja janela cabe numa exportação em curso
+    com as mesmas saídas é absorvido por ela; sobreposto a um pedido ainda na fila, amplia
+    a janela daquele para a união das duas.
+    """
+    changed = QtCore.Signal()
+    progress = QtCore.Signal(int, float)    # (id, fração 0..1)
+    finished = QtCore.Signal(int, str)      # (id, estado final)
+    done = QtCore.Signal(str)               # um arquivo pronto
+    error = QtCore.Signal(str)
+    export_stats = QtCore.Signal(dict)     # estatísticas de cada exportação concluída
+
+    def __init__(self, rings: Sequence, timeline=None, rolling=None, throttle: Optional[ExportThrottle] = None,
+                 max_jobs: int = EXPORT_MAX_JOBS, parent=None):
+        super().__init__(parent)
+        self.rings = list(rings)
+        self.timeline = timeline
+        self.rolling = rolling
+        self.throttle = throttle if throttle is not None else ExportThrottle()
+        self.max_jobs = max(1, int(max_jobs))
+        self.pending: List[ExportJob] = []
+        self.running: Dict[MultiExportThread, ExportJob] = {}
+        self.history: Deque[ExportJob] = deque(maxlen=32)
+        self._ids = itertools.count(1)
+        self._retired: Optional[MultiExportThread] = None
+        self.submitted = 0
+        self.merged = 0
+
+    # --- pedidos ---
+    def submit(self, start_ts: float, end_ts: float, outputs: Callable[[float, float], List[Tuple[int, str]]],
+               priority: int = PRIORITY_NORMAL) -> ExportJob:
+        """Enfileira (ou funde com um pedido sobreposto) e devolve o job que vai cobrir a janela."""
+        self.submitted += 1
+        views = tuple(sorted(vm for vm, _ in outputs(start_ts, end_ts)))
+        tol = 1.0 / PLAYBACK_FPS
+        for job in self.running.values():
+            if job.views == views and job.start_ts - tol <= start_ts and end_ts <= job.end_ts + tol:
+                job.merged += 1; self.merged += 1
+                return job
+        for job in self.pending:
+            if job.views == views and start_ts <= job.end_ts + tol and end_ts >= job.start_ts - tol:
+                job.start_ts = min(job.start_ts, start_ts); job.end_ts = max(job.end_ts, end_ts)
+                job.priority = max(job.priority, int(priority))
+                job.merged += 1; self.merged += 1
+                self.changed.emit()
+                return job
+        job = ExportJob(next(self._ids), start_ts, end_ts, outputs, views, priority)
+        self.pending.append(job)
+        self._pump()
+        self.changed.emit()
+        return job
+
+    def cancel(self, job_id: int) -> bool:
+        for job in self.pending:
+            if job.id == job_id:
+                self.pending.remove(job); self._finish(job, "cancelled"); self.changed.emit()
+                return True
+        for th, job in self.running.items():
+            if job.id == job_id:
+                th.cancel(); return True      # estado final chega pelo sinal `cancelled` da thread
+        return False
+
+    def cancel_all(self, wait_ms: int = 0) -> int:
+        """Cancela tudo (fila e em curso); com `wait_ms` espera as threads terminarem."""
+        n = len(self.pending) + len(self.running)
+        for job in self.pending: self._finish(job, "cancelled")
+        self.pending = []
+        threads = list(self.running)
+        for th in threads: th.cancel()
+        if wait_ms > 0:
+            for th in threads: th.wait(wait_ms)
+        if n: self.changed.emit()
+        return n
+
+    def jobs(self) -> List[ExportJob]:
+        return list(self.running.values()) + sorted(self.pending, key=lambda j: (-j.priority, j.id))
+
+    def stats(self) -> dict:
+        ended = [j.state for j in self.history]
+        return {"running": len(self.running), "pending": len(self.pending), "submitted": self.submitted,
+                "merged": self.merged, "done": ended.count("done"), "failed": ended.count("failed"),
+                "cancelled": ended.count("cancelled"), **self.throttle.stats()}
+
+    # --- execução ---
+    def _pump(self):
+        while self.pending and len(self.running) < self.max_jobs:
+            job = max(self.pending, key=lambda j: (j.priority, -j.id))
+            self.pending.remove(job)
+            th = MultiExportThread(self.rings, job.start_ts, job.end_ts, job.outputs(job.start_ts, job.end_ts),
+                                   timeline=self.timeline, rolling=self.rolling, throttle=self.throttle,
+                                   low_priority=True)
+            th.done.connect(self._on_done)
+            th.error.connect(self._on_error)
+            th.stats.connect(self._on_stats)
+            th.progress.connect(self._on_progress)
+            th.cancelled.connect(self._on_cancelled)
+            th.finished.connect(self._on_finished)
+            job.thread = th; job.state = "running"
+            self.running[th] = job
+            th.start()
+
+    def _finish(self, job: ExportJob, state: str):
+        job.state = state; job.thread = None
+        self.history.append(job)
+        self.finished.emit(job.id, state)
+
+    # slots: chegam na thread da fila (GUI); `sender()` identifica a exportação
+    def _job(self) -> Optional[ExportJob]: return self.running.get(self.sender())
+
+    def _on_done(self, path: str):
+        job = self._job()
+        if job is not None: job.paths.append(path)
+        self.done.emit(path)
+
+    def _on_error(self, msg: str):
+        job = self._job()
+        if job is not None: job.error = msg
+        self.error.emit(msg)
+
+    def _on_stats(self, st: dict):
+        job = self._job()
+        if job is not None: job.stats = st
+        self.export_stats.emit(st)
+
+    def _on_progress(self, done: int, total: int):
+        job = self._job()
+        if job is None: return
+        job.progress = done / max(1, total)
+        self.progress.emit(job.id, job.progress)
+
+    def _on_cancelled(self):
+        job = self._job()
+        if job is not None: job.state = "cancelled"
+
+    def _on_finished(self):
+        th = self.sender()
+        self._retired = th    # a thread ainda está no meio da emissão de `finished`: solta só no próximo término
+        job = self.running.pop(th, None)
+        if job is None: return
+        self._finish(job, job.state if job.state == "cancelled" else ("failed" if job.error else "done"))
+        self._pump()
+        self.changed.emit()
@@ -0,0 +1,143 @@
+# replay/journal.py
+import os, struct, threading, zlib
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+MAGIC = b"RPJ1"
+
+def _crc_table() -> np.ndarray:
+    t = np.arange(256, dtype=np.uint32)
+    for _ in range(8): t = np.where(t & 1, (t >> 1) ^ np.uint32(0xEDB88320), t >> 1).astype(np.uint32)
+    return t
+
+_CRC = _crc_table()
+
+def crc32_rows(body: np.ndarray) -> np.ndarray:
+    """CRC32 (o mesmo de zlib.crc32) de cada linha de uma matriz de bytes, vetorizado por coluna."""
+    crc = np.full(len(body), 0xFFFFFFFF, np.uint32)
+    for col in np.ascontiguousarray(body.T):
+        crc = np.take(_CRC, (crc ^ col) & 0xFF) ^ (crc >> 8)
+    return crc ^ np.uint32(0xFFFFFFFF)
+
+class IndexJournal:
+    """Diário append-only do índice do buffer: um registro binário de tamanho fixo por frame.
+
+    Cada registro traz as colunas do índice + CRC32; na leitura, registros com CRC errado
+    e a cauda incompleta (escrita rasgada por queda) são descartados. `rewrite()` compacta
+    de forma atômica (arquivo temporário + os.replace); `compact()` faz o mesmo numa thread,
+    fora do caminho da captura. CRCs em lote são vetorizados (`crc32_rows`).
+    """
+    def __init__(self, path: str, columns: Dict[str, object]):
+        self.path = path
+        self.dtype = np.dtype([(k, np.dtype(dt).newbyteorder("<")) for k, dt in columns.items()] + [("crc", "<u4")])
+        sig = zlib.crc32(repr(self.dtype.descr).encode())
+        self._header = MAGIC + struct.pack("<II", self.dtype.itemsize, sig)
+        self._rec = np.zeros(1, dtype=self.dtype)
+        self._fh = None
+        self.records = 0     # registros no arquivo (vivos + já removidos do buffer)
+        self._lock = threading.Lock()
+        self._tail: Optional[List[bytes]] = None   # anexados durante uma compactação em segundo plano
+        self._gen = 0                              # rewrite síncrono invalida a compactação em curso
+        self._thread: Optional[threading.Thread] = None
+
+    def load(self) -> Tuple[Dict[str, np.ndarray], int]:
+        """Colunas dos registros válidos e quantos registros foram descartados."""
+        empty = {k: np.zeros(0, self.dtype[k]) for k in self.dtype.names if k != "crc"}
+        try:
+            with open(self.path, "rb") as f: raw = f.read()
+        except OSError:
+            return empty, 0
+        hl, size = len(self._header), self.dtype.itemsize
+        if raw[:hl] != self._header: return empty, (len(raw) // size if raw else 0)
+        n = (len(raw) - hl) // size
+        body = np.frombuffer(raw, dtype=np.uint8, count=n * size, offset=hl).reshape(n, size)
+        recs = body.view(self.dtype).reshape(n)
+        good = crc32_rows(body[:, :-4]) == recs["crc"]
+        bad = int(n - good.sum()) + (1 if (len(raw) - hl) % size else 0)
+        recs = recs[good]
+        return {k: recs[k].copy() for k in self.dtype.names if k != "crc"}, bad
+
+    def _open(self):
+        if self._fh is None:
+            self._fh = open(self.path, "ab")
+            if self._fh.tell() == 0: self._fh.write(self._header)
+
+    def append(self, **values):
+        rec = self._rec
+        for k, v in values.items(): rec[k] = v
+        b = rec.tobytes()
+        rec["crc"] = zlib.crc32(b[:-4])
+        b = rec.tobytes()
+        with self._lock:
+            self._open()
+            self._fh.write(b)
+            self._fh.flush()
+            self.records += 1
+            if self._tail is not None: self._tail.append(b)
+
+    def _encode(self, cols: Dict[str, np.ndarray]) -> bytes:
+        n = len(next(iter(cols.values()))) if cols else 0
+        recs = np.zeros(n, dtype=self.dtype)
+        for k, v in cols.items(): recs[k] = v
+        recs["crc"] = crc32_rows(recs.view(np.uint8).reshape(n, self.dtype.itemsize)[:, :-4])
+        return recs.tobytes()
+
+    def rewrite(self, cols: Dict[str, np.ndarray]):
+        """Regrava o diário só com `cols` (compactação); troca atômica do arquivo."""
+        body = self._encode(cols)
+        with self._lock:
+            self._gen += 1; self._tail = None      # compactação em curso fica obsoleta
+            self._close()
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as f:
+                f.write(self._header); f.write(body)
+                f.flush(); os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self.records = len(body) // self.dtype.itemsize
+
+    @property
+    def compacting(self) -> bool: return self._tail is not None
+
+    def compact(self, cols: Dict[str, np.ndarray]) -> bool:
+        """`rewrite` em segundo plano: `cols` é um snapshot; os registros anexados enquanto o
+        arquivo novo é gravado vão para os dois e entram no fim dele antes da troca.
+        False se já há uma compactação em curso."""
+        with self._lock:
+            if self._tail is not None: return False
+            self._tail = []; gen = self._gen
+        self._thread = threading.Thread(target=self._compact, args=(cols, gen), name="journal-compact", daemon=True)
+        self._thread.start()
+        return True
+
+    def _compact(self, cols: Dict[str, np.ndarray], gen: int):
+        tmp = self.path + ".compact"
+        try:
+            body = self._encode(cols)
+            with open(tmp, "wb") as f:
+                f.write(self._header); f.write(body)
+                f.flush(); os.fsync(f.fileno())
+            with self._lock:
+                if gen == self._gen and self._tail is not None:
+                    tail, self._tail = self._tail, None
+                    with open(tmp, "ab") as f:
+                        f.write(b"".join(tail)); f.flush(); os.fsync(f.fileno())
+                    self._close()                  # o próximo append reabre o arquivo novo
+                    os.replace(tmp, self.path)
+                    self.records = len(body) // self.dtype.itemsize + len(tail)
+                    return
+        except OSError:
+            with self._lock:
+                if gen == self._gen: self._tail = None
+        try: os.remove(tmp)                        # falhou ou ficou obsoleta (rewrite no meio)
+        except OSError: pass
+
+    def _close(self):
+        if self._fh is not None:
+            try: self._fh.close()
+            except Exception: pass
+            self._fh = None
+
+    def close(self):
+        th = self._thread
+        if th is not None and th is not threading.current_thread(): th.join()
+        with self._lock: self._close()
@@ -1,31 +1,74 @@
 # replay/main.py
-import os, sys, shutil
-from PySide6 import QtWidgets
-from .config import BUFFER_DIR, EXPORT_DIR, DEFAULT_CAM_INDEXES
-from .ui import ReplayWindow
-from .widgets import CameraSelectDialog
-
-def main():
-    # prepara diretórios
-    if os.path.isdir(BUFFER_DIR):
+from .metrics import METRICS, STARTUP   # primeiro: marca o instante do lançamento
+import argparse, os, sys, shutil, threading
+from typing import List, Optional
+from .config import BUFFER_DIR, PERSIST_BUFFER, EXPORT_DIR, DEFAULT_CAM_INDEXES, SERVER_PORT
+
+def _parse_args(argv: Optional[List[str]]):
+    ap = argparse.ArgumentParser(prog="dualcam-replay", description="Vídeo replay com buffer JPEG em disco.")
+    ap.add_argument("--source", action="append", default=None,
+                    help="fonte de frames: índice de câmera, 'synth[:WxH@FPS][#semente][!]' ou "
+                         "'file:caminho[!]' ('!' = velocidade máxima). Repita para cada câmera.")
+    ap.add_argument("--headless", action="store_true", help="roda captura/buffer/exportação sem janela")
+    ap.add_argument("--seconds", type=float, default=10.0, help="duração da captura no modo headless")
+    ap.add_argument("--export", type=float, default=0.0, metavar="S",
+                    help="headless: exporta os últimos S segundos ao final")
+    ap.add_argument("--json", default=None, help="headless: grava o resumo em JSON neste arquivo")
+    ap.add_argument("--metrics", default=None, metavar="ARQUIVO",
+                    help="liga a instrumentação e grava ARQUIVO.json/.prom periodicamente")
+    ap.add_argument("--serve", type=int, default=SERVER_PORT, metavar="PORTA",
+                    help="serve os frames do buffer em HTTP/WebSocket nesta porta (0 = desligado)")
+    return ap.parse_known_args(argv)
+
+def _preload():
+    """Importa a janela (OpenCV, NumPy, buffer, exportação) enquanto o diálogo de câmeras está aberto."""
+    try: from . import ui   # noqa: F401
+    except Exception: pass   # o erro aparece de novo (e de verdade) na importação da thread principal
+
+def main(argv: Optional[List[str]] = None):
+    args, qt_args = _parse_args(sys.argv[1:] if argv is None else argv)
+    if args.metrics: METRICS.start_dump(args.metrics)
+
+    if args.headless:
+        from .headless import main_headless
+        sources = args.source or ["synth#0", "synth#1"]
+        rc = main_headless(sources, args.seconds, args.export, args.json, args.serve)
+        if args.metrics: METRICS.stop_dump()   # último dump com o estado final
+        sys.exit(rc)
+
+    # as importações pesadas correm em paralelo com a criação da aplicação e o diálogo
+    preload = threading.Thread(target=_preload, name="preload", daemon=True)
+    preload.start()
+    from PySide6 import QtWidgets
+
+    # prepara diretórios (o modo persistente reaproveita o buffer da execução anterior)
+    if os.path.isdir(BUFFER_DIR) and not PERSIST_BUFFER:
         try: shutil.rmtree(BUFFER_DIR)
         except Exception: pass
     os.makedirs(BUFFER_DIR, exist_ok=True)
     os.makedirs(EXPORT_DIR, exist_ok=True)
 
-    app = QtWidgets.QApplication(sys.argv)
+    app = QtWidgets.QApplication(sys.argv[:1] + qt_args)
 
-    # seleção inicial de câmeras
-    dlg = CameraSelectDialog()
-    chosen = None
-    if dlg.exec() == QtWidgets.QDialog.DialogCode.Accepted:
-        chosen = getattr(dlg, "_res", None)
+    # seleção inicial de câmeras (pulada se as fontes vieram pela linha de comando)
+    chosen = tuple(args.source) if args.source else None
+    if not chosen:
+        from .widgets import CameraSelectDialog
+        dlg = CameraSelectDialog()
+        dlg.show(); STARTUP.mark("dialog")
+        if dlg.exec() == QtWidgets.QDialog.DialogCode.Accepted:
+            chosen = getattr(dlg, "_res", None)
+        STARTUP.mark("selected")
     if not chosen:
         chosen = tuple(DEFAULT_CAM_INDEXES)
 
-    w = ReplayWindow(chosen)
-    w.show()
+    preload.join()
+    from .ui import ReplayWindow
+    STARTUP.mark("imports")
+    w = ReplayWindow(chosen, serve_port=args.serve)
+    w.show(); STARTUP.mark("window")
     app.exec()
+    if args.metrics: METRICS.stop_dump()
 
 if __name__ == "__main__":
     main()
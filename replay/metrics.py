@@ -0,0 +1,164 @@
+# replay/metrics.py
+"""Instrumentação: histogramas de latência por etapa e por câmera.
+
+Uso nos caminhos quentes (custo de um atributo quando desligado):
+
+    t0 = perf_counter() if METRICS.enabled else 0.0
+    ...
+    if t0: METRICS.observe("decode", cam, perf_counter() - t0)
+"""
+import bisect, json, os, threading, time
+from time import perf_counter
+from typing import Dict, List, Optional, Tuple
+
+from .config import METRICS_ENABLED, METRICS_DUMP_SECONDS
+
+# limites dos baldes (s): 1 µs .. ~16 s, 4 baldes por oitava (~19% de resolução)
+BOUNDS: List[float] = [1e-6 * 2 ** (i / 4) for i in range(4 * 24 + 1)]
+
+class Histogram:
+    """Histograma logarítmico de durações (segundos)."""
+    __slots__ = ("counts", "count", "sum", "max", "_lock")
+
+    def __init__(self):
+        self.counts = [0] * (len(BOUNDS) + 1)
+        self.count = 0; self.sum = 0.0; self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, v: float):
+        i = bisect.bisect_left(BOUNDS, v)
+        with self._lock:
+            self.counts[i] += 1; self.count += 1; self.sum += v
+            if v > self.max: self.max = v
+
+    def percentile(self, q: float) -> float:
+        """Limite superior do balde que contém o percentil q (0..100), limitado ao máximo visto."""
+        with self._lock: counts, n, mx = list(self.counts), self.count, self.max
+        if n == 0: return 0.0
+        need, acc = q / 100.0 * n, 0
+        for i, c in enumerate(counts):
+            acc += c
+            if acc >= need: return min(BOUNDS[i] if i < len(BOUNDS) else mx, mx)
+        return mx
+
+    def summary(self) -> dict:
+        n = self.count
+        return {"count": n, "mean_ms": round(self.sum / n * 1000.0, 3) if n else 0.0,
+                "p50_ms": round(self.percentile(50) * 1000.0, 3), "p90_ms": round(self.percentile(90) * 1000.0, 3),
+                "p99_ms": round(self.percentile(99) * 1000.0, 3), "max_ms": round(self.max * 1000.0, 3)}
+
+class Metrics:
+    """Registro global de histogramas (etapa, câmera). Desligado, `observe` não faz nada."""
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self._h: Dict[Tuple[str, str], Histogram] = {}
+        self._lock = threading.Lock()
+        self._dumper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def observe(self, stage: str, cam, seconds: float):
+        if not self.enabled: return
+        key = (stage, str(cam))
+        h = self._h.get(key)
+        if h is None:
+            with self._lock: h = self._h.setdefault(key, Histogram())
+        h.observe(seconds)
+
+    def histogram(self, stage: str, cam) -> Optional[Histogram]:
+        return self._h.get((stage, str(cam)))
+
+    def reset(self):
+        with self._lock: self._h.clear()
+
+    def snapshot(self) -> Dict[str, Dict[str, dict]]:
+        """{etapa: {câmera: {count, mean_ms, p50_ms, p90_ms, p99_ms, max_ms}}}."""
+        with self._lock: items = sorted(self._h.items())
+        out: Dict[str, Dict[str, dict]] = {}
+        for (stage, cam), h in items:
+            out.setdefault(stage, {})[cam] = h.summary()
+        return out
+
+    def to_json(self) -> str:
+        return json.dumps({"time": time.time(), "stages": self.snapshot()}, indent=2)
+
+    def to_prometheus(self) -> str:
+        """Formato texto do Prometheus (histograma cumulativo, baldes por oitava)."""
+        lines = ["# HELP replay_stage_seconds Latência por etapa do pipeline de replay.",
+                 "# TYPE replay_stage_seconds histogram"]
+        with self._lock: items = sorted(self._h.items())
+        for (stage, cam), h in items:
+            with h._lock: counts, n, total = list(h.counts), h.count, h.sum
+            lab = f'stage="{stage}",cam="{cam}"'
+            acc = 0
+            for i, c in enumerate(counts[:-1]):
+                acc += c
+                if i % 4 == 0: lines.append(f'replay_stage_seconds_bucket{{{lab},le="{BOUNDS[i]:.6g}"}} {acc}')
+            lines.append(f'replay_stage_seconds_bucket{{{lab},le="+Inf"}} {n}')
+            lines.append(f"replay_stage_seconds_sum{{{lab}}} {total:.9g}")
+            lines.append(f"replay_stage_seconds_count{{{lab}}} {n}")
+        return "\n".join(lines) + "\n"
+
+    def dump(self, path: str):
+        """Grava `path` (.json) e o mesmo nome com .prom, com troca atômica."""
+        base = os.path.splitext(path)[0]
+        for p, text in ((base + ".json", self.to_json()), (base + ".prom", self.to_prometheus())):
+            tmp = p + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f: f.write(text)
+            os.replace(tmp, p)
+
+    def start_dump(self, path: str, every: float = METRICS_DUMP_SECONDS):
+        """Liga a coleta e grava o dump a cada `every` segundos numa thread daemon."""
+        self.enabled = True
+        if self._dumper is not None: return
+        self._stop.clear()
+        def loop():
+            while not self._stop.wait(every):
+                try: self.dump(path)
+                except Exception as e: print(f"[METRICS] Falha ao gravar '{path}': {e}")
+            try: self.dump(path)
+            except Exception: pass
+        self._dumper = threading.Thread(target=loop, name="metrics-dump", daemon=True)
+        self._dumper.start()
+
+    def stop_dump(self):
+        self._stop.set()
+        if self._dumper is not None: self._dumper.join(2.0); self._dumper = None
+
+    def format_table(self, stages: Optional[List[str]] = None) -> str:
+        """Tabela curta (overlay da UI): etapa, câmera, p50/p99/máx em ms e contagem."""
+        snap = self.snapshot()
+        rows = [f"{'etapa':<16}{'cam':>5}{'p50':>8}{'p99':>8}{'máx':>8}{'n':>8}"]
+        for stage in (stages or sorted(snap)):
+            for cam, s in snap.get(stage, {}).items():
+                rows.append(f"{stage:<16}{cam:>5}{s['p50_ms']:>8.2f}{s['p99_ms']:>8.2f}{s['max_ms']:>8.1f}{s['count']:>8}")
+        return "\n".join(rows)
+
+METRICS = Metrics()
+
+class StartupClock:
+    """Marcos da inicialização em ms desde o lançamento (importação deste módulo, que `main`
+    faz antes de tudo) até o primeiro frame na tela. Cada marco vale só na primeira vez."""
+    def __init__(self):
+        self.t0 = perf_counter()
+        self.marks: Dict[str, float] = {}
+
+    def mark(self, name: str) -> bool:
+        if name in self.marks: return False
+        self.marks[name] = round((perf_counter() - self.t0) * 1000.0, 1)
+        return True
+
+    def snapshot(self) -> dict:
+        out = dict(self.marks)
+        # tempo que o usuário passou no diálogo de câmeras não conta como espera da aplicação
+        if "dialog" in out and "selected" in out and "first_frame" in out:
+            out["first_frame_net"] = round(out["first_frame"] - (out["selected"] - out["dialog"]), 1)
+        return out
+
+    def report(self) -> str:
+        return "  ".join(f"{k} {v:.0f} ms" for k, v in self.snapshot().items())
+
+STARTUP = StartupClock()
+
+# ordem das etapas no overlay (do grab ao paint)
+STAGES = ["grab", "retrieve", "resize", "encode", "activity", "write", "index", "evict", "lookup",
+          "decode", "pixmap", "paint", "export_frame"]
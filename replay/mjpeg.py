@@ -0,0 +1,79 @@
+# replay/mjpeg.py
+import struct
+from typing import Tuple
+
+AVIF_HASINDEX = 0x10
+AVIIF_KEYFRAME = 0x10
+
+class MjpegAviWriter:
+    """Escreve JPEGs já codificados direto num AVI (MJPG), sem decodificar nem recodificar.
+
+    Interface parecida com cv2.VideoWriter: write(bytes_jpeg) / release() / isOpened().
+    Os tamanhos do cabeçalho são corrigidos no release(); índice idx1 no final.
+    """
+    def __init__(self, path: str, fps: float, size: Tuple[int, int]):
+        self.path = path
+        self.fps = float(fps)
+        self.size = size
+        self._index = []        # (offset relativo a 'movi', tamanho)
+        self._max_chunk = 0
+        self._f = open(path, "wb")
+        self._write_headers()
+
+    def isOpened(self) -> bool: return self._f is not None
+
+    def _write_headers(self):
+        W, H = self.size
+        rate, scale = int(round(self.fps * 1000)), 1000
+        f = self._f
+        f.write(b"RIFF" + struct.pack("<I", 0) + b"AVI ")
+        hdrl_start = f.tell()
+        f.write(b"LIST" + struct.pack("<I", 0) + b"hdrl")
+        # avih
+        f.write(b"avih" + struct.pack("<I", 56))
+        self._avih_pos = f.tell()
+        f.write(struct.pack("<IIIIIIIIII4I", int(round(1e6 / self.fps)), 0, 0, AVIF_HASINDEX,
+                            0, 0, 1, 0, W, H, 0, 0, 0, 0))
+        # strl
+        strl_start = f.tell()
+        f.write(b"LIST" + struct.pack("<I", 0) + b"strl")
+        f.write(b"strh" + struct.pack("<I", 56))
+        self._strh_pos = f.tell()
+        f.write(b"vids" + b"MJPG" + struct.pack("<IHHIIIIIIIIhhhh", 0, 0, 0, 0, scale, rate, 0,
+                                                0, 0, 0xFFFFFFFF, 0, 0, 0, W, H))
+        f.write(b"strf" + struct.pack("<I", 40))
+        f.write(struct.pack("<IiiHH4sIiiII", 40, W, H, 1, 24, b"MJPG", W * H * 3, 0, 0, 0, 0))
+        self._patch_list(strl_start)
+        self._patch_list(hdrl_start)
+        self._movi_start = f.tell()
+        f.write(b"LIST" + struct.pack("<I", 0) + b"movi")
+
+    def _patch_list(self, start: int):
+        end = self._f.tell()
+        self._f.seek(start + 4); self._f.write(struct.pack("<I", end - start - 8)); self._f.seek(end)
+
+    def write(self, jpeg):
+        """Anexa um frame (bytes JPEG) como chunk '00dc'."""
+        data = memoryview(jpeg).cast("B")
+        n = len(data)
+        f = self._f
+        self._index.append((f.tell() - (self._movi_start + 8), n))
+        f.write(b"00dc" + struct.pack("<I", n)); f.write(data)
+        if n & 1: f.write(b"\0")
+        self._max_chunk = max(self._max_chunk, n)
+
+    def release(self):
+        f = self._f
+        if f is None: return
+        self._patch_list(self._movi_start)
+        f.write(b"idx1" + struct.pack("<I", 16 * len(self._index)))
+        for off, n in self._index:
+            f.write(b"00dc" + struct.pack("<III", AVIIF_KEYFRAME, off, n))
+        end = f.tell()
+        nframes = len(self._index)
+        f.seek(4); f.write(struct.pack("<I", end - 8))
+        f.seek(self._avih_pos + 16); f.write(struct.pack("<I", nframes))
+        f.seek(self._avih_pos + 28); f.write(struct.pack("<I", self._max_chunk))
+        f.seek(self._strh_pos + 32); f.write(struct.pack("<II", nframes, self._max_chunk))
+        f.close()
+        self._f = None
@@ -0,0 +1,95 @@
+# replay/playback.py
+import math
+from typing import Dict, Optional, Sequence, Tuple
+from .config import PLAYBACK_FPS, WRITE_FPS, SHUTTLE_SPEEDS, PLAYBACK_DECODE_BUDGET_MS, PLAYBACK_MIN_FPS
+
+class PlaybackClock:
+    """Relógio da reprodução na UI: shuttle (J/K/L, ±0,25..16x), jog e plano de frames por tick.
+
+    O tempo de mídia avança pelo tempo de parede. A cada tick o plano estima quanto custa
+    apresentar um conjunto novo de frames (soma, entre as câmeras visíveis, do custo de
+    decodificação medido em cada buffer), passa para os proxies quando o frame cheio não
+    cabe no orçamento e, se ainda não couber, dizima: só os instantes de uma grade regular
+    (passo `stride` na mídia, múltiplo inteiro do tick) são apresentados. É a mesma grade que
+    o prefetch decodifica com antecedência. Frame que não fica pronto até o fim do orçamento
+    conta como descartado e o painel mantém o anterior.
+    """
+    def __init__(self, fps: float = PLAYBACK_FPS, source_fps: float = WRITE_FPS,
+                 budget_ms: float = PLAYBACK_DECODE_BUDGET_MS, min_fps: float = PLAYBACK_MIN_FPS,
+                 speeds: Sequence[float] = SHUTTLE_SPEEDS):
+        self.fps = max(1.0, float(fps))
+        self.source_fps = max(1.0, float(source_fps))
+        self.budget_ms = max(0.0, float(budget_ms))
+        self.min_fps = max(1.0, min(float(min_fps), self.fps))
+        self.speeds = sorted(float(s) for s in speeds)
+        self.speed = 1.0
+        self.direction = +1
+        # último plano (para o prefetch e o overlay)
+        self.present_fps = self.fps
+        self.proxy = False
+        self.presented = 0        # frames novos exibidos (por câmera)
+        self.dropped = 0          # frames planejados que não ficaram prontos a tempo
+        self.skipped = 0          # frames de origem passados sem exibir (dizimação e descartes)
+        self._last_no: Dict[int, int] = {}
+
+    # --- controles ---
+    def set_speed(self, speed: float) -> float:
+        self.speed = min(self.speeds[-1], max(self.speeds[0], float(speed)))
+        return self.speed
+
+    def shuttle(self, direction: int) -> float:
+        """J/L: repetir a tecla no mesmo sentido dobra a velocidade (até o topo da escada);
+        trocar de sentido volta para 1x."""
+        direction = 1 if direction >= 0 else -1
+        if direction != self.direction or self.speed < 1.0:
+            self.direction = direction; return self.set_speed(1.0)
+        faster = [s for s in self.speeds if s > self.speed]
+        return self.set_speed(faster[0] if faster else self.speed)
+
+    def label(self) -> str:
+        return f"{'◀' if self.direction < 0 else '▶'} {self.speed:g}x"
+
+    # --- plano por tick ---
+    def advance(self, ts: float, dt: float, lo: float, hi: float) -> float:
+        return max(lo, min(hi, ts + dt * self.speed * self.direction))
+
+    def plan(self, ts: float, cost_full: float, cost_proxy: float, scrub: bool = False) -> Tuple[float, bool]:
+        """Instante a apresentar e se usa proxies, dado o custo (ms) de um conjunto de frames.
+
+        Custo 0 (ainda não medido) é otimista: o primeiro frame decodificado já corrige.
+        """
+        wanted = min(self.fps, self.source_fps * self.speed)      # frames de origem novos por segundo
+        per_sec = self.budget_ms * self.fps                        # ms de decodificação por segundo
+        proxy = scrub or self.speed >= 2.0 or (self.budget_ms > 0 and cost_full * wanted > per_sec)
+        cost = cost_proxy if proxy else cost_full
+        rate = wanted if cost <= 0 or self.budget_ms <= 0 else min(wanted, per_sec / cost)
+        rate = max(rate, min(self.min_fps, wanted))
+        if rate >= wanted - 1e-6:
+            self.present_fps = wanted
+        else:
+            # grade em ticks inteiros: um frame novo a cada k ticks, estável enquanto o custo oscila
+            self.present_fps = self.fps / max(1, math.ceil(self.fps / rate - 1e-6))
+        self.proxy = proxy
+        if self.present_fps >= self.source_fps * self.speed - 1e-6:
+            return ts, proxy                                       # todos os frames de origem cabem
+        stride = self.speed / self.present_fps
+        return math.floor(ts / stride + 0.5) * stride, proxy
+
+    # --- contagem ---
+    def presented_frame(self, cam: int, no: Optional[int]):
+        self.presented += 1
+        last = self._last_no.get(cam)
+        if no is None or no < 0: return
+        if last is not None: self.skipped += max(0, abs(no - last) - 1)
+        self._last_no[cam] = no
+
+    def dropped_frame(self): self.dropped += 1
+
+    def seek(self):
+        """Salto (slider, evento, passo): o intervalo até o frame novo não conta como pulado."""
+        self._last_no.clear()
+
+    def stats(self) -> dict:
+        return {"speed": self.speed * self.direction, "present_fps": round(self.present_fps, 1),
+                "proxy": self.proxy, "presented": self.presented, "dropped": self.dropped,
+                "skipped": self.skipped}
@@ -0,0 +1,127 @@
+# replay/rolling.py
+import threading, time
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import cv2
+from PySide6 import QtCore
+from .config import (PLAYBACK_FPS, EXPORT_SIZE, JPEG_QUALITY, EXPORT_PASSTHROUGH, ROLLING_SECONDS,
+                     ROLLING_CHUNK_SECONDS)
+from .export import Compositor, GRID_VIEW, background_priority
+
+class RollingEncoder(QtCore.QThread):
+    """Mantém os últimos `seconds` de cada saída já codificados em MJPEG, em blocos curtos.
+
+    Os frames seguem a grade absoluta `n / fps` (bloco k = frames [k*F, (k+1)*F)), a mesma
+    que a exportação usa ao receber o encoder; um bloco só é codificado quando a linha do
+    tempo já passou do seu fim, e blocos mais velhos que a janela são descartados. Frames
+    de origem repetidos (30 fps de saída sobre 20 fps de buffer) reaproveitam o JPEG anterior.
+    Roda com prioridade mínima para nunca disputar CPU com a captura. Por padrão mantém a
+    grade e, sem EXPORT_PASSTHROUGH, também as câmeras únicas (que então seriam recodificadas).
+    """
+    def __init__(self, rings: Sequence, timeline, views: Optional[Sequence[int]] = None,
+                 seconds: float = ROLLING_SECONDS, chunk_seconds: float = ROLLING_CHUNK_SECONDS,
+                 fps: int = PLAYBACK_FPS, size: Tuple[int, int] = EXPORT_SIZE,
+                 quality: int = JPEG_QUALITY, parent=None):
+        super().__init__(parent)
+        self.rings = list(rings)
+        self.timeline = timeline
+        if views is None:
+            views = [GRID_VIEW] + ([] if EXPORT_PASSTHROUGH else list(range(1, len(self.rings) + 1)))
+        self.views = list(views)
+        self.seconds = float(seconds)
+        self.fps = max(1, int(fps))
+        self.size = tuple(size)
+        self.quality = int(quality)
+        self.per_chunk = max(1, int(round(chunk_seconds * self.fps)))   # F
+        self._chunks: Dict[int, Dict[int, List]] = {vm: {} for vm in self.views}
+        self._lock = threading.Lock()
+        self._running = True
+        self._next: Optional[int] = None
+        self.encoded = 0          # frames codificados (JPEG novo)
+        self.reused = 0           # frames que repetiram o JPEG anterior
+        self.busy_s = 0.0
+
+    def stop(self): self._running = False
+
+    # --- consulta (exportação) ---
+    def matches(self, fps: int, size: Tuple[int, int]) -> bool:
+        return int(fps) == self.fps and tuple(size) == self.size
+
+    def frames(self, view: int, fnos) -> List[Optional[object]]:
+        """JPEG de cada frame absoluto (None se ainda não codificado ou fora da janela)."""
+        F = self.per_chunk
+        with self._lock:
+            chunks = self._chunks.get(view, {})
+            out = []
+            for f in fnos:
+                c = chunks.get(int(f) // F)
+                out.append(c[int(f) % F] if c is not None else None)
+            return out
+
+    def stats(self) -> dict:
+        with self._lock:
+            ks = sorted(self._chunks[self.views[0]]) if self.views else []
+        F = self.per_chunk
+        return {"chunks": len(ks), "window_s": round(len(ks) * F / self.fps, 1),
+                "live_lag_s": round(self._lag(ks), 2), "encoded": self.encoded, "reused": self.reused,
+                "busy_s": round(self.busy_s, 3)}
+
+    def _lag(self, ks) -> float:
+        latest = self.timeline.latest_ts()
+        if latest is None or not ks: return 0.0
+        return max(0.0, latest - (ks[-1] + 1) * self.per_chunk / self.fps)
+
+    # --- codificação em segundo plano ---
+    def run(self):
+        background_priority()
+        comps = {vm: Compositor(vm, self.size, len(self.rings)) for vm in self.views}
+        while self._running:
+            latest = self.timeline.latest_ts()
+            if latest is None:
+                time.sleep(0.1); continue
+            F = self.per_chunk
+            # bloco pronto: o frame seguinte ao seu fim já passou da linha do tempo (nearest estável)
+            ready = int(np.floor((latest - 0.5) * self.fps)) // F
+            oldest = self.timeline.oldest_ts()
+            if oldest is None: oldest = latest      # (não `or`: 0.0 é um instante válido)
+            first = int(np.floor(max(latest - self.seconds, oldest) * self.fps)) // F
+            if self._next is None or self._next < first: self._next = first
+            self._trim(first)
+            if self._next >= ready:
+                time.sleep(0.1); continue
+            t0 = time.perf_counter()
+            self._encode_chunk(self._next, comps)
+            self.busy_s += time.perf_counter() - t0
+            self._next += 1
+
+    def _encode_chunk(self, k: int, comps: Dict[int, Compositor]):
+        F = self.per_chunk
+        ts = (k * F + np.arange(F)) / self.fps
+        need = sorted(set(i for c in comps.values() for i in c.sources()))
+        refs = self.timeline.at_many(ts, need)
+        n = len(self.rings)
+        keys = [None] * n; bgr = [None] * n
+        out = {vm: [] for vm in comps}
+        last = {vm: (None, None) for vm in comps}
+        params = [int(cv2.IMWRITE_JPEG_QUALITY), self.quality]
+        for j in range(F):
+            if not self._running: return
+            for i in need:
+                r = refs[i][j]
+                key = r.key if r is not None else None
+                if key != keys[i]:
+                    bgr[i] = self.rings[i].load_bgr(r) if r is not None else None; keys[i] = key
+            for vm, comp in comps.items():
+                sig = tuple(keys[i] for i in comp.sources())
+                if sig == last[vm][0]:
+                    out[vm].append(last[vm][1]); self.reused += 1; continue
+                ok, enc = cv2.imencode(".jpg", comp.compose(bgr), params)
+                data = enc if ok else None
+                last[vm] = (sig, data); out[vm].append(data); self.encoded += 1
+        with self._lock:
+            for vm, lst in out.items(): self._chunks[vm][k] = lst
+
+    def _trim(self, first: int):
+        with self._lock:
+            for chunks in self._chunks.values():
+                for k in [k for k in chunks if k < first]: del chunks[k]
@@ -0,0 +1,214 @@
+# replay/segments.py
+import os, mmap, threading
+from typing import List, Optional
+
+class Segment:
+    """Arquivo append-only com JPEGs concatenados (um MJPEG cru) de duração fixa."""
+    def __init__(self, seg_id: int, path: str, start_ts: float, existing: bool = False):
+        self.id = seg_id
+        self.path = path
+        self.start_ts = start_ts
+        self.count = 0        # linhas do índice gravadas enquanto este era o segmento corrente
+        self.refs = 0         # linhas do índice que apontam para bytes deste segmento
+        self.nbytes = 0       # bytes gravados (offset do próximo frame)
+        self.sealed = existing
+        # existing: segmento recuperado de uma execução anterior (somente leitura)
+        self._fh = None if existing else open(path, "wb")
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_len = 0
+        self._rf = None       # arquivo aberto para ler a cauda ainda não mapeada
+        self._closed = False
+        self._mm_lock = threading.Lock()
+
+    # --- escrita (somente thread de captura) ---
+    def append(self, data) -> int:
+        off = self.nbytes
+        self._fh.write(data)
+        self._fh.flush()  # leitores via mmap precisam enxergar os bytes
+        self.nbytes += len(data)
+        return off
+
+    @classmethod
+    def reopen(cls, seg_id: int, path: str, start_ts: float, count: int, refs: int) -> "Segment":
+        seg = cls(seg_id, path, start_ts, existing=True)
+        seg.count = int(count); seg.refs = int(refs); seg.nbytes = os.path.getsize(path)
+        return seg
+
+    def seal(self):
+        if self.sealed: return
+        self.sealed = True
+        try: self._fh.close()
+        except Exception: pass
+
+    # --- leitura via mmap ---
+    def _remap(self, need: int) -> bool:
+        # segmento vivo cresce a cada frame: remapeia só quando o arquivo dobrou desde o último
+        # mapa (O(log n) mmaps por segmento); até lá a cauda é lida do arquivo (`_read_tail`)
+        size = self.nbytes          # bytes já gravados e flushados pelo escritor
+        if size < need or size == 0: return False
+        if self._mm is not None and not self.sealed and size < 2 * self._mm_len: return False
+        with open(self.path, "rb") as f:
+            mm = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+        old, self._mm, self._mm_len = self._mm, mm, size
+        if old is not None:
+            try: old.close()
+            except Exception: pass
+        return True
+
+    def _read_tail(self, offset: int, length: int) -> Optional[bytes]:
+        if offset + length > self.nbytes: return None
+        if self._rf is None: self._rf = open(self.path, "rb")
+        self._rf.seek(offset)                   # sob `_mm_lock`: seek + read atômicos
+        data = self._rf.read(length)
+        return data if len(data) == length else None
+
+    def read(self, offset: int, length: int) -> Optional[bytes]:
+        end = offset + length
+        with self._mm_lock:
+            if self._closed: return None
+            if end > self._mm_len and not self._remap(end): return self._read_tail(offset, length)
+            return self._mm[offset:end]
+
+    def read_into(self, offset: int, length: int, out) -> bool:
+        """Copia os bytes para `out` (buffer gravável) sem alocar; False se indisponível."""
+        end = offset + length
+        with self._mm_lock:
+            if self._closed: return False
+            if end > self._mm_len and not self._remap(end):
+                data = self._read_tail(offset, length)
+                if data is None: return False
+                out[:length] = data
+                return True
+            with memoryview(self._mm) as mv:
+                out[:length] = mv[offset:end]
+            return True
+
+    def close(self, remove: bool = True):
+        self.seal()
+        with self._mm_lock:
+            self._closed = True
+            if self._mm is not None:
+                try: self._mm.close()
+                except Exception: pass
+                self._mm = None
+            if self._rf is not None:
+                try: self._rf.close()
+                except OSError: pass
+                self._rf = None
+        if remove:
+            try: os.remove(self.path)
+            except Exception: pass
+
+class HotArena:
+    """Memória pré-alocada (mmap anônimo) dividida em blocos para os segmentos da camada quente.
+
+    O teto é fixo; sem bloco livre (spill atrasado), `alloc` entrega um bloco avulso fora
+    da arena e conta em `overflow`.
+    """
+    BLOCK = 4 << 20
+
+    def __init__(self, max_bytes: int, block: int = BLOCK):
+        self.block = int(block)
+        self.blocks = max(2, int(max_bytes) // self.block)
+        self._mm = mmap.mmap(-1, self.blocks * self.block)   # páginas só ocupam RAM ao serem tocadas
+        mv = memoryview(self._mm)
+        self._free: List[memoryview] = [mv[i * self.block:(i + 1) * self.block] for i in range(self.blocks)]
+        self._lock = threading.Lock()
+        self.overflow = 0
+
+    def alloc(self) -> memoryview:
+        with self._lock:
+            if self._free: return self._free.pop()
+            self.overflow += 1
+        return memoryview(bytearray(self.block))
+
+    def release(self, blocks: List[memoryview]):
+        with self._lock:
+            self._free.extend(b for b in blocks if b.obj is self._mm)
+
+    def free_fraction(self) -> float:
+        with self._lock: return len(self._free) / self.blocks
+
+    @property
+    def max_bytes(self) -> int: return self.blocks * self.block
+
+class MemSegment(Segment):
+    """Segmento da camada quente: bytes em blocos da HotArena, mesmos offsets do arquivo.
+
+    `spill()` (thread de spill, só depois de selado) grava os bytes no arquivo do segmento e
+    devolve os blocos; a partir daí as leituras seguem pelo mmap do arquivo, sem que os
+    leitores percebam a troca.
+    """
+    def __init__(self, seg_id: int, path: str, start_ts: float, arena: HotArena):
+        super().__init__(seg_id, path, start_ts, existing=True)   # sem arquivo até o spill
+        self.sealed = False
+        self.arena = arena
+        self.hot = True
+        self._blocks: List[memoryview] = []
+
+    def append(self, data) -> int:
+        off = self.nbytes
+        mv = memoryview(data).cast("B")
+        n, B, pos = len(mv), self.arena.block, 0
+        while pos < n:
+            bi, bo = divmod(off + pos, B)
+            if bi == len(self._blocks): self._blocks.append(self.arena.alloc())
+            k = min(n - pos, B - bo)
+            self._blocks[bi][bo:bo + k] = mv[pos:pos + k]
+            pos += k
+        self.nbytes += n
+        return off
+
+    def seal(self): self.sealed = True
+
+    def _copy(self, offset: int, length: int, out):
+        B, pos = self.arena.block, 0
+        while pos < length:
+            bi, bo = divmod(offset + pos, B)
+            k = min(length - pos, B - bo)
+            out[pos:pos + k] = self._blocks[bi][bo:bo + k]
+            pos += k
+
+    def read(self, offset: int, length: int) -> Optional[bytes]:
+        with self._mm_lock:
+            if self.hot and not self._closed:
+                if offset + length > self.nbytes: return None
+                out = bytearray(length); self._copy(offset, length, out)
+                return bytes(out)
+        return super().read(offset, length)
+
+    def read_into(self, offset: int, length: int, out) -> bool:
+        with self._mm_lock:
+            if self.hot and not self._closed:
+                if offset + length > self.nbytes: return False
+                self._copy(offset, length, out)
+                return True
+        return super().read_into(offset, length, out)
+
+    def spill(self) -> bool:
+        """Grava o segmento (selado) no disco e libera os blocos da arena."""
+        if not self.sealed or not self.hot or self._closed: return False
+        try:
+            with open(self.path, "wb") as f:
+                left = self.nbytes
+                for b in self._blocks:
+                    k = min(left, len(b)); f.write(b[:k]); left -= k
+                    if left <= 0: break
+        except OSError:
+            return False
+        with self._mm_lock:
+            if self._closed:
+                try: os.remove(self.path)
+                except OSError: pass
+                return False
+            self.hot = False
+            blocks, self._blocks = self._blocks, []
+        self.arena.release(blocks)
+        return True
+
+    def close(self, remove: bool = True):
+        with self._mm_lock:
+            self._closed = True
+            blocks, self._blocks = self._blocks, []
+        super().close(remove)
+        self.arena.release(blocks)
@@ -0,0 +1,308 @@
+# replay/server.py
+import asyncio, base64, hashlib, itertools, json, struct, threading, time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from .config import SERVER_HOST, SERVER_PORT, SERVER_FPS, SERVER_BACKLOG_KB
+
+_WS_GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+_WS_MAX_CONTROL = 125     # RFC 6455: ping/pong/close
+_WS_MAX_TEXT = 4096       # comandos JSON do cliente; maior que isso fecha com 1009
+_BOUNDARY = "frame"
+
+def _flag(v) -> bool:
+    """Booleano vindo de JSON ou de query string ("1", "true")."""
+    return v.strip().lower() in ("1", "true", "yes", "on") if isinstance(v, str) else bool(v)
+
+class PlayClock:
+    """Relógio de reprodução de um cliente, igual ao do `_tick` da janela.
+
+    Sem `ts` inicial segue a ponta ao vivo; avança `dt * speed * direction` e fica preso
+    dentro do que o buffer tem.
+    """
+    def __init__(self, ts: Optional[float] = None, speed: float = 1.0, direction: int = 1,
+                 ago: Optional[float] = None):
+        self.ts = ts
+        self.ago = ago            # começa `ago` s antes da ponta (resolvido no primeiro tick)
+        self.speed = max(0.0, float(speed))
+        self.direction = 1 if direction >= 0 else -1
+        self.paused = False
+        self._last = time.monotonic()
+
+    def advance(self, oldest: float, latest: float) -> float:
+        now = time.monotonic(); dt = now - self._last; self._last = now
+        if self.ts is None:
+            self.ts = latest - (self.ago or 0.0); self.ago = None
+        elif not self.paused:
+            self.ts += dt * self.speed * self.direction
+        self.ts = max(oldest, min(latest, self.ts))
+        return self.ts
+
+    def apply(self, cmd: dict):
+        """Comando de controle: seek (ts), ago, speed, dir, pause, live."""
+        if "ts" in cmd: self.ts = float(cmd["ts"])
+        if "ago" in cmd: self.ts = None; self.ago = float(cmd["ago"])
+        if _flag(cmd.get("live")): self.ts = None; self.ago = 0.0; self.paused = False
+        if "speed" in cmd: self.speed = max(0.0, float(cmd["speed"]))
+        if "dir" in cmd: self.direction = 1 if float(cmd["dir"]) >= 0 else -1
+        if "pause" in cmd: self.paused = _flag(cmd["pause"])
+        self._last = time.monotonic()
+
+    def state(self) -> dict:
+        return {"ts": self.ts, "speed": self.speed, "dir": self.direction, "paused": self.paused}
+
+class ReplayServer:
+    """Servidor HTTP/WebSocket (asyncio, numa thread própria) que entrega os JPEGs do buffer
+    como estão gravados, sem decodificar nem recodificar.
+
+    - `GET /cams`: câmeras, janela e contadores (JSON)
+    - `GET /frame/N?ts=|ago=&proxy=1`: um JPEG da câmera N (1..n)
+    - `GET /stream/N?ts=|ago=&speed=&dir=&fps=&proxy=1`: MJPEG multipart (`X-Client-Id`)
+    - `GET /control/ID?ts=|ago=|live=1&speed=&dir=&pause=`: muda o relógio de um stream
+    - `GET /ws/N`: WebSocket; comandos JSON do cliente, frames em mensagens binárias
+      (cada uma precedida de um texto `{"ts": ...}`)
+
+    Cada cliente tem o seu relógio (`PlayClock`). Cliente lento não acumula fila: enquanto
+    o socket tem mais de `backlog_kb` pendentes os frames são pulados e ele recebe o mais
+    novo quando esvaziar. Os bytes JPEG lidos do buffer são compartilhados entre clientes.
+    """
+    def __init__(self, rings: Sequence, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                 fps: float = SERVER_FPS, backlog_kb: int = SERVER_BACKLOG_KB):
+        self.rings = list(rings)
+        self.host = host
+        self.port = int(port)
+        self.fps = max(1.0, float(fps))
+        self.backlog = int(backlog_kb) * 1024
+        self._jpegs: "OrderedDict[tuple, bytes]" = OrderedDict()   # (cam, key, proxy) -> bytes
+        self._clocks: Dict[int, PlayClock] = {}
+        self._ids = itertools.count(1)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.error: Optional[str] = None
+        # contadores
+        self.clients = 0
+        self.requests = 0
+        self.sent = 0
+        self.dropped = 0
+        self.bytes_sent = 0
+        self.reads = 0            # JPEGs lidos do buffer (o resto veio do cache compartilhado)
+
+    # --- ciclo de vida ---
+    def start(self) -> bool:
+        """Sobe o servidor numa thread daemon; False (e `error`) se a porta não abriu."""
+        self._thread = threading.Thread(target=self._run, name="replay-server", daemon=True)
+        self._thread.start()
+        self._ready.wait(5.0)
+        if self.error: print(f"[SERVER] Falha ao abrir {self.host}:{self.port}: {self.error}")
+        else: print(f"[SERVER] http://{self.host}:{self.port}/cams")
+        return self.error is None
+
+    def _run(self):
+        loop = self._loop = asyncio.new_event_loop()
+        try:
+            self._server = loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]   # porta 0 = escolhida pelo SO
+        except OSError as e:
+            self.error = str(e); self._ready.set(); loop.close(); return
+        self._ready.set()
+        try: loop.run_forever()
+        finally:
+            self._server.close()
+            loop.run_until_complete(self._server.wait_closed())
+            for t in asyncio.all_tasks(loop): t.cancel()
+            loop.run_until_complete(asyncio.sleep(0))
+            loop.close()
+
+    def stop(self):
+        if self._loop is not None and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread is not None: self._thread.join(2.0)
+
+    def stats(self) -> dict:
+        return {"port": self.port, "clients": self.clients, "requests": self.requests, "sent": self.sent,
+                "dropped": self.dropped, "bytes_sent": self.bytes_sent, "jpeg_reads": self.reads}
+
+    # --- frames ---
+    def _ring(self, cam: int):
+        return self.rings[cam - 1] if 1 <= cam <= len(self.rings) else None
+
+    def _pick(self, ring, clock: PlayClock):
+        lo, hi = ring.oldest_ts(), ring.latest_ts()
+        if lo is None: return None
+        return ring.nearest(clock.advance(lo, hi))
+
+    def _jpeg(self, cam: int, ring, ref, proxy: bool) -> Optional[bytes]:
+        key = (cam, id(ring), ref.key, proxy and ref.proxy is not None)
+        data = self._jpegs.get(key)
+        if data is None:
+            data = ring.load_jpeg(ref, proxy)
+            if data is None: return None
+            self.reads += 1
+            self._jpegs[key] = data
+            while len(self._jpegs) > 32 * max(1, len(self.rings)): self._jpegs.popitem(last=False)
+        else:
+            self._jpegs.move_to_end(key)
+        return data
+
+    # --- HTTP ---
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.clients += 1
+        try:
+            try: head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), 10.0)
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError): return
+            lines = head.decode("latin-1").split("\r\n")
+            method, target = (lines[0].split(" ") + ["", ""])[:2]
+            headers = {k.strip().lower(): v.strip() for k, _, v in (l.partition(":") for l in lines[1:] if l)}
+            url = urlsplit(target)
+            q = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split("/") if p]
+            self.requests += 1
+            if method != "GET": return await self._reply(writer, 405, b"GET only\n")
+            route = parts[0] if parts else ""
+            arg = parts[1] if len(parts) > 1 else ""
+            if route == "cams": return await self._cams(writer)
+            if route == "control": return await self._control(writer, arg, q)
+            cam = int(arg) if arg.isdigit() else 0
+            ring = self._ring(cam)
+            if route not in ("frame", "stream", "ws") or ring is None:
+                return await self._reply(writer, 404, b"not found\n")
+            if route == "frame": return await self._frame(writer, cam, ring, q)
+            if route == "stream": return await self._stream(writer, cam, ring, q)
+            return await self._websocket(reader, writer, cam, ring, q, headers)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.clients -= 1
+            try: writer.close()
+            except Exception: pass
+
+    async def _reply(self, writer, status: int, body: bytes, ctype: str = "text/plain", extra: str = ""):
+        reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed"}.get(status, "")
+        writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: {ctype}\r\nContent-Length: {len(body)}\r\n"
+                     f"Cache-Control: no-store\r\nConnection: close\r\n{extra}\r\n".encode() + body)
+        await writer.drain()
+
+    async def _cams(self, writer):
+        out = []
+        for i, r in enumerate(self.rings, 1):
+            out.append({"cam": i, "label": r.label, "frames": len(r), "oldest": r.oldest_ts(), "latest": r.latest_ts()})
+        await self._reply(writer, 200, json.dumps({"cams": out, **self.stats()}).encode(), "application/json")
+
+    async def _control(self, writer, arg: str, q: dict):
+        clock = self._clocks.get(int(arg)) if arg.isdigit() else None
+        if clock is None: return await self._reply(writer, 404, b"no such client\n")
+        try: clock.apply(q)
+        except ValueError: return await self._reply(writer, 400, b"bad value\n")
+        await self._reply(writer, 200, json.dumps(clock.state()).encode(), "application/json")
+
+    @staticmethod
+    def _clock(q: dict) -> PlayClock:
+        return PlayClock(float(q["ts"]) if "ts" in q else None, float(q.get("speed", 1.0)),
+                         int(float(q.get("dir", 1))), float(q["ago"]) if "ago" in q else None)
+
+    async def _frame(self, writer, cam: int, ring, q: dict):
+        try: ref = self._pick(ring, self._clock(q))
+        except ValueError: return await self._reply(writer, 400, b"bad value\n")
+        data = self._jpeg(cam, ring, ref, q.get("proxy") == "1") if ref is not None else None
+        if data is None: return await self._reply(writer, 404, b"no frame\n")
+        self.sent += 1; self.bytes_sent += len(data)
+        await self._reply(writer, 200, data, "image/jpeg", f"X-Timestamp: {ref.ts:.6f}\r\n")
+
+    async def _stream(self, writer, cam: int, ring, q: dict):
+        try:
+            clock = self._clock(q); fps = max(1.0, float(q.get("fps", self.fps)))
+        except ValueError: return await self._reply(writer, 400, b"bad value\n")
+        cid = next(self._ids); self._clocks[cid] = clock
+        proxy = q.get("proxy") == "1"
+        writer.write(f"HTTP/1.1 200 OK\r\nContent-Type: multipart/x-mixed-replace; boundary={_BOUNDARY}\r\n"
+                     f"Cache-Control: no-store\r\nConnection: close\r\nX-Client-Id: {cid}\r\n\r\n".encode())
+        try:
+            async for ref, data in self._frames(writer, cam, ring, clock, fps, proxy):
+                writer.write(f"--{_BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(data)}\r\n"
+                             f"X-Timestamp: {ref.ts:.6f}\r\n\r\n".encode())
+                writer.write(data); writer.write(b"\r\n")
+        finally:
+            self._clocks.pop(cid, None)
+
+    async def _frames(self, writer, cam: int, ring, clock: PlayClock, fps: float, proxy: bool):
+        """Frames a enviar no ritmo `fps`: só quando o frame muda e o socket tem folga."""
+        last = None
+        period = 1.0 / fps
+        transport = writer.transport
+        while not transport.is_closing():
+            t0 = time.monotonic()
+            ref = self._pick(ring, clock)
+            if ref is not None and ref.key != last:
+                if transport.get_write_buffer_size() > self.backlog:
+                    self.dropped += 1   # cliente lento: pula, o próximo tick manda o mais novo
+                else:
+                    data = self._jpeg(cam, ring, ref, proxy)
+                    if data is not None:
+                        last = ref.key
+                        yield ref, data
+                        self.sent += 1; self.bytes_sent += len(data)
+            await asyncio.sleep(max(0.0, period - (time.monotonic() - t0)))
+
+    # --- WebSocket (RFC 6455, só o necessário) ---
+    async def _websocket(self, reader, writer, cam: int, ring, q: dict, headers: dict):
+        key = headers.get("sec-websocket-key")
+        if headers.get("upgrade", "").lower() != "websocket" or not key:
+            return await self._reply(writer, 400, b"websocket upgrade expected\n")
+        accept = base64.b64encode(hashlib.sha1(key.encode() + _WS_GUID).digest()).decode()
+        writer.write(("HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+                      f"Sec-WebSocket-Accept: {accept}\r\n\r\n").encode())
+        try:
+            clock = self._clock(q); fps = max(1.0, float(q.get("fps", self.fps)))
+        except ValueError:
+            clock, fps = PlayClock(), self.fps
+        proxy = q.get("proxy") == "1"
+        commands = asyncio.ensure_future(self._ws_commands(reader, writer, clock))
+        try:
+            async for ref, data in self._frames(writer, cam, ring, clock, fps, proxy):
+                if commands.done(): break
+                writer.write(_ws_frame(0x1, json.dumps({"ts": ref.ts, "cam": cam, "size": ref.size}).encode()))
+                writer.write(_ws_frame(0x2, data))
+        finally:
+            commands.cancel()
+
+    async def _ws_commands(self, reader, writer, clock: PlayClock):
+        """Lê mensagens do cliente: texto JSON = comando do relógio; ping/close do protocolo."""
+        try: await self._ws_read(reader, writer, clock)
+        except (asyncio.IncompleteReadError, ConnectionError): pass
+        writer.close()   # encerra também o laço de envio
+
+    async def _ws_read(self, reader, writer, clock: PlayClock):
+        while True:
+            b0, b1 = await reader.readexactly(2)
+            op, n = b0 & 0x0F, b1 & 0x7F
+            if n == 126: n = struct.unpack(">H", await reader.readexactly(2))[0]
+            elif n == 127: n = struct.unpack(">Q", await reader.readexactly(8))[0]
+            if n > (_WS_MAX_CONTROL if op & 0x8 else _WS_MAX_TEXT):
+                # tamanho vem do cliente: recusa antes de ler (nada de bufferizar 2^63 bytes)
+                writer.write(_ws_frame(0x8, struct.pack(">H", 1009))); return
+            mask = await reader.readexactly(4) if b1 & 0x80 else b""
+            payload = _ws_unmask(await reader.readexactly(n), mask)
+            if op == 0x8:
+                writer.write(_ws_frame(0x8, payload[:2])); return
+            if op == 0x9: writer.write(_ws_frame(0xA, payload)); continue
+            if op == 0x1:
+                try: clock.apply(json.loads(payload))
+                except (ValueError, TypeError, AttributeError): continue
+                writer.write(_ws_frame(0x1, json.dumps(clock.state()).encode()))
+
+def _ws_unmask(data: bytes, mask: bytes) -> bytes:
+    """XOR com a máscara de 4 bytes do cliente, de uma vez (inteiros grandes, sem laço por byte)."""
+    if not mask or not data: return data
+    n = len(data)
+    key = (mask * (n // 4 + 1))[:n]
+    return (int.from_bytes(data, "big") ^ int.from_bytes(key, "big")).to_bytes(n, "big")
+
+def _ws_frame(op: int, payload: bytes) -> bytes:
+    n = len(payload)
+    if n < 126: head = struct.pack(">BB", 0x80 | op, n)
+    elif n < 1 << 16: head = struct.pack(">BBH", 0x80 | op, 126, n)
+    else: head = struct.pack(">BBQ", 0x80 | op, 127, n)
+    return head + payload
@@ -0,0 +1,194 @@
+# replay/sources.py
+import glob, os, sys, time
+from typing import List, Optional, Tuple, Union
+import numpy as np
+import cv2
+
+from .config import CAPTURE_SIZE, SYNTH_FPS
+
+class FrameSource:
+    """Origem de frames da captura.
+
+    `grab()` avança um frame, `retrieve()` o devolve em BGR e `read()` faz os dois.
+    `ts` guarda o timestamp do último grab: relógio de parede para fontes ao vivo
+    ou em tempo real, relógio virtual (início + i/fps) em velocidade máxima.
+    """
+    name = "source"
+    ts: float = 0.0
+    finished = False      # fonte finita (arquivo sem loop) chegou ao fim
+
+    def open(self) -> bool: return True
+    def grab(self) -> bool: raise NotImplementedError
+    def retrieve(self) -> Tuple[bool, Optional[np.ndarray]]: raise NotImplementedError
+    def release(self): pass
+
+    def read(self) -> Tuple[bool, Optional[np.ndarray]]:
+        if not self.grab(): return False, None
+        return self.retrieve()
+
+    def __str__(self): return self.name
+
+def default_backend() -> int:
+    if sys.platform.startswith("win"): return cv2.CAP_DSHOW
+    if sys.platform.startswith("linux"): return cv2.CAP_V4L2
+    return cv2.CAP_ANY
+
+class DeviceSource(FrameSource):
+    """Câmera ao vivo (DirectShow no Windows, V4L2 no Linux)."""
+    def __init__(self, index: int, backend: Optional[int] = None, size: Tuple[int, int] = CAPTURE_SIZE):
+        self.index = int(index)
+        self.backend = default_backend() if backend is None else backend
+        self.size = size
+        self.name = f"cam{self.index}"
+        self.cap = None
+
+    def open(self) -> bool:
+        self.cap = cv2.VideoCapture(self.index, self.backend)
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.size[0])
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.size[1])
+        return self.cap.isOpened()
+
+    def grab(self) -> bool:
+        ok = self.cap.grab()
+        self.ts = time.time()
+        return ok
+
+    def retrieve(self):
+        return self.cap.retrieve()
+
+    def release(self):
+        if self.cap is not None: self.cap.release()
+
+class _PacedSource(FrameSource):
+    """Base para fontes sintéticas/arquivo: tempo real (dorme até o frame) ou velocidade máxima."""
+    def __init__(self, fps: float, realtime: bool):
+        self.fps = max(1e-3, float(fps))
+        self.realtime = realtime
+        self.i = 0
+        self._t0 = None
+
+    def _tick(self):
+        if self._t0 is None: self._t0 = time.time()
+        due = self._t0 + self.i / self.fps
+        if self.realtime:
+            wait = due - time.time()
+            if wait > 0: time.sleep(wait)
+            self.ts = time.time()
+        else:
+            self.ts = due
+        self.i += 1
+
+class SyntheticSource(_PacedSource):
+    """Gerador determinístico: fundo em gradiente, bloco em movimento e contador de frames."""
+    def __init__(self, size: Tuple[int, int] = CAPTURE_SIZE, fps: float = SYNTH_FPS,
+                 realtime: bool = True, seed: int = 0):
+        super().__init__(fps, realtime)
+        self.size = (int(size[0]), int(size[1]))
+        self.seed = int(seed)
+        self.name = f"synth{self.seed}:{self.size[0]}x{self.size[1]}@{self.fps:g}"
+        W, H = self.size
+        rng = np.random.default_rng(self.seed)
+        gx = np.linspace(0, 255, W, dtype=np.float32)[None, :]
+        gy = np.linspace(0, 255, H, dtype=np.float32)[:, None]
+        base = np.empty((H, W, 3), dtype=np.uint8)
+        base[..., 0] = (gx * 0.6 + gy * 0.2).astype(np.uint8)
+        base[..., 1] = (gy * 0.7).astype(np.uint8)
+        base[..., 2] = rng.integers(40, 200)
+        # textura leve para o JPEG ter custo realista
+        base = cv2.add(base, rng.integers(0, 24, (H, W, 3), dtype=np.uint8))
+        self._base = base
+        self._color = tuple(int(c) for c in rng.integers(0, 255, 3))
+
+    def grab(self) -> bool:
+        self._tick(); return True
+
+    def retrieve(self):
+        W, H = self.size
+        n = self.i - 1
+        frame = self._base.copy()
+        bw, bh = max(8, W // 8), max(8, H // 6)
+        x = int((n * 7) % max(1, W - bw)); y = int((H - bh) / 2 * (1 + np.sin(n / 15.0)))
+        cv2.rectangle(frame, (x, y), (x + bw, min(H - 1, y + bh)), self._color, -1)
+        cv2.putText(frame, f"{self.seed}:{n:06d}", (16, max(24, H // 12)), cv2.FONT_HERSHEY_SIMPLEX,
+                    max(0.5, H / 540.0), (255, 255, 255), max(1, H // 360), cv2.LINE_AA)
+        return True, frame
+
+class FileSource(_PacedSource):
+    """Vídeo ou sequência de imagens (diretório ou glob), em tempo real ou velocidade máxima."""
+    def __init__(self, path: str, realtime: bool = True, loop: bool = True, fps: Optional[float] = None):
+        self.path = path
+        self.loop = loop
+        self.name = f"file:{os.path.basename(os.path.normpath(path))}"
+        self._images: List[str] = []
+        self._cap = None
+        self._frame = None
+        self._k = 0
+        if os.path.isdir(path):
+            self._images = sorted(p for p in glob.glob(os.path.join(path, "*"))
+                                  if os.path.splitext(p)[1].lower() in (".jpg", ".jpeg", ".png", ".bmp"))
+        elif any(c in path for c in "*?["):
+            self._images = sorted(glob.glob(path))
+        super().__init__(fps or SYNTH_FPS, realtime)
+        self._fps_override = fps
+
+    def open(self) -> bool:
+        if self._images: return True
+        self._cap = cv2.VideoCapture(self.path)
+        if not self._cap.isOpened(): return False
+        if not self._fps_override:
+            fps = self._cap.get(cv2.CAP_PROP_FPS)
+            if fps and fps > 0: self.fps = fps
+        return True
+
+    def grab(self) -> bool:
+        self._tick()
+        if self._images:
+            if self._k >= len(self._images):
+                if not self.loop:
+                    self.finished = True; return False
+                self._k = 0
+            self._frame = self._images[self._k]; self._k += 1
+            return True
+        ok = self._cap.grab()
+        if not ok and self.loop:
+            self._cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok = self._cap.grab()
+        if not ok and not self.loop: self.finished = True
+        return ok
+
+    def retrieve(self):
+        if self._images:
+            img = cv2.imread(self._frame, cv2.IMREAD_COLOR)
+            return img is not None, img
+        return self._cap.retrieve()
+
+    def release(self):
+        if self._cap is not None: self._cap.release()
+
+def open_source(spec: Union[int, str, FrameSource]) -> FrameSource:
+    """Cria a fonte a partir de uma especificação.
+
+    - `0`, `"1"`                        -> câmera (DeviceSource)
+    - `"synth"`, `"synth:1280x720@30"`  -> SyntheticSource (sufixo `!` = velocidade máxima,
+                                           `#N` = semente)
+    - `"file:caminho"`, caminho existente -> FileSource (sufixo `!` = velocidade máxima)
+    """
+    if isinstance(spec, FrameSource): return spec
+    if isinstance(spec, int) or (isinstance(spec, str) and spec.strip().lstrip("-").isdigit()):
+        return DeviceSource(int(spec))
+    s = str(spec).strip()
+    fast = s.endswith("!")
+    if fast: s = s[:-1]
+    if s.startswith("synth"):
+        seed = 0
+        if "#" in s: s, seed = s.split("#", 1)[0], int(s.split("#", 1)[1])
+        size, fps = CAPTURE_SIZE, SYNTH_FPS
+        arg = s[len("synth"):].lstrip(":")
+        if arg:
+            res, _, rate = arg.partition("@")
+            if res:
+                w, h = res.lower().split("x"); size = (int(w), int(h))
+            if rate: fps = float(rate)
+        return SyntheticSource(size, fps, realtime=not fast, seed=seed)
+    if s.startswith("file:"): s = s[len("file:"):]
+    return FileSource(s, realtime=not fast)
@@ -0,0 +1,124 @@
+# replay/timeline.py
+from typing import Dict, List, NamedTuple, Optional, Sequence
+import numpy as np
+
+from .config import TIMELINE_SETTLE, DRIFT_WINDOW, DRIFT_WARN_MS
+from .index import FrameIndex
+
+class JointFrame(NamedTuple):
+    ts: float                 # timestamp do frame de referência
+    refs: list                # DiskFrameRef (ou None) por câmera
+    skew: List[float]         # ts da câmera - ts da referência (s); NaN sem frame
+    nos: List[int]            # número absoluto do frame casado por câmera (-1 sem frame)
+
+class JointTimeline:
+    """Linha do tempo conjunta: para cada frame da câmera de referência, o frame casado de cada câmera.
+
+    `update()` (um único escritor, p.ex. o _tick da UI) casa só os frames novos, com o desvio
+    medido de cada câmera; seek, passo e exportação viram uma consulta sem bloqueio neste
+    índice seguida de acesso direto pelo número absoluto do frame em cada buffer.
+    """
+    def __init__(self, rings: Sequence, ref: int = 0, settle: float = TIMELINE_SETTLE):
+        self.rings = list(rings)
+        self.ref = ref
+        self.settle = settle
+        cols: Dict[str, object] = {"ts": np.float64}
+        for k in range(len(self.rings)):
+            cols[f"f{k}"] = np.int64; cols[f"s{k}"] = np.float32
+        self._index = FrameIndex(self.rings[ref].capacity + 1024, cols)
+        self._next = 0      # próximo número absoluto da referência a casar
+
+    def __len__(self): return len(self._index)
+
+    # --- manutenção incremental ---
+    def update(self) -> int:
+        """Casa os frames de referência novos já assentados; devolve quantas linhas entraram."""
+        ref = self.rings[self.ref]
+        first, _ = ref.frame_range()
+        fr = f"f{self.ref}"
+        stale = self._index.read(lambda v: int(v.searchsorted(fr, first)) if v.n else 0)
+        if stale: self._index.pop_front(stale)
+        start, ts = ref.frames_from(max(self._next, first))
+        if not len(ts): return 0
+        # assentado = todas as câmeras já têm frame depois dele (ou passou `settle` sem chegar)
+        others = [r.latest_ts() for k, r in enumerate(self.rings) if k != self.ref]
+        others = [t for t in others if t is not None]
+        limit = max(min(others), ts[-1] - self.settle) if others else ts[-1]
+        m = int(np.searchsorted(ts, limit, side="right"))
+        if m == 0: return 0
+        ts = ts[:m]
+        cols = {"ts": ts}
+        for k, r in enumerate(self.rings):
+            if k == self.ref:
+                cols[f"f{k}"] = start + np.arange(m); cols[f"s{k}"] = np.zeros(m, np.float32); continue
+            nos, mts = r.match_many(ts)
+            cols[f"f{k}"] = nos; cols[f"s{k}"] = (mts - ts).astype(np.float32)
+        self._index.extend(**cols)
+        self._next = start + m
+        return m
+
+    # --- consultas ---
+    def latest_ts(self) -> Optional[float]:
+        return self._index.read(lambda v: float(v.get("ts", v.n - 1)) if v.n else None)
+
+    def oldest_ts(self) -> Optional[float]:
+        return self._index.read(lambda v: float(v.get("ts", 0)) if v.n else None)
+
+    def _row(self, v, i: int):
+        n = len(self.rings)
+        return (float(v.get("ts", i)), [int(v.get(f"f{k}", i)) for k in range(n)],
+                [float(v.get(f"s{k}", i)) for k in range(n)])
+
+    def _resolve(self, row, cams) -> JointFrame:
+        ts, nos, skew = row
+        refs = [self.rings[k].refs_by_no([no])[0] if cams is None or k in cams else None
+                for k, no in enumerate(nos)]
+        return JointFrame(ts, refs, skew, nos)
+
+    def at(self, ts: float, cams: Optional[Sequence[int]] = None) -> Optional[JointFrame]:
+        """Tupla casada mais próxima de `ts` (só resolve as câmeras em `cams`, se dado)."""
+        row = self._index.read(lambda v: self._row(v, int(v.nearest("ts", ts))) if v.n else None)
+        return self._resolve(row, cams) if row else None
+
+    def step(self, ts: float, step: int, cams: Optional[Sequence[int]] = None) -> Optional[JointFrame]:
+        """Tupla `step` posições depois (ou antes) da mais próxima de `ts`, pelo passo da referência."""
+        def q(v):
+            if v.n == 0: return None
+            return self._row(v, max(0, min(v.n - 1, int(v.nearest("ts", ts)) + step)))
+        row = self._index.read(q)
+        return self._resolve(row, cams) if row else None
+
+    def at_many(self, ts_array, cams: Sequence[int]) -> Dict[int, list]:
+        """Versão vetorizada de `at` (exportação): refs por câmera para cada instante."""
+        ts_array = np.asarray(ts_array, dtype=np.float64)
+        def q(v):
+            if v.n == 0: return None
+            idx = v.nearest("ts", ts_array)
+            return {k: v.get(f"f{k}", idx) for k in cams}
+        nos = self._index.read(q)
+        if nos is None: return {k: [None] * len(ts_array) for k in cams}
+        return {k: self.rings[k].refs_by_no(nos[k]) for k in cams}
+
+    def drift_stats(self, window: float = DRIFT_WINDOW) -> List[dict]:
+        """Desvio de cada câmera em relação à referência nos últimos `window` segundos."""
+        n = len(self.rings)
+        def q(v):
+            if v.n == 0: return None
+            lo = int(v.searchsorted("ts", float(v.get("ts", v.n - 1)) - window))
+            return v.column("ts", lo), [v.column(f"s{k}", lo) for k in range(n)]
+        snap = self._index.read(q)
+        if snap is None: return []
+        ts, skews = snap
+        out = []
+        for k, s in enumerate(skews):
+            ok = np.isfinite(s); sv = s[ok].astype(np.float64) * 1000.0
+            slope = 0.0
+            if len(sv) > 2 and ts[ok][-1] > ts[ok][0]:
+                slope = float(np.polyfit(ts[ok] - ts[ok][0], sv, 1)[0]) * 60.0
+            mean = float(sv.mean()) if len(sv) else 0.0
+            out.append({"camera": k + 1, "rows": len(s), "missing": int((~ok).sum()),
+                        "skew_ms_mean": round(mean, 2),
+                        "skew_ms_p95": round(float(np.percentile(np.abs(sv), 95)), 2) if len(sv) else 0.0,
+                        "drift_ms_per_min": round(slope, 2),
+                        "lagging": mean < -DRIFT_WARN_MS, "leading": mean > DRIFT_WARN_MS})
+        return out
@@ -1,49 +1,68 @@
 # replay/ui.py
 import os, time
-from typing import Optional, List, Tuple
+from typing import Optional, List, Sequence, Tuple
+import numpy as np
 from PySide6 import QtCore, QtGui, QtWidgets
 
-from .config import (BUFFER_DIR, EXPORT_DIR, BUFFER_SECONDS, WRITE_FPS, PLAYBACK_FPS,
-                     JPEG_QUALITY, DEFAULT_CAM_INDEXES)
-from .buffer import DiskRingBuffer, cleanup_buffer_dir
-from .capture import CaptureWriterThread
-from .export import ExportThread
-from .widgets import ImagePane, CameraSelectDialog
+from .config import (BUFFER_DIR, PERSIST_BUFFER, EXPORT_DIR, BUFFER_SECONDS, WRITE_FPS, PLAYBACK_FPS,
+                     JPEG_QUALITY, DEFAULT_CAM_INDEXES, ROLLING_EXPORT, ACTIVITY_THRESHOLD, SERVER_PORT)
+from .activity import ActivityIndex, activity_heat
+from .buffer import ByteBudget, DiskRingBuffer, cleanup_buffer_dir
+from .capture import CaptureScheduler, capture_load, start_capture
+from .export import GRID_VIEW, grid_shape
+from .jobs import ExportQueue, ExportThrottle, PRIORITY_NORMAL, PRIORITY_URGENT
+from .playback import PlaybackClock
+from .rolling import RollingEncoder
+from .server import ReplayServer
+from .timeline import JointTimeline
+from .metrics import METRICS, STAGES, STARTUP
+from .widgets import ActivityBar, ImagePane, CameraSelectDialog
 
 class ReplayWindow(QtWidgets.QMainWindow):
-    def __init__(self, cam_indexes: Tuple[int,int]):
+    def __init__(self, cam_indexes: Sequence, serve_port: int = SERVER_PORT):
         super().__init__()
-        self.setWindowTitle("Vídeo Replay - 2 Câmeras (Buffer JPEG)")
         self.cam_indexes = list(cam_indexes)
+        self.server: Optional[ReplayServer] = None
 
         # capacidade do buffer (frames por câmera)
         self.capacity = max(2, int(WRITE_FPS * BUFFER_SECONDS))
-        self.ring0 = DiskRingBuffer("0", self.capacity, JPEG_QUALITY)
-        self.ring1 = DiskRingBuffer("1", self.capacity, JPEG_QUALITY)
+        self.rings: List[DiskRingBuffer] = []
+        # janela navegável (s): BUFFER_SECONDS ou menos, se o teto de disco não comportar
+        self.window = float(BUFFER_SECONDS)
+        self._retention_check = 0.0
 
         # threads de captura
-        self.th0: Optional[CaptureWriterThread] = None
-        self.th1: Optional[CaptureWriterThread] = None
+        self.threads: List[CaptureScheduler] = []
+        self.rolling: Optional[RollingEncoder] = None
+        # exportações: fila única com freio pela pressão na captura e no tick da UI
+        self.exports = ExportQueue([], throttle=ExportThrottle(lambda: capture_load(self.threads)), parent=self)
         self._start_writers()
+        if serve_port:
+            # visualizadores na rede local recebem os JPEGs do buffer como estão
+            self.server = ReplayServer(self.rings, port=serve_port)
+            if not self.server.start(): self.server = None
 
         # estado de reprodução
-        self.view_mode = 3       # 1=cam1, 2=cam2, 3=ambas
+        self.view_mode = GRID_VIEW   # 0=grade com todas, 1..N=câmera única
         self.paused = False
         self.play_ts: Optional[float] = None
         self.last_tick = time.time()
-        self.play_speed = 1.0
-        self.play_dir = +1
+        self.clock = PlaybackClock()   # velocidade/sentido (shuttle) e plano de frames por tick
+        self._wheel = 0                # resto da roda do mouse (jog)
 
         # UI
         central = QtWidgets.QWidget(self); self.setCentralWidget(central)
-        self.p0 = ImagePane("Câmera 1"); self.p1 = ImagePane("Câmera 2")
-        self.panesLayout = QtWidgets.QHBoxLayout()
-        self.panesLayout.addWidget(self.p0, 1); self.panesLayout.addWidget(self.p1, 1)
+        self.panes: List[ImagePane] = []
+        self.panesLayout = QtWidgets.QGridLayout()
+        self.panesLayout.setSpacing(4)
+        self._build_panes()
 
         self.slider = QtWidgets.QSlider(QtCore.Qt.Orientation.Horizontal)
-        self.slider.setRange(0, BUFFER_SECONDS * 1000)
+        self.slider.setRange(0, int(self.window * 1000))
         self.slider.setSingleStep(1000 // max(1, int(PLAYBACK_FPS)))
         self.slider.setPageStep(5000)
+        self.heat = ActivityBar()   # atividade ao longo da janela do slider
+        self._heat_check = 0.0
         self.lbl = QtWidgets.QLabel("00:00:00 / 01:00:00"); self.lbl.setStyleSheet("color:#ccc;")
         self.btn_select = QtWidgets.QPushButton("Selecionar Câmeras")
         self.btn_select.clicked.connect(self._select_cams)
@@ -53,7 +72,16 @@ class ReplayWindow(QtWidgets.QMainWindow):
         ctrl.addWidget(self.lbl); ctrl.addStretch(1); ctrl.addWidget(self.info); ctrl.addSpacing(8); ctrl.addWidget(self.btn_select)
 
         lay = QtWidgets.QVBoxLayout(central)
-        lay.addLayout(self.panesLayout, 1); lay.addWidget(self.slider); lay.addLayout(ctrl)
+        lay.addLayout(self.panesLayout, 1); lay.addWidget(self.heat); lay.addWidget(self.slider); lay.addLayout(ctrl)
+
+        # overlay de métricas (tecla I): histogramas por etapa/câmera
+        self.overlay = QtWidgets.QLabel(central)
+        self.overlay.setStyleSheet("background:rgba(0,0,0,170); color:#9f9; padding:6px;"
+                                   "font-family:monospace; font-size:11px;")
+        self.overlay.setAttribute(QtCore.Qt.WidgetAttribute.WA_TransparentForMouseEvents)
+        self.overlay.move(8, 8); self.overlay.hide()
+        self._overlay_next = 0.0
+        self._metrics_was_on = METRICS.enabled
 
         self.setStyleSheet("""
             QMainWindow { background:#0b0b0b; }
@@ -63,10 +91,11 @@ class ReplayWindow(QtWidgets.QMainWindow):
             QPushButton:hover { background:#2a2a2a; }
         """)
 
-        # atalhos
-        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_1), self, activated=self._view_cam1_full)
-        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_2), self, activated=self._view_cam2_full)
-        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_3), self, activated=self._view_both)
+        # atalhos: 1..9 = câmera única, 0 = grade (com 2 câmeras o 3 também mostra as duas)
+        for n in range(1, 10):
+            key = getattr(QtCore.Qt.Key, f"Key_{n}")
+            QtGui.QShortcut(QtGui.QKeySequence(key), self, activated=lambda n=n: self._view_key(n))
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_0), self, activated=self._view_grid)
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Space), self, activated=self._toggle_pause)
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Backspace), self, activated=self._jump_now_minus_5)
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Left), self, activated=self._step_prev)
@@ -76,8 +105,21 @@ class ReplayWindow(QtWidgets.QMainWindow):
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Q), self, activated=self._speed_05x)
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_W), self, activated=self._speed_1x)
         QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_E), self, activated=self._speed_2x)
-        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Return), self, activated=self._export_triple)
-        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Enter),  self, activated=self._export_triple)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_J), self, activated=self._shuttle_reverse)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_K), self, activated=self._shuttle_stop)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_L), self, activated=self._shuttle_forward)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_I), self, activated=self._toggle_overlay)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_BracketLeft), self, activated=self._prev_event)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_BracketRight), self, activated=self._next_event)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Return), self, activated=self._export_moment)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Enter),  self, activated=self._export_moment)
+        QtGui.QShortcut(QtGui.QKeySequence("Shift+Return"), self, activated=self._export_moment_urgent)
+        QtGui.QShortcut(QtGui.QKeySequence(QtCore.Qt.Key.Key_Escape), self, activated=self._cancel_exports)
+        self.exports.done.connect(self._on_export_done)
+        self.exports.error.connect(self._on_export_error)
+        self.exports.export_stats.connect(self._on_export_stats)
+        self.exports.progress.connect(self._on_export_progress)
+        self.exports.finished.connect(self._on_export_finished)
 
         # slider events
         self._slider_was_paused = None
@@ -88,96 +130,137 @@ class ReplayWindow(QtWidgets.QMainWindow):
         # timer de render
         self.timer = QtCore.QTimer(self)
         self.timer.setInterval(int(1000 / PLAYBACK_FPS))
-        self.timer.timeout.connect(self._tick)
+        self.timer.timeout.connect(self._on_timer)
+        self._tick_due = 0.0
         self.timer.start()
 
         self.resize(1280, 720)
         self._apply_view()
-        self._exp_threads: List[ExportThread] = []
 
     # --- captura ---
     def _start_writers(self):
-        # recria diretório do buffer limpo
-        if os.path.isdir(BUFFER_DIR):
+        self.exports.cancel_all(wait_ms=3000)   # as exportações leem os buffers que serão fechados
+        self._stop_writers()
+        for ring in self.rings:
+            ring.close()
+        # recria diretório do buffer limpo (em modo persistente os buffers se reabrem pelo diário)
+        if os.path.isdir(BUFFER_DIR) and not PERSIST_BUFFER:
             try: import shutil; shutil.rmtree(BUFFER_DIR)
             except Exception: pass
         os.makedirs(BUFFER_DIR, exist_ok=True)
 
-        self.ring0 = DiskRingBuffer("0", self.capacity, JPEG_QUALITY)
-        self.ring1 = DiskRingBuffer("1", self.capacity, JPEG_QUALITY)
-        self._stop_writers()
-        self.th0 = CaptureWriterThread(self.cam_indexes[0], self.ring0); self.th0.start()
-        self.th1 = CaptureWriterThread(self.cam_indexes[1], self.ring1); self.th1.start()
-        self.statusBar().showMessage(f"Iniciadas: camA={self.cam_indexes[0]} camB={self.cam_indexes[1]}", 3000)
+        self.budget = ByteBudget()   # teto de disco somando as câmeras (BUFFER_TOTAL_MB)
+        self.rings = [DiskRingBuffer(str(i), self.capacity, JPEG_QUALITY, budget=self.budget)
+                      for i in range(len(self.cam_indexes))]
+        self.timeline = JointTimeline(self.rings)
+        self.activity = [ActivityIndex(r) for r in self.rings]
+        if self.server is not None: self.server.rings = list(self.rings)
+        self.exports.rings, self.exports.timeline = list(self.rings), self.timeline
+        self._drift_check = 0.0
+        self.threads = start_capture(self.cam_indexes, self.rings)
+        if ROLLING_EXPORT:
+            # grade dos últimos segundos já codificada em segundo plano (Enter só concatena)
+            self.rolling = RollingEncoder(self.rings, self.timeline)
+            self.rolling.start(QtCore.QThread.Priority.LowestPriority)
+        self.exports.rolling = self.rolling
+        self.setWindowTitle(f"Vídeo Replay - {len(self.rings)} Câmeras (Buffer JPEG)")
+        self.statusBar().showMessage("Iniciadas: " + "  ".join(
+            f"cam{i+1}={src}" for i, src in enumerate(self.cam_indexes)), 3000)
         self.play_ts = None
 
     def _stop_writers(self):
-        for th in (self.th0, self.th1):
-            if th: th.stop()
-        for th in (self.th0, self.th1):
-            if th: th.wait(2000)
-        self.th0 = None; self.th1 = None
+        if self.rolling is not None:
+            self.rolling.stop(); self.rolling.wait(2000); self.rolling = None
+        for th in self.threads: th.stop()
+        for th in self.threads: th.wait(2000)
+        self.threads = []
 
     def closeEvent(self, e: QtGui.QCloseEvent) -> None:
+        if self.server is not None: self.server.stop()
+        print(f"[PLAY] {self.clock.stats()}")
+        self.exports.cancel_all(wait_ms=3000)
         self._stop_writers()
+        for ring in self.rings:
+            ring.close()
         cleanup_buffer_dir()
         return super().closeEvent(e)
 
     # --- seleção de câmeras ---
     def _fmt_info(self) -> str:
-        return f"Câmeras: A={self.cam_indexes[0]}  B={self.cam_indexes[1]}"
+        return "Câmeras: " + "  ".join(f"{i+1}={src}" for i, src in enumerate(self.cam_indexes))
 
     def _select_cams(self):
         dlg = CameraSelectDialog(self)
         if dlg.exec() == QtWidgets.QDialog.DialogCode.Accepted:
             res = getattr(dlg, "_res", None)
             if res:
-                a, b = res
-                self.cam_indexes = [a, b]
+                self.cam_indexes = list(res)
                 self.info.setText(self._fmt_info())
                 self._start_writers()
+                self._build_panes()
+                if self.view_mode > len(self.rings): self.view_mode = GRID_VIEW
+                self._apply_view()
 
     # --- visualização ---
+    def _build_panes(self):
+        for pane in self.panes:
+            self.panesLayout.removeWidget(pane); pane.deleteLater()
+        self.panes = [ImagePane(f"Câmera {i+1}", cam=self.rings[i].label) for i in range(len(self.rings))]
+        cols, _ = grid_shape(len(self.panes))
+        for i, pane in enumerate(self.panes):
+            self.panesLayout.addWidget(pane, i // cols, i % cols)
+
     def _apply_view(self):
-        if self.view_mode == 1:
-            self.p0.setVisible(True);  self.p1.setVisible(False)
-            self.panesLayout.setStretchFactor(self.p0, 1); self.panesLayout.setStretchFactor(self.p1, 0)
-        elif self.view_mode == 2:
-            self.p0.setVisible(False); self.p1.setVisible(True)
-            self.panesLayout.setStretchFactor(self.p0, 0); self.panesLayout.setStretchFactor(self.p1, 1)
-        else:
-            self.p0.setVisible(True);  self.p1.setVisible(True)
-            self.panesLayout.setStretchFactor(self.p0, 1); self.panesLayout.setStretchFactor(self.p1, 1)
-        for pane in (self.p0, self.p1):
+        self._heat_check = 0.0   # heatmap passa a refletir as câmeras visíveis
+        for i, pane in enumerate(self.panes):
+            pane.setVisible(self.view_mode == GRID_VIEW or self.view_mode == i + 1)
             pane.setSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding, QtWidgets.QSizePolicy.Policy.Expanding)
-        self.p0.update(); self.p1.update()
+            pane.update()
+
+    def _view_key(self, n: int):
+        if n <= len(self.rings): self.view_mode = n
+        elif n == len(self.rings) + 1 == 3: self.view_mode = GRID_VIEW   # atalho antigo "3 = ambas"
+        else: return
+        self._apply_view()
 
-    def _view_cam1_full(self): self.view_mode = 1; self._apply_view()
-    def _view_cam2_full(self): self.view_mode = 2; self._apply_view()
-    def _view_both(self):      self.view_mode = 3; self._apply_view()
+    def _view_grid(self): self.view_mode = GRID_VIEW; self._apply_view()
+
+    def _visible(self) -> List[int]:
+        """Índices das câmeras exibidas no modo atual."""
+        if self.view_mode == GRID_VIEW: return list(range(len(self.rings)))
+        return [self.view_mode - 1] if 0 < self.view_mode <= len(self.rings) else []
 
     # --- tempo / slider ---
     def _tails_latest(self) -> Optional[float]:
-        t0 = self.ring0.latest_ts(); t1 = self.ring1.latest_ts()
-        if t0 is None or t1 is None: return None
-        return min(t0, t1)
+        # último instante com frames casados de todas as câmeras
+        return self.timeline.latest_ts()
+
+    def _update_retention(self):
+        # retenção que os limites de disco realmente comportam (taxa de bytes/s atual)
+        ret = [r.retention() for r in self.rings]
+        proj = [d["projected_s"] for d in ret if d["projected_s"]]
+        window = max(1.0, min([float(BUFFER_SECONDS)] + proj))
+        if abs(window - self.window) >= max(1.0, 0.01 * self.window):
+            self.window = window
+            b = self.slider.blockSignals(True); self.slider.setRange(0, int(window * 1000)); self.slider.blockSignals(b)
+        mb = sum(d["bytes"] for d in ret) / 1e6
+        self.lbl.setToolTip(f"Retenção: {_hms(self.window)} de {_hms(BUFFER_SECONDS)}  |  disco: {mb:.0f} MB")
 
     def _set_from_slider(self, ms: int):
         latest = self._tails_latest()
         if latest is None: return
-        start = latest - BUFFER_SECONDS
-        self.play_ts = max(start, min(latest, start + ms/1000.0))
+        start = latest - self.window
+        self.play_ts = max(start, min(latest, start + ms/1000.0)); self.clock.seek()
 
     def _sync_slider(self):
         latest = self._tails_latest()
         if latest is None or self.play_ts is None: return
-        start = latest - BUFFER_SECONDS
+        start = latest - self.window
         pos = int(round((self.play_ts - start) * 1000.0))
-        pos = max(0, min(BUFFER_SECONDS*1000, pos))
+        pos = max(0, min(int(self.window * 1000), pos))
         b = self.slider.blockSignals(True); self.slider.setValue(pos); self.slider.blockSignals(b)
-        rel = max(0.0, min(BUFFER_SECONDS, (self.play_ts - start)))
-        hh = int(rel // 3600); mm = int((rel % 3600)//60); ss = int(rel % 60)
-        self.lbl.setText(f"{hh:02d}:{mm:02d}:{ss:02d} / 01:00:00")
+        rel = max(0.0, min(self.window, (self.play_ts - start)))
+        self.lbl.setText(f"{_hms(rel)} / {_hms(self.window)}")
 
     def _on_slider_pressed(self):
         if self._slider_was_paused is None:
@@ -192,85 +275,234 @@ class ReplayWindow(QtWidgets.QMainWindow):
     # --- atalhos de controle ---
     def _toggle_pause(self): self.paused = not self.paused
 
+    def _toggle_overlay(self):
+        # ligar o overlay liga a coleta; desligar só para se ela não foi pedida na configuração/CLI
+        if self.overlay.isVisible():
+            self.overlay.hide()
+            if not self._metrics_was_on: METRICS.enabled = False
+        else:
+            self._metrics_was_on = METRICS.enabled
+            METRICS.enabled = True
+            self._overlay_next = 0.0; self._update_overlay()
+            self.overlay.show(); self.overlay.raise_()
+
+    def _update_overlay(self):
+        if time.time() < self._overlay_next: return
+        self._overlay_next = time.time() + 0.5
+        self.overlay.setText((METRICS.format_table(STAGES) or "sem dados") + "\n" + self._fmt_playback()
+                             + "\n" + self._fmt_exports())
+        self.overlay.adjustSize()
+
+    def _fmt_playback(self) -> str:
+        st = self.clock.stats()
+        return (f"reprodução {self.clock.label()}  {st['present_fps']:g} fps{' proxy' if st['proxy'] else ''}  "
+                f"apresentados {st['presented']}  descartados {st['dropped']}  pulados {st['skipped']}")
+
+    def _fmt_exports(self) -> str:
+        st = self.exports.stats()
+        return (f"exportações {st['running']} rodando  {st['pending']} na fila  freio {st['delay_ms']:g} ms  "
+                f"pressão {st['pressure']:g}  tick {st['tick_ms']:g} ms")
+
     def _jump_now_minus_5(self):
         latest = self._tails_latest()
         if latest is None: return
-        self.play_ts = max(latest - BUFFER_SECONDS, latest - 5.0)
+        self.play_ts = max(latest - self.window, latest - 5.0); self.clock.seek()
 
-    def _step_prev(self):
+    def _step(self, step: int):
+        # passo pela câmera de referência: sempre um frame casado por vez, sem alternar entre câmeras
         if self.play_ts is None: return
-        r0 = self.ring0.step_from(self.play_ts, -1); r1 = self.ring1.step_from(self.play_ts, -1)
-        cand = [r for r in (r0, r1) if r]; 
-        if not cand: return
-        self.play_ts = max(r.ts for r in cand); self.paused = True
+        jf = self.timeline.step(self.play_ts, step, cams=())
+        if jf is None: return
+        self.play_ts = jf.ts; self.paused = True; self.clock.seek()
 
-    def _step_next(self):
+    def _jump_event(self, direction: int):
+        # próximo/anterior evento de atividade entre as câmeras visíveis (só o índice, sem JPEG)
         if self.play_ts is None: return
-        r0 = self.ring0.step_from(self.play_ts, +1); r1 = self.ring1.step_from(self.play_ts, +1)
-        cand = [r for r in (r0, r1) if r]; 
-        if not cand: return
-        self.play_ts = min(r.ts for r in cand); self.paused = True
-
-    def _play_reverse(self): self.play_dir = -1; self.paused = False; self.statusBar().showMessage("Reverso", 1200)
-    def _play_forward(self): self.play_dir = +1; self.paused = False; self.statusBar().showMessage("Normal", 1200)
-    def _speed_05x(self): self.play_speed = 0.5; self.statusBar().showMessage("0.5x", 1200)
-    def _speed_1x(self):  self.play_speed = 1.0; self.statusBar().showMessage("1x", 1200)
-    def _speed_2x(self):  self.play_speed = 2.0; self.statusBar().showMessage("2x", 1200)
-
-    # --- exportação (Enter → 3 arquivos) ---
-    def _export_triple(self):
+        found = []
+        for i in self._visible():
+            ix, ring = self.activity[i], self.rings[i]
+            ix.update()
+            no = int(ring.match_many([self.play_ts])[0][0])
+            if no < 0: continue
+            hit = ix.next_event(no, ACTIVITY_THRESHOLD) if direction > 0 else ix.prev_event(no, ACTIVITY_THRESHOLD)
+            ref = ring.refs_by_no([hit])[0] if hit is not None else None
+            if ref is not None and (ref.ts - self.play_ts) * direction > 1e-6: found.append((ref.ts, i))
+        if not found:
+            self.statusBar().showMessage("Nenhum evento " + ("à frente" if direction > 0 else "antes"), 1500); return
+        ts, cam = min(found) if direction > 0 else max(found)
+        self.statusBar().showMessage(f"Evento cam{cam+1}: {ts - self.play_ts:+.1f} s", 1500)
+        self.play_ts = ts; self.paused = True; self.clock.seek()
+
+    def _next_event(self): self._jump_event(+1)
+    def _prev_event(self): self._jump_event(-1)
+
+    def _update_heat(self):
+        latest = self._tails_latest()
+        if latest is None: return
+        for ix in self.activity: ix.update()
+        cols = max(1, self.heat.width())
+        edges = np.linspace(latest - self.window, latest, cols + 1)
+        self.heat.set_heat(activity_heat([self.activity[i] for i in self._visible()], edges),
+                           4.0 * ACTIVITY_THRESHOLD)
+
+    def _step_prev(self): self._step(-1)
+    def _step_next(self): self._step(+1)
+
+    def _play_reverse(self): self.clock.direction = -1; self.paused = False; self.statusBar().showMessage("Reverso", 1200)
+    def _play_forward(self): self.clock.direction = +1; self.paused = False; self.statusBar().showMessage("Normal", 1200)
+    def _speed_05x(self): self.clock.set_speed(0.5); self.statusBar().showMessage("0.5x", 1200)
+    def _speed_1x(self):  self.clock.set_speed(1.0); self.statusBar().showMessage("1x", 1200)
+    def _speed_2x(self):  self.clock.set_speed(2.0); self.statusBar().showMessage("2x", 1200)
+
+    # shuttle: J/L repetidos sobem a escada de velocidades (até 16x), K para
+    def _shuttle(self, direction: int):
+        if self.paused: self.clock.direction = direction; self.clock.set_speed(1.0)
+        else: self.clock.shuttle(direction)
+        self.paused = False
+        self.statusBar().showMessage(self.clock.label(), 1200)
+
+    def _shuttle_reverse(self): self._shuttle(-1)
+    def _shuttle_forward(self): self._shuttle(+1)
+    def _shuttle_stop(self): self.paused = True; self.clock.set_speed(1.0); self.statusBar().showMessage("Parado", 1200)
+
+    def wheelEvent(self, e: QtGui.QWheelEvent):
+        # jog: cada passo da roda anda um frame casado (para baixo = à frente; pausa a reprodução)
+        self._wheel += e.angleDelta().y()
+        steps = int(self._wheel / 120); self._wheel -= steps * 120
+        for _ in range(abs(steps)): self._step(-1 if steps > 0 else +1)
+        e.accept()
+
+    # --- exportação (Enter → um clipe por câmera + grade, pela fila de exportações) ---
+    def _moment_outputs(self, start_ts: float, end_ts: float) -> List[Tuple[int, str]]:
+        stamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(end_ts))
+        moment_dir = os.path.join(EXPORT_DIR, f"moment_{stamp}")
+        grid_name = "both" if len(self.rings) == 2 else "grid"
+        paths = [(i + 1, os.path.join(moment_dir, f"clip_cam{i+1}_{stamp}.mp4")) for i in range(len(self.rings))]
+        paths.append((GRID_VIEW, os.path.join(moment_dir, f"clip_{grid_name}_{stamp}.mp4")))
+        return paths
+
+    def _export_moment(self, priority: int = PRIORITY_NORMAL):
         latest = self._tails_latest()
         if latest is None or self.play_ts is None:
             QtWidgets.QMessageBox.warning(self, "Exportar clipes", "Buffer insuficiente."); return
         end_ts = min(self.play_ts, latest)
-        start_ts = max(end_ts - 20.0, latest - BUFFER_SECONDS)
+        start_ts = max(end_ts - 20.0, latest - self.window)
         if start_ts >= end_ts - (1.0 / PLAYBACK_FPS):
             QtWidgets.QMessageBox.warning(self, "Exportar clipes", "Janela de 20s indisponível."); return
+        # uma passada pela linha do tempo alimenta todos os arquivos; pedidos sobrepostos se fundem
+        job = self.exports.submit(start_ts, end_ts, self._moment_outputs, priority)
+        if job.merged:
+            self.statusBar().showMessage(f"Já na fila: exportação #{job.id} "
+                                         f"({job.end_ts - job.start_ts:.0f}s)", 4000); return
+        ahead = len(self.exports.jobs()) - 1
+        self.statusBar().showMessage(f"Exportação #{job.id} (20s)" + (f": {ahead} antes na fila" if ahead else "")
+                                     + " ...", 4000)
 
-        stamp = time.strftime("%Y-%m-%d_%H-%M-%S", time.localtime(end_ts))
-        MOMENT_DIR = os.path.join(EXPORT_DIR, f"moment_{stamp}")
-        os.makedirs(MOMENT_DIR, exist_ok=True)
-        paths = [
-            (1, os.path.join(MOMENT_DIR, f"clip_cam1_{stamp}.mp4")),
-            (2, os.path.join(MOMENT_DIR, f"clip_cam2_{stamp}.mp4")),
-            (3, os.path.join(MOMENT_DIR, f"clip_both_{stamp}.mp4")),
-        ]
-        threads = [ExportThread(self.ring0, self.ring1, start_ts, end_ts, vm, p) for vm, p in paths]
-        self._exp_threads = [t for t in self._exp_threads if t.isRunning()] + threads
-        for th in threads:
-            th.done.connect(self._on_export_done)
-            th.error.connect(self._on_export_error)
-            th.start()
-        self.statusBar().showMessage(f"Exportando 3 clipes (20s): {stamp} ...", 4000)
+    def _export_moment_urgent(self): self._export_moment(PRIORITY_URGENT)
+
+    def _cancel_exports(self):
+        n = self.exports.cancel_all()
+        if n: self.statusBar().showMessage(f"Cancelando {n} exportação(ões)", 3000)
 
     def _on_export_done(self, path: str):
         self.statusBar().showMessage(f"Clipe salvo: {os.path.basename(path)}", 4000)
         QtWidgets.QToolTip.showText(QtGui.QCursor.pos(), f"Salvo: {os.path.basename(path)}")
 
+    def _on_export_stats(self, st: dict):
+        print(f"[EXPORT] {st['frames']} frames x {st['outputs']} saídas em {st['wall_s']}s "
+              f"({st['fps']} fps; decode {st['decode_fps']} fps, compose {st['compose_fps']} fps, "
+              f"write {st['write_fps']} fps; {st['decoded']} decodificações)")
+
+    def _on_export_progress(self, job_id: int, frac: float):
+        waiting = len(self.exports.pending)
+        self.statusBar().showMessage(f"Exportando #{job_id}: {frac * 100:.0f}%"
+                                     + (f" (+{waiting} na fila)" if waiting else ""), 2000)
+
+    def _on_export_finished(self, job_id: int, state: str):
+        if state == "cancelled": self.statusBar().showMessage(f"Exportação #{job_id} cancelada", 3000)
+
     def _on_export_error(self, msg: str):
         self.statusBar().showMessage("Falha na exportação", 3000)
         QtWidgets.QMessageBox.critical(self, "Exportar clipes", f"Erro: {msg}")
 
     # --- loop de render ---
+    def _on_timer(self):
+        # latência do tick (atraso do timer + trabalho) alimenta o freio das exportações
+        t0 = time.perf_counter()
+        late = max(0.0, t0 - self._tick_due) if self._tick_due else 0.0
+        self._tick_due = t0 + self.timer.interval() / 1000.0
+        self._tick()
+        self.exports.throttle.note_tick(late + time.perf_counter() - t0)
+
+    def _check_drift(self):
+        warn = [f"cam{d['camera']} {d['skew_ms_mean']:+.0f} ms" for d in self.timeline.drift_stats()
+                if d["lagging"] or d["leading"]]
+        if warn: self.statusBar().showMessage("Desvio entre câmeras: " + "  ".join(warn), 3000)
+
     def _tick(self):
+        self.timeline.update()
+        if time.time() >= self._drift_check:
+            self._drift_check = time.time() + 5.0; self._check_drift()
+        if time.time() >= self._retention_check:
+            self._retention_check = time.time() + 2.0; self._update_retention()
+        if time.time() >= self._heat_check:
+            self._heat_check = time.time() + 1.0; self._update_heat()
         latest = self._tails_latest()
         if latest is None:
-            self.p0.show_image(None); self.p1.show_image(None); return
+            for pane in self.panes: pane.show_image(None)
+            return
+        STARTUP.mark("capture")
         if self.play_ts is None:
-            self.play_ts = max(latest - BUFFER_SECONDS, latest - 5.0)
+            self.play_ts = max(latest - self.window, latest - 5.0)
             self.last_tick = time.time()
         now = time.time(); dt = now - self.last_tick; self.last_tick = now
         if not self.paused:
-            start = latest - BUFFER_SECONDS
-            self.play_ts = max(start, min(latest, self.play_ts + dt * self.play_speed * self.play_dir))
-
-        ref0 = self.ring0.nearest(self.play_ts); ref1 = self.ring1.nearest(self.play_ts)
-        img0 = self.ring0.load_qimage(ref0) if ref0 else None
-        img1 = self.ring1.load_qimage(ref1) if ref1 else None
-        if self.view_mode == 1:
-            self.p0.show_image(img0); self.p1.show_image(None)
-        elif self.view_mode == 2:
-            self.p0.show_image(None); self.p1.show_image(img1)
+            self.play_ts = self.clock.advance(self.play_ts, dt, latest - self.window, latest)
+
+        vis = self._visible()
+        # tocando: o relógio escolhe o instante (grade dizimada) e o nível dentro do orçamento;
+        # parado ou arrastando o slider: o frame exato, esperando a decodificação
+        dragging = self._slider_was_paused is not None
+        playing = not self.paused and not dragging
+        if playing:
+            ts, scrub = self.clock.plan(self.play_ts, sum(self.rings[i].decode_ms(False) for i in vis),
+                                        sum(self.rings[i].decode_ms(True) for i in vis))
         else:
-            self.p0.show_image(img0); self.p1.show_image(img1)
+            ts, scrub = self.play_ts, dragging
+        t0 = time.perf_counter() if METRICS.enabled else 0.0
+        jf = self.timeline.at(ts, vis)
+        if t0: METRICS.observe("lookup", "joint", time.perf_counter() - t0)
+        jobs = []
+        for i in vis:
+            ring, pane = self.rings[i], self.panes[i]
+            ref = jf.refs[i] if jf else None
+            tgt = pane.target_size()
+            key = ring.frame_key(ref, tgt, scrub) if ref else None
+            # mesmo frame do tick anterior (pausado, ou 30 Hz sobre buffer de 20 fps): nada a fazer
+            if key is not None and key == pane.frame_key: continue
+            if ref and playing:
+                # decodifica os próximos frames da grade fora da thread da GUI
+                ring.prefetch(ts, self.clock.direction, self.clock.speed, tgt, scrub, fps=self.clock.present_fps)
+            # faltas no cache vão para o pool de cada câmera em paralelo antes de esperar
+            if ref: ring.request_qimage(ref, tgt, scrub)
+            jobs.append((i, ring, ref, tgt, key))
+        budget = self.clock.budget_ms / 1000.0 if playing and self.clock.budget_ms > 0 else None
+        deadline = time.perf_counter() + (budget or 0.0)
+        for i, ring, ref, tgt, key in jobs:
+            timeout = None if budget is None else max(0.0, deadline - time.perf_counter())
+            img = ring.get_qimage(ref, tgt, scrub, timeout=timeout) if ref else None
+            if ref and img is None and timeout is not None:
+                self.clock.dropped_frame(); continue      # não ficou pronto: mantém o frame anterior
+            self.panes[i].show_image(img, key)
+            if img is None: continue
+            self.clock.presented_frame(i, jf.nos[i])       # número já casado pela linha do tempo
+            if STARTUP.mark("first_frame"):
+                print(f"[STARTUP] {STARTUP.report()}")
+        for i, pane in enumerate(self.panes):
+            if i not in vis: pane.show_image(None)
+        if self.overlay.isVisible(): self._update_overlay()
         self._sync_slider()
+
+def _hms(s: float) -> str:
+    s = int(max(0.0, s))
+    return f"{s // 3600:02d}:{s % 3600 // 60:02d}:{s % 60:02d}"
@@ -1,11 +1,18 @@
 # replay/widgets.py
-from typing import List, Optional, Tuple
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 from PySide6 import QtCore, QtGui, QtWidgets
-from .capture import CameraScanWorker
+from .discovery import CameraScanWorker, device_label, load_cache, update_cache
+from .metrics import METRICS
+
+if TYPE_CHECKING:   # NumPy só nas anotações: o diálogo de câmeras abre sem importá-lo
+    import numpy as np
 
 class ImagePane(QtWidgets.QLabel):
-    def __init__(self, title: str, parent=None):
+    """Painel de vídeo: guarda o pixmap já escalado (chave = frame + tamanho) e só o desenha no paint."""
+    def __init__(self, title: str, cam: Optional[str] = None, parent=None):
         super().__init__(parent)
+        self.cam = cam if cam is not None else title   # rótulo nas métricas
         self.setMinimumSize(320, 180)
         self.setScaledContents(False)
         self.setSizePolicy(QtWidgets.QSizePolicy.Policy.Expanding,
@@ -13,30 +20,102 @@ class ImagePane(QtWidgets.QLabel):
         self.setAlignment(QtCore.Qt.AlignmentFlag.AlignCenter)
         self.setStyleSheet("background:#111; color:#aaa; border:1px solid #333;")
         self._title = title
+        self._img: Optional[QtGui.QImage] = None
+        self._key = None                       # identidade do frame exibido
         self._pix: Optional[QtGui.QPixmap] = None
+        self._pix_key = None                   # (frame, tamanho) do pixmap escalado
+        self.renders = 0                       # conversões QImage -> QPixmap feitas
+
+    @property
+    def frame_key(self): return self._key
+
+    def target_size(self) -> Tuple[int, int]:
+        """Tamanho do painel em pixels físicos (alvo da decodificação)."""
+        dpr = self.devicePixelRatioF()
+        return (int(self.width() * dpr), int(self.height() * dpr))
+
+    def _update_pixmap(self):
+        # fora do paint: escala (só se o frame não veio no tamanho do painel) e converte uma vez
+        if self._img is None:
+            self._pix = None; self._pix_key = None; return
+        tw, th = self.target_size()
+        pk = (self._key if self._key is not None else self._img.cacheKey(), tw, th)
+        if pk == self._pix_key and self._pix is not None: return
+        t0 = time.perf_counter() if METRICS.enabled else 0.0
+        img = self._img
+        w, h = img.width(), img.height()
+        fits = w <= tw and h <= th and (w >= tw - 1 or h >= th - 1)
+        if not fits and tw > 0 and th > 0:
+            img = img.scaled(QtCore.QSize(tw, th), QtCore.Qt.AspectRatioMode.KeepAspectRatio,
+                             QtCore.Qt.TransformationMode.SmoothTransformation)
+        pix = QtGui.QPixmap.fromImage(img)
+        pix.setDevicePixelRatio(self.devicePixelRatioF())
+        self._pix, self._pix_key = pix, pk
+        self.renders += 1
+        if t0: METRICS.observe("pixmap", self.cam, time.perf_counter() - t0)
 
     def paintEvent(self, e: QtGui.QPaintEvent) -> None:
+        t0 = time.perf_counter() if METRICS.enabled else 0.0
         super().paintEvent(e)
         p = QtGui.QPainter(self); r = self.rect()
         if self._pix:
-            scaled = self._pix.scaled(r.size(),
-                QtCore.Qt.AspectRatioMode.KeepAspectRatio,
-                QtCore.Qt.TransformationMode.SmoothTransformation)
-            x = (r.width() - scaled.width()) // 2
-            y = (r.height() - scaled.height()) // 2
-            p.drawPixmap(x, y, scaled)
+            sz = self._pix.deviceIndependentSize()
+            x = int((r.width() - sz.width()) // 2)
+            y = int((r.height() - sz.height()) // 2)
+            p.drawPixmap(x, y, self._pix)
         else:
             p.setPen(QtGui.QPen(QtGui.QColor("#666")))
             p.drawText(r, QtCore.Qt.AlignmentFlag.AlignCenter, self._title)
+        p.end()
+        if t0: METRICS.observe("paint", self.cam, time.perf_counter() - t0)
 
-    def show_image(self, qimg: Optional[QtGui.QImage]):
-        self._pix = QtGui.QPixmap.fromImage(qimg) if qimg else None
+    def resizeEvent(self, e: QtGui.QResizeEvent) -> None:
+        super().resizeEvent(e)
+        self._update_pixmap()
+
+    def show_image(self, qimg: Optional[QtGui.QImage], key=None) -> bool:
+        """Troca o frame exibido; com `key` igual ao atual não faz nada (nem repinta)."""
+        if qimg is None and self._img is None: return False
+        if qimg is not None and key is not None and key == self._key: return False
+        self._img = qimg
+        self._key = key if qimg is not None else None
+        self._update_pixmap()
         self.update()
+        return True
+
+class ActivityBar(QtWidgets.QWidget):
+    """Faixa de heatmap de atividade alinhada ao slider (um valor por coluna de pixels)."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFixedHeight(8)
+        self._buf: Optional["np.ndarray"] = None
+        self._img: Optional[QtGui.QImage] = None
+
+    def set_heat(self, values: "np.ndarray", scale: float):
+        """`values` por coluna; `scale` = valor que satura a cor (vermelho)."""
+        import numpy as np   # já carregado pela janela principal (ver main._preload)
+        v = np.clip(np.asarray(values, np.float32) / max(1e-6, scale), 0.0, 1.0)
+        buf = np.empty((1, len(v), 4), np.uint8)      # BGRA (Format_ARGB32 little-endian)
+        buf[0, :, 0] = 0
+        buf[0, :, 1] = (200 * (1.0 - v)).astype(np.uint8)
+        buf[0, :, 2] = 255
+        buf[0, :, 3] = (255 * np.sqrt(v)).astype(np.uint8)
+        self._buf = buf   # o QImage aponta para este array
+        self._img = QtGui.QImage(buf.data, len(v), 1, 4 * len(v), QtGui.QImage.Format.Format_ARGB32)
+        self.update()
+
+    def paintEvent(self, e: QtGui.QPaintEvent) -> None:
+        p = QtGui.QPainter(self)
+        p.fillRect(self.rect(), QtGui.QColor("#222"))
+        if self._img is not None and self._img.width():
+            p.drawImage(self.rect(), self._img)
+        p.end()
 
 class CameraSelectDialog(QtWidgets.QDialog):
+    """Seleção de câmeras: mostra na hora as do último uso (cache) e confirma em segundo plano."""
     def __init__(self, parent=None):
         super().__init__(parent)
-        self.setWindowTitle("Selecionar Câmeras (escolha 2)")
+        self.setWindowTitle("Selecionar Câmeras")
         self.resize(420, 360)
         self.list = QtWidgets.QListWidget()
         self.list.setSelectionMode(QtWidgets.QAbstractItemView.SelectionMode.MultiSelection)
@@ -51,28 +130,41 @@ class CameraSelectDialog(QtWidgets.QDialog):
             QListWidget { background:#111; border:1px solid #333; }
             QLabel { color:#ccc; }
         """)
+        self._items: Dict[int, QtWidgets.QListWidgetItem] = {}
+        cache = load_cache()
+        for dev in cache["devices"]: self._show_device(dev, verified=False)
+        for idx in cache["selected"]:
+            if idx in self._items: self._items[idx].setSelected(True)
+        if self._items: self.status.setText(f"{len(self._items)} câmera(s) do último uso; verificando...")
         self.worker = CameraScanWorker()
+        self.worker.found.connect(lambda dev: self._show_device(dev, verified=True))
         self.worker.scanned.connect(self._populate)
         self.worker.start()
 
-    def _populate(self, indices: List[int]):
-        self.list.clear()
-        for idx in indices:
-            it = QtWidgets.QListWidgetItem(f"Câmera {idx}")
+    def _show_device(self, dev: dict, verified: bool):
+        idx = int(dev["index"])
+        it = self._items.get(idx)
+        if it is None:
+            it = self._items[idx] = QtWidgets.QListWidgetItem()
             it.setData(QtCore.Qt.ItemDataRole.UserRole, idx)
-            self.list.addItem(it)
-        self.status.setText("Selecione exatamente 2 e clique em OK." if indices else "Nenhuma câmera encontrada.")
+            self.list.insertItem(sum(1 for i in self._items if i < idx), it)   # em ordem de índice
+        it.setText(device_label(dev) + ("" if verified else "  (verificando...)"))
+
+    def _populate(self, devices: List[dict]):
+        # fim da varredura: some quem estava no cache e não respondeu
+        alive = {int(d["index"]) for d in devices}
+        for idx in [i for i in self._items if i not in alive]:
+            self.list.takeItem(self.list.row(self._items.pop(idx)))
+        self.status.setText("Selecione uma ou mais câmeras e clique em OK." if devices else "Nenhuma câmera encontrada.")
 
-    def get_result(self) -> Optional[Tuple[int,int]]:
+    def get_result(self) -> Optional[Tuple[int, ...]]:
         items = self.list.selectedItems()
-        if len(items) != 2:
-            QtWidgets.QMessageBox.warning(self, "Seleção inválida", "Selecione exatamente 2 câmeras."); return None
-        a = items[0].data(QtCore.Qt.ItemDataRole.UserRole)
-        b = items[1].data(QtCore.Qt.ItemDataRole.UserRole)
-        if a == b:
-            QtWidgets.QMessageBox.warning(self, "Seleção inválida", "Escolha duas câmeras diferentes."); return None
-        self._res = (a, b); return self._res
+        if not items:
+            QtWidgets.QMessageBox.warning(self, "Seleção inválida", "Selecione ao menos 1 câmera."); return None
+        idxs = sorted(set(it.data(QtCore.Qt.ItemDataRole.UserRole) for it in items))
+        self._res = tuple(idxs); return self._res
 
     def accept(self):
         if self.get_result() is None: return
+        update_cache(selected=list(self._res))
         super().accept()
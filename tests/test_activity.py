@@ -0,0 +1,72 @@
+# tests/test_activity.py
+import numpy as np
+import pytest
+from replay.activity import ActivityIndex
+
+class FakeRing:
+    """Só o que o ActivityIndex lê do buffer: faixa de números e escores a partir de um número."""
+    def __init__(self, act):
+        self.act = np.asarray(act, np.float32)
+        self.lo, self.hi = 0, len(self.act)
+
+    def frame_range(self): return self.lo, self.hi
+
+    def activity_from(self, no):
+        lo = max(no, self.lo)
+        return lo, self.act[lo:self.hi]
+
+def brute_next(act, lo, hi, no, thr):
+    for m in range(max(no + 1, lo), hi):
+        if act[m] < thr:
+            for k in range(m, hi):
+                if act[k] >= thr: return k
+            return None
+    return None
+
+def brute_prev(act, lo, no, thr):
+    last = next((k for k in range(min(no, len(act)) - 1, lo - 1, -1) if act[k] >= thr), None)
+    if last is None: return None
+    while last > lo and act[last - 1] >= thr: last -= 1
+    return last
+
+@pytest.fixture
+def act():
+    rng = np.random.default_rng(7)
+    a = rng.exponential(1.0, 3000).astype(np.float32)
+    a[rng.integers(0, 3000, 40)] += 6.0            # picos isolados
+    return a
+
+def feed(ring, ix, act, hi, step):
+    while ring.hi < hi:
+        ring.hi = min(hi, ring.hi + step); ix.update()
+
+def test_max_over_matches_brute_force(act):
+    ring = FakeRing(act); ring.hi = 0
+    ix = ActivityIndex(ring, capacity=1024)
+    rng = np.random.default_rng(1)
+    for hi in (37, 700, 1500, 3000):
+        feed(ring, ix, act, hi, 97)
+        ring.lo = max(0, hi - 900)                  # janela desliza, como no buffer
+        ix.update()
+        for _ in range(20):
+            edges = np.sort(rng.integers(ring.lo - 50, hi + 50, rng.integers(2, 400)))
+            got = ix.max_over(edges)
+            e = np.clip(edges, ring.lo, hi)
+            want = np.array([act[a:b].max() if b > a else 0.0 for a, b in zip(e[:-1], e[1:])], np.float32)
+            np.testing.assert_array_equal(got, want)
+
+def test_max_over_partial_last_block(act):
+    ring = FakeRing(act[:1000]); ix = ActivityIndex(ring, capacity=1024); ix.update()
+    assert ix.max_over(np.array([990, 1000]))[0] == act[990:1000].max()
+    assert ix.max_over(np.array([0, 1000]))[0] == act[:1000].max()
+
+def test_events_match_brute_force(act):
+    ring = FakeRing(act); ring.hi = 0
+    ix = ActivityIndex(ring, capacity=512)
+    feed(ring, ix, act, 2500, 61)
+    ring.lo = 2500 - 800; ix.update()
+    lo, hi = ring.lo, ring.hi
+    for thr in (2.0, 5.0, 6.5):
+        for no in range(lo - 5, hi + 5, 7):
+            assert ix.next_event(no, thr) == brute_next(act, lo, hi, no, thr)
+            assert ix.prev_event(no, thr) == brute_prev(act, lo, no, thr)
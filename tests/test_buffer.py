@@ -0,0 +1,65 @@
+# tests/test_buffer.py
+import cv2
+import numpy as np
+import pytest
+from replay.buffer import ByteBudget, DiskRingBuffer, fit_size, reduce_for
+
+@pytest.mark.parametrize("target, want", [
+    (None, 1), ((0, 360), 1), ((1920, 1080), 1), ((4000, 3000), 1),
+    ((960, 540), 2), ((959, 539), 2), ((961, 541), 1),
+    ((480, 270), 4), ((240, 135), 8), ((100, 50), 8),       # nunca passa de 1/8
+    ((960, 2000), 2), ((2000, 540), 2),                     # a dimensão mais apertada manda
+])
+def test_reduce_for(target, want):
+    assert reduce_for((1920, 1080), target) == want
+
+@pytest.mark.parametrize("size, target, want", [
+    ((1920, 1080), (640, 360), (640, 360)),
+    ((1920, 1080), (640, 640), (640, 360)),
+    ((1920, 1080), (1000, 360), (640, 360)),
+    ((1080, 1920), (640, 640), (360, 640)),
+    ((1920, 1080), (1, 1), (1, 1)),
+])
+def test_fit_size(size, target, want):
+    assert fit_size(size, target) == want
+
+def test_reduced_decode_still_covers_the_pane(tmp_path):
+    r = DiskRingBuffer("a", 10, root=str(tmp_path), persist=False, hot_mb=0)
+    img = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    ok, buf = cv2.imencode(".jpg", img)
+    r.write_jpeg(buf, 0.0, (1280, 720))
+    ref = r.nearest(0.0)
+    for target in ((640, 360), (300, 300), (1280, 720), (100, 40)):
+        k = reduce_for(ref.size, target)
+        h, w = r.load_bgr(ref, reduce=k).shape[:2]
+        fw, fh = fit_size(ref.size, target)
+        assert (w, h) == (1280 // k, 720 // k)
+        assert (w >= fw and h >= fh) or k == 8
+    r.close()
+
+def big(i: int) -> bytes:
+    return b"\xff\xd8" + i.to_bytes(4, "little") * 250 + b"\xff\xd9"
+
+def test_byte_budget_shrinks_all_cameras_evenly(tmp_path):
+    budget = ByteBudget(150_000)
+    rings = [DiskRingBuffer(k, 10_000, segment_seconds=1.0, root=str(tmp_path / k), persist=False, hot_mb=0,
+                            max_seconds=0, max_bytes=0, budget=budget) for k in "ab"]
+    for i in range(200):                              # "a" grava a 20 fps, "b" a 10 fps
+        t = i * 0.05
+        rings[0].write_jpeg(big(i), t, (4, 4))
+        if i % 2 == 0: rings[1].write_jpeg(big(i), t, (4, 4))
+        assert budget.used() <= 150_000 + 2 * 21 * 1004      # só o segmento corrente pode passar
+    assert budget.evicted > 0
+    assert abs(rings[0].oldest_ts() - rings[1].oldest_ts()) <= 1.0   # mesma retenção, não a mesma fatia de bytes
+    assert rings[0].nbytes > rings[1].nbytes
+    assert budget.projected_seconds() == pytest.approx(150_000 / sum(r.byte_rate() for r in rings))
+    for r in rings: r.close()
+
+def test_byte_budget_never_drops_current_segment(tmp_path):
+    budget = ByteBudget(1000)
+    r = DiskRingBuffer("a", 10_000, segment_seconds=10.0, root=str(tmp_path), persist=False, hot_mb=0,
+                       max_seconds=0, max_bytes=0, budget=budget)
+    for i in range(20): r.write_jpeg(big(i), i * 0.1, (4, 4))
+    assert len(r) == 20 and budget.used() > 1000 and budget.evicted == 0
+    assert ByteBudget(0).projected_seconds() is None
+    r.close()
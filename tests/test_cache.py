@@ -0,0 +1,96 @@
+# tests/test_cache.py
+import threading
+import cv2
+import numpy as np
+from replay.buffer import DiskRingBuffer
+from replay.cache import FrameCache, FramePool, Prefetcher
+
+def test_evicts_least_recently_used_by_bytes():
+    c = FrameCache(300)
+    for k in "abc": c.put(k, k.upper(), 100)
+    assert c.get("a") == "A"                          # "a" volta a ser o mais recente
+    c.put("d", "D", 100)
+    assert "b" not in c and all(k in c for k in "acd")
+    c.put("e", "E", 200)                              # abre espaço para 200 bytes de uma vez
+    assert "c" not in c and "a" not in c and c.stats()["bytes"] == 300
+
+def test_put_replaces_and_skips_oversized():
+    c = FrameCache(100)
+    c.put("a", 1, 40); c.put("a", 2, 60)
+    assert c.get("a") == 2 and c.stats()["bytes"] == 60
+    c.put("big", 3, 101); c.put("none", None, 1)
+    assert "big" not in c and "none" not in c and "a" in c
+
+def test_hit_miss_counters_and_clear():
+    c = FrameCache(100)
+    c.put("a", 1, 10)
+    c.get("a"); c.get("b")
+    st = c.stats()
+    assert (st["hits"], st["misses"], st["entries"]) == (1, 1, 1)
+    c.clear()
+    assert c.stats()["entries"] == 0 and c.stats()["bytes"] == 0
+
+def test_prefetcher_decodes_once_and_fills_cache():
+    c = FrameCache(1000)
+    gate, calls = threading.Event(), []
+    def decode(x):
+        calls.append(x); gate.wait(5)
+        return x * 2, 10
+    p = Prefetcher(c, decode, workers=1)
+    p.submit("k", 21); p.submit("k", 21)              # em voo: não agenda de novo
+    assert p.scheduled == 1 and p.inflight() == 1
+    gate.set()
+    assert p.wait("k", timeout=5) == 42
+    p.shutdown()
+    assert calls == [21] and c.get("k") == 42 and p.inflight() == 0 and p.lag == 1
+    p.submit("k", 21)                                 # já no cache: nada a fazer
+    assert p.scheduled == 1
+
+def test_prefetcher_wait_times_out_and_unknown_key():
+    c = FrameCache(1000)
+    gate = threading.Event()
+    def decode():
+        gate.wait(5); return 1, 10
+    p = Prefetcher(c, decode, workers=1)
+    assert p.wait("nada") is None
+    p.submit("k"); fut = p._inflight["k"]
+    assert p.wait("k", timeout=0.01) is None          # prazo esgotado: a decodificação segue no pool
+    gate.set(); fut.result(5)
+    p.shutdown()
+    assert c.get("k") == 1
+
+def test_pool_reuses_only_released_arrays():
+    pool = FramePool(per_shape=4)
+    a = pool.acquire((4, 6, 3))
+    b = pool.acquire((4, 6, 3))                       # `a` ainda está em uso: outro array
+    assert a is not b and a.shape == (4, 6, 3) and a.dtype.name == "uint8"
+    ida = id(a); del a
+    c = pool.acquire((4, 6, 3))
+    assert id(c) == ida and pool.stats()["pool_reused"] == 1
+    view = c[1:3]                                     # uma view também segura o array
+    del c
+    assert id(pool.acquire((4, 6, 3))) != ida
+    del view
+    assert id(pool.acquire((4, 6, 3))) == ida
+
+def test_pool_caps_arrays_per_shape_and_shapes():
+    pool = FramePool(per_shape=2, shapes=2)
+    held = [pool.acquire((2, 2, 3)) for _ in range(4)]   # só 2 ficam no pool, os outros são avulsos
+    assert pool.stats()["pool_arrays"] == 2 and pool.stats()["pool_allocated"] == 4
+    del held
+    pool.acquire((3, 3, 3)); pool.acquire((4, 4, 3))      # terceira forma: a mais antiga sai
+    st = pool.stats()
+    assert st["pool_arrays"] == 2 and (2, 2, 3) not in pool._arrays
+
+def test_pool_array_stays_owned_by_qimage(tmp_path):
+    r = DiskRingBuffer("a", 10, root=str(tmp_path), persist=False, hot_mb=0)
+    for i, v in enumerate((40, 200)):
+        ok, buf = cv2.imencode(".jpg", np.full((72, 128, 3), v, np.uint8)); r.write_jpeg(buf, i * 0.1, (128, 72))
+    first = r.load_qimage(r.nearest(0.0), target=(50, 50))   # 128x72 -> 50x28 num array do pool
+    second = r.load_qimage(r.nearest(0.1), target=(50, 50))
+    assert first.pixelColor(5, 5).red() < 60 and second.pixelColor(5, 5).red() > 180
+    del first
+    third = r.load_qimage(r.nearest(0.0), target=(50, 50))
+    assert r.pool.stats()["pool_reused"] >= 1 and second.pixelColor(5, 5).red() > 180
+    assert third.pixelColor(5, 5).red() < 60
+    r.close()
@@ -0,0 +1,74 @@
+# tests/test_dedup.py
+import os, time
+import numpy as np
+from replay.buffer import DiskRingBuffer
+from replay.encoder import EncodePipeline
+
+def jpeg(i: int) -> bytes:
+    return b"\xff\xd8" + i.to_bytes(4, "little") * 8 + b"\xff\xd9"
+
+def check_refs(r: DiskRingBuffer):
+    segs = r._index.read(lambda v: v.column("seg"))
+    for sid, seg in r._segs.items():
+        assert seg.refs == int((segs == sid).sum())
+    assert set(np.unique(segs).tolist()) <= set(r._segs)
+    assert sum(r._segs[s].count for s in r._seg_order) == len(r)
+    assert r.nbytes == sum(s.nbytes for s in r._segs.values())
+
+def test_write_dup_empty_buffer(tmp_path):
+    r = DiskRingBuffer("a", 100, segment_seconds=1.0, root=str(tmp_path), persist=False, hot_mb=0)
+    assert not r.write_dup(0.0)
+    assert len(r) == 0
+
+def test_write_dup_refs_across_eviction(tmp_path):
+    r = DiskRingBuffer("a", 20, segment_seconds=1.0, root=str(tmp_path), persist=False,
+                       max_seconds=0, max_bytes=0, hot_mb=0)
+    for i in range(10): r.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    for i in range(10, 40):
+        assert r.write_dup(i * 0.1)
+        check_refs(r)
+    assert r.deduped == 30
+    seg0 = r._segs[0]
+    assert 0 not in r._seg_order                   # a fatia de tempo do seg 0 já saiu...
+    assert os.path.isfile(seg0.path)               # ...mas os repetidos ainda usam seus bytes
+    assert r.load_jpeg(r.nearest(3.9)) == jpeg(9)
+    for i in range(40, 80):
+        r.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+        check_refs(r)
+    assert 0 not in r._segs and not os.path.isfile(seg0.path)
+    assert r.load_jpeg(r.nearest(7.9)) == jpeg(79)
+
+def test_drop_oldest_frees_shared_segment_last(tmp_path):
+    r = DiskRingBuffer("a", 10_000, segment_seconds=1.0, root=str(tmp_path), persist=False,
+                       max_seconds=0, max_bytes=0, hot_mb=0)
+    for i in range(5): r.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    for i in range(5, 20): r.write_dup(i * 0.1)
+    r.write_jpeg(jpeg(20), 2.0, (4, 4))
+    assert r.drop_oldest() and 0 in r._segs
+    check_refs(r)
+    assert r.drop_oldest() and 0 not in r._segs
+    check_refs(r)
+    assert r._seg_order == [2] and not r.drop_oldest()
+
+def wait_empty(pipe):
+    while pipe.depth(): time.sleep(0.001)
+
+def test_dropping_queued_reference_promotes_its_repeats(tmp_path):
+    r = DiskRingBuffer("a", 100, root=str(tmp_path), persist=False, hot_mb=0)
+    pipe = EncodePipeline(r, workers=1, queue_size=4, policy="drop_oldest", size=(64, 36), adaptive=False,
+                          dedup=4.0, dedup_max_s=60.0)
+    a = np.zeros((36, 64, 3), np.uint8); b = np.full((36, 64, 3), 200, np.uint8)
+    with pipe._commit_lock:                            # segura o único encoder no commit
+        pipe.submit(a, 0.0); wait_empty(pipe)
+        pipe.submit(b, 0.1)                            # nova referência
+        for i in range(2, 5): pipe.submit(b.copy(), i * 0.1)   # repetidos dela: fila cheia
+        assert pipe.submit(b.copy(), 0.5)              # estoura: descarta a referência ainda na fila
+    pipe.close()
+    st = pipe.stats()
+    assert (st["dropped"], st["failed"], st["written"], st["deduped"]) == (1, 0, 2, 3)
+    ts = r._index.read(lambda v: v.column("ts"))
+    np.testing.assert_allclose(ts, [0.0, 0.2, 0.3, 0.4, 0.5])
+    jpegs = [r.load_jpeg(r.nearest(t)) for t in ts]
+    assert jpegs[0] != jpegs[1] and jpegs[1] == jpegs[2] == jpegs[3] == jpegs[4]
+    assert r.load_bgr(r.nearest(0.5)).mean() > 150
+    check_refs(r)
@@ -0,0 +1,132 @@
+# tests/test_encoder.py
+import time
+import numpy as np
+import pytest
+from replay.buffer import DiskRingBuffer
+from replay.encoder import EncodePipeline, PressureController
+
+SIZE = (64, 36)
+
+def ring(tmp_path) -> DiskRingBuffer:
+    return DiskRingBuffer("a", 1000, root=str(tmp_path), persist=False, hot_mb=0)
+
+def frame(i: int) -> np.ndarray:
+    return np.full((SIZE[1], SIZE[0], 3), i * 7 % 256, np.uint8)
+
+def stored_ts(r: DiskRingBuffer) -> list:
+    return r._index.read(lambda v: v.column("ts")).tolist()
+
+def wait_empty(pipe):
+    while pipe.depth(): time.sleep(0.001)
+
+def test_commits_in_capture_order_with_several_workers(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=3, queue_size=100, size=SIZE, adaptive=False, dedup=0)
+    for i in range(60): assert pipe.submit(frame(i), i * 0.05)
+    pipe.close(timeout=None)
+    assert stored_ts(r) == [i * 0.05 for i in range(60)]
+    assert [int(r.load_bgr(r.nearest(i * 0.05)).mean()) for i in (0, 31, 59)] == [0, 31 * 7 % 256, 59 * 7 % 256]
+    assert pipe.stats()["written"] == 60
+
+def test_resizes_to_capture_size(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=1, size=SIZE, adaptive=False, dedup=0)
+    pipe.submit(np.zeros((72, 128, 3), np.uint8), 0.0)
+    pipe.close(timeout=None)
+    assert r.nearest(0.0).size == SIZE
+
+def fill(pipe, n: int) -> list:
+    """Segura o único encoder no commit com o frame 0 e tenta enfileirar mais `n`."""
+    with pipe._commit_lock:
+        pipe.submit(frame(0), 0.0); wait_empty(pipe)
+        accepted = [pipe.submit(frame(i), i * 0.1) for i in range(1, n + 1)]
+    pipe.close(timeout=None)
+    return accepted
+
+def test_drop_oldest_keeps_newest(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=1, queue_size=4, policy="drop_oldest", size=SIZE, adaptive=False, dedup=0)
+    assert fill(pipe, 6) == [True] * 6
+    assert stored_ts(r) == pytest.approx([0.0, 0.3, 0.4, 0.5, 0.6])
+    assert pipe.stats()["dropped"] == 2 and pipe.stats()["queue_max"] == 4
+
+def test_drop_newest_refuses_incoming(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=1, queue_size=4, policy="drop_newest", size=SIZE, adaptive=False, dedup=0)
+    assert fill(pipe, 6) == [True] * 4 + [False] * 2
+    assert stored_ts(r) == pytest.approx([0.0, 0.1, 0.2, 0.3, 0.4])
+    assert pipe.stats()["dropped"] == 2
+
+def test_quality_policy_lowers_quality_as_queue_fills(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=1, queue_size=4, policy="quality", min_quality=20, size=SIZE,
+                          adaptive=False, dedup=0)
+    noise = np.random.default_rng(0).integers(0, 256, (SIZE[1], SIZE[0], 3), dtype=np.uint8)
+    with pipe._commit_lock:
+        pipe.submit(noise, 0.0); wait_empty(pipe)
+        for i in range(1, 5): pipe.submit(noise, i * 0.1)   # retirados com profundidade 4, 3, 2, 1
+    pipe.close(timeout=None)
+    lengths = [r.nearest(t).length for t in stored_ts(r)]
+    assert lengths[1] < lengths[2] < lengths[0] == lengths[3] == lengths[4]
+    assert pipe.stats()["degraded"] == 2 and pipe.stats()["dropped"] == 0
+
+def test_invalid_policy_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        EncodePipeline(ring(tmp_path), policy="drop_all")
+
+def windows(ctl: PressureController, n: int, write_ms: float, depth: float = 0.0, t0: float = 0.0) -> float:
+    """`n` janelas de 1 s, cada uma com gravações de `write_ms` e fila em `depth`."""
+    t = t0
+    for _ in range(n):
+        for k in range(5): ctl.observe(write_ms / 1000.0, depth, t + k * 0.25)
+        t += 1.0
+    ctl.observe(write_ms / 1000.0, depth, t)   # fecha a última janela
+    return t
+
+def controller() -> PressureController:
+    return PressureController(80, fps=20.0, min_quality=50, min_fps=10.0, write_ms=20.0, queue_frac=0.5, window=1.0)
+
+def test_pressure_lowers_quality_then_fps():
+    ctl = controller()
+    t = windows(ctl, 3, write_ms=40.0)
+    assert (ctl.quality, ctl.fps) == (50, 20.0)        # 80 -> 70 -> 60 -> 50
+    t = windows(ctl, 3, write_ms=40.0, t0=t)
+    assert ctl.quality == 50 and ctl.fps == pytest.approx(10.0)   # 20 -> 15 -> 11.25 -> piso
+    assert ctl.lowered == 6
+    windows(ctl, 2, write_ms=40.0, t0=t)                 # no piso: nada mais a baixar
+    assert ctl.lowered == 6 and ctl.fps == pytest.approx(10.0)
+
+def test_deep_queue_is_pressure_even_with_fast_writes():
+    ctl = controller()
+    windows(ctl, 1, write_ms=1.0, depth=0.6)
+    assert ctl.quality == 70 and ctl.lowered == 1
+
+def test_pressure_recovers_fps_first_after_calm_windows():
+    ctl = controller()
+    ctl.quality, ctl.fps = 50, 10.0
+    t = windows(ctl, 2, write_ms=1.0)
+    assert (ctl.quality, ctl.fps) == (50, 10.0)        # duas janelas calmas ainda não bastam
+    t = windows(ctl, 1, write_ms=1.0, t0=t)
+    assert ctl.fps == pytest.approx(10.0 / 0.75) and ctl.quality == 50
+    t = windows(ctl, 6, write_ms=1.0, t0=t)
+    assert ctl.fps == 20.0 and ctl.quality == 50       # 13.3 -> 17.8 -> 20
+    windows(ctl, 3, write_ms=1.0, t0=t)
+    assert ctl.quality == 55 and ctl.raised == 4
+    st = ctl.stats()
+    assert st["adapt_quality"] == 55 and st["adapt_fps"] == 20.0
+
+def test_middle_band_resets_calm_count():
+    ctl = controller()
+    ctl.fps = 10.0
+    t = windows(ctl, 2, write_ms=1.0)
+    t = windows(ctl, 1, write_ms=15.0, t0=t)           # nem pressão nem folga
+    windows(ctl, 2, write_ms=1.0, t0=t)
+    assert ctl.fps == 10.0 and ctl.raised == 0
+
+def test_pipeline_uses_controller_quality(tmp_path):
+    r = ring(tmp_path)
+    pipe = EncodePipeline(r, workers=1, size=SIZE, adaptive=True, dedup=0)
+    assert pipe.controller.max_quality == r.jpeg_quality and pipe.write_fps == pipe.controller.fps
+    pipe.controller.quality = 55
+    assert pipe._quality(1) == 55
+    pipe.close()
@@ -0,0 +1,56 @@
+# tests/test_export.py
+import os
+import cv2
+import numpy as np
+import pytest
+from replay import export
+from replay.buffer import DiskRingBuffer
+
+class FakeWriter:
+    def __init__(self, path, fail_write=False):
+        self.path, self.fail_write, self.released = path, fail_write, False
+        open(path, "wb").close()
+
+    def write(self, frame):
+        if self.fail_write: raise OSError("disco cheio")
+
+    def release(self): self.released = True
+
+@pytest.fixture
+def rings(tmp_path):
+    out = []
+    for cam in ("a", "b"):
+        r = DiskRingBuffer(cam, 100, root=str(tmp_path / "buf"), persist=False, hot_mb=0)
+        ok, buf = cv2.imencode(".jpg", np.zeros((36, 64, 3), np.uint8))
+        for i in range(10): r.write_jpeg(buf, i * 0.1, (64, 36))
+        out.append(r)
+    return out
+
+def run_export(rings, tmp_path, monkeypatch, opener):
+    monkeypatch.setattr(export, "EXPORT_DIR", str(tmp_path / "exports"))
+    monkeypatch.setattr(export, "open_writer", opener)
+    outputs = [(1, str(tmp_path / "exports" / "a.mp4")), (2, str(tmp_path / "exports" / "b.mp4"))]
+    th = export.MultiExportThread(rings, 0.0, 0.5, outputs, size=(64, 36), passthrough=False)
+    errors = []
+    th.error.connect(errors.append)
+    th.run()
+    return th, errors
+
+def test_second_writer_failure_cleans_up(rings, tmp_path, monkeypatch):
+    opened = []
+    def opener(path, fps, size):
+        if opened: return None, None
+        opened.append(FakeWriter(path)); return opened[-1], path
+    th, errors = run_export(rings, tmp_path, monkeypatch, opener)
+    assert errors == ["VideoWriter não abriu (mp4/avi)."]
+    assert opened[0].released and not os.path.exists(opened[0].path)
+    assert th._partial == []
+
+def test_write_error_removes_partial_files(rings, tmp_path, monkeypatch):
+    opened = []
+    def opener(path, fps, size):
+        opened.append(FakeWriter(path, fail_write=True)); return opened[-1], path
+    th, errors = run_export(rings, tmp_path, monkeypatch, opener)
+    assert errors == ["disco cheio"]
+    assert len(opened) == 2
+    assert all(w.released and not os.path.exists(w.path) for w in opened)
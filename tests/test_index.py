@@ -0,0 +1,53 @@
+# tests/test_index.py
+import numpy as np
+from replay.index import FrameIndex
+
+COLS = {"ts": np.float64, "seg": np.int32}
+
+def logical(ix: FrameIndex) -> np.ndarray:
+    return ix.read(lambda v: v.column("ts"))
+
+def test_wraps_and_evicts_in_order():
+    ix = FrameIndex(8, COLS)
+    model = []
+    for i in range(40):
+        ix.append(ts=i * 0.5, seg=i // 4); model.append(i * 0.5)
+        if len(model) > 6:
+            k = ix.pop_front(3); del model[:k]
+        np.testing.assert_array_equal(logical(ix), model)
+    assert ix.capacity == 8                            # nunca precisou crescer
+    assert ix.read(lambda v: v.base) == 40 - len(ix)   # números absolutos seguem os descartes
+
+def test_grow_keeps_order_across_wrap():
+    ix = FrameIndex(4, COLS)
+    for i in range(3): ix.append(ts=float(i), seg=0)
+    ix.pop_front(2)
+    ix.extend(ts=np.arange(3.0, 13.0), seg=np.zeros(10, np.int32))   # passa do fim e cresce
+    np.testing.assert_array_equal(logical(ix), np.arange(2.0, 13.0))
+    assert ix.capacity >= 11
+
+def test_pop_front_clamps_and_clear_advances_base():
+    ix = FrameIndex(4, COLS)
+    ix.append(ts=1.0, seg=0)
+    assert ix.pop_front(5) == 1 and len(ix) == 0
+    ix.append(ts=2.0, seg=0); ix.append(ts=3.0, seg=0)
+    ix.clear()
+    assert len(ix) == 0 and ix.read(lambda v: v.base) == 3
+
+def test_nearest_and_searchsorted_across_wrap():
+    ix = FrameIndex(16, COLS)
+    ts = np.arange(30) * 0.1
+    for t in ts[:10]: ix.append(ts=t, seg=0)
+    ix.pop_front(8)
+    for t in ts[10:24]: ix.append(ts=t, seg=1)         # [0.8, 2.3] com o fim dando a volta
+    live = ts[8:24]
+    q = np.array([-1.0, 0.8, 0.84, 0.86, 1.5, 1.55, 1.551, 2.3, 9.0])
+    got = ix.read(lambda v: v.nearest("ts", q))
+    want = [int(np.flatnonzero(np.abs(live - x) == np.abs(live - x).min())[0]) for x in q]
+    np.testing.assert_array_equal(got, want)
+    np.testing.assert_array_equal(ix.read(lambda v: v.searchsorted("ts", q)), np.searchsorted(live, q))
+
+def test_nearest_single_item():
+    ix = FrameIndex(4, COLS)
+    ix.append(ts=5.0, seg=0)
+    assert ix.read(lambda v: int(v.nearest("ts", 1.0))) == 0
@@ -0,0 +1,92 @@
+# tests/test_jobs.py
+import pytest
+from PySide6 import QtCore
+from replay import jobs
+from replay.jobs import PRIORITY_URGENT, ExportQueue
+
+class FakeThread(QtCore.QObject):
+    """No lugar da MultiExportThread: não roda nada, o teste decide quando termina."""
+    done = QtCore.Signal(str)
+    error = QtCore.Signal(str)
+    stats = QtCore.Signal(dict)
+    progress = QtCore.Signal(int, int)
+    cancelled = QtCore.Signal()
+    finished = QtCore.Signal()
+
+    def __init__(self, rings, start_ts, end_ts, outputs, **kw):
+        super().__init__()
+        self.window, self.outputs = (start_ts, end_ts), outputs
+        self.started = self.was_cancelled = False
+
+    def start(self): self.started = True
+    def cancel(self): self.was_cancelled = True
+    def wait(self, ms=None): return True
+
+    def end(self, error: str = ""):
+        if self.was_cancelled: self.cancelled.emit()
+        elif error: self.error.emit(error)
+        else: self.done.emit(self.outputs[0][1])
+        self.finished.emit()
+
+@pytest.fixture
+def queue(monkeypatch):
+    monkeypatch.setattr(jobs, "MultiExportThread", FakeThread)
+    q = ExportQueue([], max_jobs=1)
+    ended = []
+    q.finished.connect(lambda i, s: ended.append((i, s)))
+    return q, ended
+
+def single(view=1):
+    return lambda s, e: [(view, f"/tmp/cam{view}_{s:g}_{e:g}.mp4")]
+
+def thread_of(q, job) -> FakeThread:
+    return next(th for th, j in q.running.items() if j is job)
+
+def test_urgent_jumps_the_pending_queue(queue):
+    q, ended = queue
+    a = q.submit(0, 1, single()); b = q.submit(10, 11, single())
+    c = q.submit(20, 21, single(), priority=PRIORITY_URGENT); d = q.submit(30, 31, single())
+    assert a.state == "running" and [j.id for j in q.jobs()] == [a.id, c.id, b.id, d.id]
+    thread_of(q, a).end()
+    assert a.state == "done" and a.paths == ["/tmp/cam1_0_1.mp4"] and c.state == "running"
+    thread_of(q, c).end()
+    assert b.state == "running" and thread_of(q, b).window == (10, 11)
+    assert ended == [(a.id, "done"), (c.id, "done")]
+
+def test_request_inside_running_export_is_absorbed(queue):
+    q, _ = queue
+    a = q.submit(0, 10, single())
+    assert q.submit(2, 5, single()) is a and a.merged == 1
+    other = q.submit(2, 5, single(view=2))            # outras saídas: outro job
+    assert other is not a and other.state == "pending"
+    assert q.submit(5, 12, single()) is not a          # passa do fim: não cabe
+    assert q.stats()["merged"] == 1 and q.stats()["submitted"] == 4
+
+def test_overlapping_pending_requests_merge_into_union(queue):
+    q, _ = queue
+    q.submit(0, 1, single())
+    b = q.submit(10, 12, single())
+    assert q.submit(11, 15, single(), priority=PRIORITY_URGENT) is b
+    assert q.submit(8, 10, single()) is b
+    assert (b.start_ts, b.end_ts, b.priority, b.merged) == (8, 15, PRIORITY_URGENT, 2)
+    assert len(q.pending) == 1
+
+def test_cancel_pending_and_running(queue):
+    q, ended = queue
+    a = q.submit(0, 1, single()); b = q.submit(10, 11, single()); c = q.submit(20, 21, single())
+    assert q.cancel(b.id) and b.state == "cancelled" and ended == [(b.id, "cancelled")]
+    th = thread_of(q, a)
+    assert q.cancel(a.id) and th.was_cancelled and a.state == "running"   # termina pela thread
+    th.end()
+    assert a.state == "cancelled" and c.state == "running"
+    assert not q.cancel(999) and not q.cancel(b.id)
+    assert q.cancel_all() == 1 and thread_of(q, c).was_cancelled
+    st = q.stats()
+    assert (st["cancelled"], st["running"], st["pending"]) == (2, 1, 0)
+
+def test_error_marks_job_failed(queue):
+    q, ended = queue
+    a = q.submit(0, 1, single())
+    thread_of(q, a).end(error="disco cheio")
+    assert a.state == "failed" and a.error == "disco cheio" and ended == [(a.id, "failed")]
+    assert not q.running and q.stats()["failed"] == 1
@@ -0,0 +1,86 @@
+# tests/test_journal.py
+import os
+import numpy as np
+from replay.journal import IndexJournal
+
+COLS = {"ts": np.float64, "seg": np.int32, "length": np.int32}
+
+def write(path, n) -> IndexJournal:
+    j = IndexJournal(str(path), COLS)
+    for i in range(n): j.append(ts=i * 0.1, seg=i // 10, length=100 + i)
+    j.close()
+    return j
+
+def test_roundtrip(tmp_path):
+    write(tmp_path / "j", 25)
+    cols, torn = IndexJournal(str(tmp_path / "j"), COLS).load()
+    assert torn == 0
+    np.testing.assert_array_equal(cols["length"], 100 + np.arange(25))
+    np.testing.assert_allclose(cols["ts"], np.arange(25) * 0.1)
+
+def test_missing_file_is_empty(tmp_path):
+    cols, torn = IndexJournal(str(tmp_path / "none"), COLS).load()
+    assert torn == 0 and all(len(v) == 0 for v in cols.values())
+
+def test_torn_tail_is_dropped(tmp_path):
+    p = tmp_path / "j"
+    j = write(p, 25)
+    with open(p, "r+b") as f: f.truncate(os.path.getsize(p) - j.dtype.itemsize // 2)
+    cols, torn = IndexJournal(str(p), COLS).load()
+    assert torn == 1 and len(cols["ts"]) == 24
+    np.testing.assert_array_equal(cols["length"], 100 + np.arange(24))
+
+def test_bad_crc_record_is_dropped(tmp_path):
+    p = tmp_path / "j"
+    j = write(p, 25)
+    hl = len(j._header)
+    with open(p, "r+b") as f:
+        f.seek(hl + 7 * j.dtype.itemsize + 3); f.write(b"\xff\xee")
+    cols, torn = IndexJournal(str(p), COLS).load()
+    assert torn == 1 and 107 not in cols["length"] and len(cols["length"]) == 24
+
+def test_other_schema_is_rejected(tmp_path):
+    p = tmp_path / "j"
+    write(p, 5)
+    cols, torn = IndexJournal(str(p), {"ts": np.float64}).load()
+    assert len(cols["ts"]) == 0 and torn > 0
+
+def test_rewrite_compacts_and_appends_after(tmp_path):
+    p = tmp_path / "j"
+    j = write(p, 25)
+    cols, _ = j.load()
+    j.rewrite({k: v[20:] for k, v in cols.items()})
+    assert j.records == 5 and not os.path.exists(str(p) + ".tmp")
+    j.append(ts=9.0, seg=9, length=1); j.close()
+    cols, torn = IndexJournal(str(p), COLS).load()
+    assert torn == 0 and cols["length"].tolist() == [120, 121, 122, 123, 124, 1]
+
+def test_crc32_rows_matches_zlib():
+    import zlib
+    from replay.journal import crc32_rows
+    body = np.random.default_rng(0).integers(0, 256, (500, 37), dtype=np.uint8)
+    assert crc32_rows(body).tolist() == [zlib.crc32(r.tobytes()) for r in body]
+
+def test_background_compaction_keeps_concurrent_appends(tmp_path):
+    p = tmp_path / "j"
+    j = write(p, 25)
+    cols, _ = j.load()
+    started = j.compact({k: v[20:] for k, v in cols.items()})
+    assert started and not j.compact(cols)          # uma compactação por vez
+    for i in range(3): j.append(ts=9.0 + i, seg=9, length=i)
+    j.close()                                        # espera a thread
+    assert not j.compacting and not os.path.exists(str(p) + ".compact")
+    cols, torn = IndexJournal(str(p), COLS).load()
+    assert torn == 0 and cols["length"].tolist()[-3:] == [0, 1, 2]
+    assert cols["length"].tolist()[:5] == [120, 121, 122, 123, 124]
+    assert j.records == len(cols["length"])
+
+def test_rewrite_supersedes_running_compaction(tmp_path):
+    p = tmp_path / "j"
+    j = write(p, 10)
+    cols, _ = j.load()
+    j.compact(cols)
+    j.rewrite({k: v[:0] for k, v in cols.items()})
+    j.close()
+    cols, torn = IndexJournal(str(p), COLS).load()
+    assert len(cols["ts"]) == 0 and not os.path.exists(str(p) + ".compact")
@@ -0,0 +1,52 @@
+# tests/test_mjpeg.py
+import cv2
+import numpy as np
+import pytest
+from replay.mjpeg import MjpegAviWriter
+
+W, H = 96, 64
+
+def encoded(n: int) -> list:
+    out = []
+    for i in range(n):
+        img = np.full((H, W, 3), 20 + i * 30, np.uint8)
+        cv2.putText(img, str(i), (10, 50), cv2.FONT_HERSHEY_SIMPLEX, 1.5, (255, 255, 255), 3)
+        ok, buf = cv2.imencode(".jpg", img, [int(cv2.IMWRITE_JPEG_QUALITY), 90])
+        out.append(buf.tobytes())
+    return out
+
+def write(path, jpegs, fps=12.5):
+    w = MjpegAviWriter(str(path), fps, (W, H))
+    assert w.isOpened()
+    for j in jpegs: w.write(j)
+    w.release(); w.release()                          # segundo release não faz nada
+    assert not w.isOpened()
+
+def test_opencv_reads_back_every_frame(tmp_path):
+    jpegs = encoded(7)
+    if len(jpegs[0]) % 2 == 0: jpegs[0] += b"\0"      # força um chunk ímpar (com byte de preenchimento)
+    path = tmp_path / "out.avi"
+    write(path, jpegs)
+    cap = cv2.VideoCapture(str(path))
+    assert cap.isOpened()
+    assert int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) == 7
+    assert cap.get(cv2.CAP_PROP_FPS) == pytest.approx(12.5)
+    assert (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))) == (W, H)
+    frames = []
+    while True:
+        ok, img = cap.read()
+        if not ok: break
+        frames.append(img)
+    cap.release()
+    assert len(frames) == 7
+    for img, j in zip(frames, jpegs):
+        want = cv2.imdecode(np.frombuffer(j, np.uint8), cv2.IMREAD_COLOR)
+        assert np.abs(img.astype(int) - want).max() <= 2   # os bytes JPEG passam sem recodificar
+
+def test_accepts_numpy_buffers(tmp_path):
+    ok, buf = cv2.imencode(".jpg", np.zeros((H, W, 3), np.uint8))
+    path = tmp_path / "np.avi"
+    write(path, [buf, buf])
+    data = path.read_bytes()
+    assert data[:4] == b"RIFF" and data[8:12] == b"AVI " and data.count(buf.tobytes()) == 2
+    assert int.from_bytes(data[4:8], "little") == len(data) - 8
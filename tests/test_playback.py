@@ -0,0 +1,70 @@
+# tests/test_playback.py
+import pytest
+from replay.playback import PlaybackClock
+
+SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16)
+
+def clock(**kw) -> PlaybackClock:
+    kw.setdefault("fps", 30); kw.setdefault("source_fps", 20); kw.setdefault("budget_ms", 20)
+    kw.setdefault("min_fps", 5); kw.setdefault("speeds", SPEEDS)
+    return PlaybackClock(**kw)
+
+def test_shuttle_doubles_and_reverses():
+    c = clock()
+    assert [c.shuttle(+1) for _ in range(6)] == [2, 4, 8, 16, 16, 16]
+    assert c.shuttle(-1) == 1 and c.direction == -1 and c.label() == "◀ 1x"
+    assert c.shuttle(-1) == 2
+    c.set_speed(0.25)                                  # câmera lenta: a tecla volta para 1x
+    assert c.shuttle(-1) == 1 and c.direction == -1
+    assert c.set_speed(100) == 16 and c.set_speed(0) == 0.25
+
+def test_advance_follows_direction_and_clamps():
+    c = clock()
+    c.set_speed(4)
+    assert c.advance(10.0, 0.5, 0.0, 20.0) == 12.0
+    c.direction = -1
+    assert c.advance(10.0, 0.5, 0.0, 20.0) == 8.0 and c.advance(1.0, 0.5, 0.0, 20.0) == 0.0
+    c.direction = +1
+    assert c.advance(19.0, 0.5, 0.0, 20.0) == 20.0
+
+def test_plan_keeps_every_frame_when_it_fits():
+    c = clock()
+    assert c.plan(1.234, cost_full=5.0, cost_proxy=1.0) == (1.234, False)
+    assert c.present_fps == 20
+    assert c.plan(1.234, 0.0, 0.0) == (1.234, False)   # sem medida ainda: otimista
+    assert c.plan(1.234, 5.0, 1.0, scrub=True) == (1.234, True)
+
+def test_plan_switches_to_proxy_before_decimating():
+    c = clock()
+    ts, proxy = c.plan(1.234, cost_full=40.0, cost_proxy=5.0)   # 40 ms x 20 fps > 20 ms x 30 ticks
+    assert proxy and ts == 1.234 and c.present_fps == 20
+    c.set_speed(2)                                     # 2x sempre em proxy
+    assert c.plan(1.0, 1.0, 1.0)[1] and c.present_fps == 30
+
+def test_plan_decimates_on_integer_tick_grid():
+    c = clock()
+    c.set_speed(4)                                     # 80 fps de origem, 30 ticks/s
+    ts, proxy = c.plan(1.01, cost_full=100.0, cost_proxy=50.0)   # cabem 12 conjuntos/s
+    assert proxy and c.present_fps == 10               # um a cada 3 ticks
+    stride = 4 / 10
+    assert ts == pytest.approx(round(1.01 / stride) * stride)
+    for t in (0.0, 0.39, 3.3, 7.77):                   # a grade é absoluta: o mesmo instante por tick
+        g = c.plan(t, 100.0, 50.0)[0]
+        assert abs(g / stride - round(g / stride)) < 1e-9 and abs(g - t) <= stride / 2 + 1e-9
+
+def test_plan_never_drops_below_min_fps():
+    c = clock()
+    c.set_speed(4)
+    c.plan(0.0, cost_full=1000.0, cost_proxy=1000.0)
+    assert c.present_fps == 5                           # piso: um frame a cada 6 ticks
+
+def test_presented_counts_skipped_frames_until_seek():
+    c = clock()
+    for no in (10, 11, 14, 12):
+        c.presented_frame(0, no)
+    c.presented_frame(1, 3); c.presented_frame(1, -1); c.presented_frame(1, None)
+    assert c.presented == 7 and c.skipped == 2 + 1
+    c.seek(); c.presented_frame(0, 100)
+    c.dropped_frame()
+    assert c.stats() == {"speed": 1.0, "present_fps": 30.0, "proxy": False, "presented": 8, "dropped": 1,
+                         "skipped": 3}
@@ -0,0 +1,132 @@
+# tests/test_recover.py
+import os
+import numpy as np
+import pytest
+from replay.buffer import DiskRingBuffer
+
+def jpeg(i: int) -> bytes:
+    return b"\xff\xd8" + i.to_bytes(4, "little") * 8 + b"\xff\xd9"
+
+def ring(root, **kw) -> DiskRingBuffer:
+    kw.setdefault("hot_mb", 0)
+    return DiskRingBuffer("a", kw.pop("capacity", 10_000), segment_seconds=1.0, root=str(root), persist=True,
+                          max_seconds=0, max_bytes=0, **kw)
+
+def crash(r: DiskRingBuffer):
+    """Abandona o buffer sem close(): nada além do que já foi gravado chega ao disco."""
+    r._spill_stop = True; r._spill_evt.set()
+    r.prefetcher.shutdown()
+
+def rows(r: DiskRingBuffer) -> dict:
+    return r._index.read(lambda v: {k: v.column(k) for k in r.COLUMNS})
+
+def seg_files(r: DiskRingBuffer) -> set:
+    return {int(f[4:-6]) for f in os.listdir(r.root) if f.startswith("seg_")}
+
+def check_refs(r: DiskRingBuffer):
+    segs = rows(r)["seg"]
+    for sid, seg in r._segs.items():
+        assert seg.refs == int((segs == sid).sum())
+    assert set(np.unique(segs).tolist()) <= set(r._segs)
+    assert sum(r._segs[s].count for s in r._seg_order) == len(r)
+
+def test_reopen_disk_only(tmp_path):
+    a = ring(tmp_path)
+    for i in range(45): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    before = rows(a)
+    crash(a)
+    b = ring(tmp_path)
+    after = rows(b)
+    for k in before: np.testing.assert_array_equal(before[k], after[k])
+    assert b._seg_order == [0, 1, 2, 3, 4]
+    assert b.load_jpeg(b.nearest(4.4)) == jpeg(44)
+    check_refs(b)
+    b.write_jpeg(jpeg(99), 10.0, (4, 4))    # retoma num segmento novo
+    assert b.nearest(10.0).seg == 5
+
+def test_reopen_after_eviction_keeps_referenced_segments(tmp_path):
+    a = ring(tmp_path, capacity=20)
+    for i in range(10): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    for i in range(10, 40): a.write_dup(i * 0.1)            # fatias 1..3 só com repetidos de seg 0
+    for i in range(40, 55): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    assert 0 not in a._seg_order and 0 in a._segs          # fatia descartada, bytes ainda usados
+    before = rows(a)
+    crash(a)
+    b = ring(tmp_path, capacity=20)
+    np.testing.assert_array_equal(rows(b)["ts"], before["ts"])
+    assert 0 in seg_files(b) and 0 in b._segs
+    assert b.load_jpeg(b.nearest(a.oldest_ts())) == jpeg(9)
+    check_refs(b)
+
+def test_reopen_keeps_owners_of_repeats_across_segment_boundary(tmp_path):
+    a = ring(tmp_path, capacity=30)
+    for i in range(8): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    for i in range(8, 27): a.write_dup(i * 0.1)            # repetidos do seg 0 cruzam as fatias 1 e 2
+    for i in range(27, 45): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    owners = {s: (a._segs[s].count, a._segs[s].start_ts) for s in a._seg_order}
+    refs = {s: seg.refs for s, seg in a._segs.items()}
+    crash(a)
+    b = ring(tmp_path, capacity=30)
+    assert {s: (b._segs[s].count, b._segs[s].start_ts) for s in b._seg_order} == owners
+    assert {s: seg.refs for s, seg in b._segs.items()} == refs
+    check_refs(b)
+    for i in range(45, 60): b.write_jpeg(jpeg(i), i * 0.1, (4, 4))   # a remoção segue fatia a fatia
+    check_refs(b)
+    assert b.load_jpeg(b.nearest(5.9)) == jpeg(59)
+
+def test_persist_turns_hot_tier_off(tmp_path):
+    a = ring(tmp_path, hot_mb=64, hot_seconds=2.0)
+    assert a.arena is None and a.tier_stats() == {"tier": "disk"}
+    for i in range(50): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    crash(a)
+    b = ring(tmp_path, hot_mb=64)
+    assert len(b) == 50 and b.load_jpeg(b.nearest(4.9)) == jpeg(49)
+
+def unspill(r: DiskRingBuffer, *sids):
+    """Apaga segmentos como uma queda com a camada quente os deixaria: só no diário."""
+    for sid in sids: os.remove(r._seg_path(sid))
+
+def test_reopen_missing_newest_segments(tmp_path):
+    a = ring(tmp_path)
+    for i in range(50): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    crash(a)
+    unspill(a, 2, 3, 4)
+    b = ring(tmp_path)
+    assert len(b) == 20 and seg_files(b) == {0, 1}
+    assert b.load_jpeg(b.nearest(1.9)) == jpeg(19)
+    check_refs(b)
+
+def test_reopen_missing_newest_keeps_repeats_of_older_segments(tmp_path):
+    a = ring(tmp_path)
+    for i in range(20): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    for i in range(20, 50): a.write_dup(i * 0.1)           # fatias 2..4 só com repetidos do seg 1
+    a.write_jpeg(jpeg(50), 5.0, (4, 4))
+    crash(a)
+    unspill(a, 5)
+    b = ring(tmp_path)
+    assert len(b) == 50 and seg_files(b) == {0, 1, 2, 3, 4}     # 2..4: donos das fatias de repetidos
+    assert b.load_jpeg(b.nearest(4.9)) == jpeg(19)
+    check_refs(b)
+
+def test_reopen_cuts_torn_segment_tail(tmp_path):
+    a = ring(tmp_path)
+    for i in range(30): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    crash(a)
+    path = a._seg_path(2)
+    with open(path, "r+b") as f: f.truncate(os.path.getsize(path) - 5)
+    b = ring(tmp_path)
+    assert len(b) == 29 and b.latest_ts() == pytest.approx(2.8)
+    check_refs(b)
+
+def test_reopen_after_background_compaction(tmp_path):
+    a = ring(tmp_path, capacity=20)
+    for i in range(400): a.write_jpeg(jpeg(i), i * 0.1, (4, 4))
+    th = a._journal._thread
+    assert th is not None                                  # compactou pelo menos uma vez
+    th.join()
+    assert a._journal.records < 400
+    before = rows(a)
+    crash(a)
+    b = ring(tmp_path, capacity=20)
+    for k in before: np.testing.assert_array_equal(rows(b)[k], before[k])
+    check_refs(b)
@@ -0,0 +1,70 @@
+# tests/test_rolling.py
+import time
+import cv2
+import numpy as np
+import pytest
+from replay.buffer import DiskRingBuffer
+from replay.export import GRID_VIEW
+from replay.rolling import RollingEncoder
+from replay.timeline import JointTimeline
+
+SIZE = (64, 36)
+FPS, CHUNK_S = 30, 0.5          # F = 15 frames por bloco
+
+def value(cam: int, i: int) -> int:
+    return 20 + (i * 7 + cam * 100) % 200
+
+def feed(rings, lo, hi):
+    for i in range(lo, hi):
+        for cam, r in enumerate(rings):
+            ok, buf = cv2.imencode(".jpg", np.full((SIZE[1], SIZE[0], 3), value(cam, i), np.uint8))
+            r.write_jpeg(buf, i * 0.05, SIZE)         # buffer a 20 fps
+
+def mean(jpeg) -> float:
+    return float(cv2.imdecode(np.frombuffer(jpeg, np.uint8), cv2.IMREAD_COLOR).mean())
+
+def wait_for(pred, timeout=20.0):
+    deadline = time.time() + timeout
+    while not pred():
+        assert time.time() < deadline, "o encoder não chegou lá"
+        time.sleep(0.02)
+
+@pytest.fixture
+def setup(tmp_path):
+    rings = [DiskRingBuffer(k, 10_000, root=str(tmp_path / k), persist=False, hot_mb=0, max_seconds=0, max_bytes=0)
+             for k in "ab"]
+    tl = JointTimeline(rings, settle=0.0)
+    roll = RollingEncoder(rings, tl, views=[GRID_VIEW, 1], seconds=2.0, chunk_seconds=CHUNK_S, fps=FPS, size=SIZE)
+    yield rings, tl, roll
+    roll.stop(); roll.wait()
+    for r in rings: r.close()
+
+def chunks(roll) -> list:
+    with roll._lock: return sorted(roll._chunks[GRID_VIEW])
+
+def test_chunks_follow_absolute_grid_and_window(setup):
+    rings, tl, roll = setup
+    feed(rings, 0, 100); tl.update()                  # até 4.95 s
+    roll.start()
+    # pronto: bloco cujo frame seguinte já passou de latest - 0.5; janela: últimos 2 s
+    wait_for(lambda: chunks(roll) == [5, 6, 7])
+    F = roll.per_chunk
+    assert F == 15
+    got = roll.frames(1, range(5 * F - 1, 8 * F + 1))
+    assert got[0] is None and got[-1] is None and all(j is not None for j in got[1:-1])
+    for f, j in zip(range(5 * F, 8 * F), got[1:-1]):
+        src = int(rings[0].match_many([f / FPS])[0][0])     # frame absoluto do buffer na grade n / fps
+        assert mean(j) == pytest.approx(value(0, src), abs=2)
+    assert roll.reused > 0 and roll.encoded + roll.reused == 3 * F * 2
+    assert roll.matches(FPS, SIZE) and not roll.matches(25, SIZE)
+
+    feed(rings, 100, 160); tl.update()                # até 7.95 s: a janela anda e pula os blocos 8..10
+    wait_for(lambda: chunks(roll) == [11, 12, 13])
+    assert roll.frames(1, [7 * F, 10 * F]) == [None, None]
+    st = roll.stats()
+    assert st["chunks"] == 3 and st["window_s"] == 1.5 and st["live_lag_s"] == pytest.approx(7.95 - 14 * F / FPS)
+
+def test_nothing_before_timeline_has_frames(setup):
+    _, _, roll = setup
+    roll.start(); time.sleep(0.3)
+    assert chunks(roll) == [] and roll.frames(GRID_VIEW, [0, 1]) == [None, None]
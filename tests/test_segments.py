@@ -0,0 +1,51 @@
+# tests/test_segments.py
+import mmap
+from replay import segments
+from replay.segments import HotArena, MemSegment, Segment
+
+def payload(i: int, n: int = 1000) -> bytes:
+    return bytes([i % 251]) * n
+
+def count_mmaps(monkeypatch) -> list:
+    calls = []
+    real = mmap.mmap
+    def spy(*a, **kw):
+        calls.append(a); return real(*a, **kw)
+    monkeypatch.setattr(segments.mmap, "mmap", spy)
+    return calls
+
+def test_live_reads_remap_geometrically(tmp_path, monkeypatch):
+    calls = count_mmaps(monkeypatch)
+    seg = Segment(0, str(tmp_path / "s.mjpeg"), 0.0)
+    buf = bytearray(1000)
+    for i in range(300):
+        off = seg.append(payload(i))
+        assert seg.read(off, 1000) == payload(i)
+        assert seg.read_into(off, 1000, buf) and bytes(buf) == payload(i)
+    assert len(calls) <= 10                  # ~log2(300) em vez de um mmap por frame
+    assert seg.read(0, 1000) == payload(0)
+    seg.seal()
+    assert seg.read(299 * 1000, 1000) == payload(299)
+    assert seg._mm_len == 300 * 1000          # selado: mapa do arquivo inteiro
+    assert seg.read(300 * 1000, 1) is None
+    seg.close()
+
+def test_reopen_reads_existing_file(tmp_path):
+    a = Segment(3, str(tmp_path / "s.mjpeg"), 1.0)
+    for i in range(5): a.append(payload(i, 10))
+    a.seal()
+    b = Segment.reopen(3, a.path, 1.0, count=5, refs=5)
+    assert b.nbytes == 50 and b.read(40, 10) == payload(4, 10)
+    b.close(remove=False); a.close()
+
+def test_mem_segment_spill_is_transparent(tmp_path):
+    arena = HotArena(64 * 32, block=64)
+    seg = MemSegment(1, str(tmp_path / "m.mjpeg"), 0.0, arena)
+    offs = [seg.append(payload(i, 100)) for i in range(10)]   # cruza vários blocos
+    free = arena.free_fraction()
+    assert seg.read(offs[7], 100) == payload(7, 100)
+    assert not seg.spill()                    # só depois de selado
+    seg.seal()
+    assert seg.spill() and not seg.hot and arena.free_fraction() > free
+    assert seg.read(offs[7], 100) == payload(7, 100)
+    seg.close()
@@ -0,0 +1,148 @@
+# tests/test_server.py
+import base64, http.client, json, os, socket, struct, time
+import pytest
+from replay.buffer import DiskRingBuffer
+from replay.encoder import EncodePipeline
+from replay.server import ReplayServer, _ws_unmask
+from replay.sources import SyntheticSource
+
+SIZE = (1280, 720)
+FRAMES = 90
+
+@pytest.fixture(scope="module")
+def served(tmp_path_factory):
+    ring = DiskRingBuffer("a", 500, root=str(tmp_path_factory.mktemp("buf")), persist=False, hot_mb=0)
+    src = SyntheticSource(SIZE, fps=30, realtime=False, seed=3)
+    pipe = EncodePipeline(ring, workers=1, queue_size=FRAMES, size=SIZE, adaptive=False, dedup=0)
+    for _ in range(FRAMES):
+        src.grab(); ok, frame = src.retrieve()
+        pipe.submit(frame, src.ts)
+    pipe.close(timeout=None)
+    assert len(ring) == FRAMES
+    srv = ReplayServer([ring], host="127.0.0.1", port=0, fps=120, backlog_kb=64)
+    assert srv.start()
+    yield srv, ring
+    srv.stop(); ring.close()
+
+def get(srv, path):
+    c = http.client.HTTPConnection("127.0.0.1", srv.port, timeout=5)
+    c.request("GET", path)
+    r = c.getresponse()
+    body = r.read(); c.close()
+    return r.status, r.headers, body
+
+def test_cams(served):
+    srv, ring = served
+    status, headers, body = get(srv, "/cams")
+    assert status == 200 and headers["Content-Type"] == "application/json"
+    cam = json.loads(body)["cams"][0]
+    assert cam["cam"] == 1 and cam["frames"] == FRAMES and cam["latest"] == ring.latest_ts()
+
+def test_frame_is_stored_jpeg_unchanged(served):
+    srv, ring = served
+    ts = ring.nearest((ring.oldest_ts() + ring.latest_ts()) / 2).ts   # um frame exato, não um empate
+    status, headers, body = get(srv, f"/frame/1?ts={ts!r}")
+    ref = ring.nearest(ts)
+    assert status == 200 and headers["Content-Type"] == "image/jpeg"
+    assert body == ring.load_jpeg(ref) and float(headers["X-Timestamp"]) == pytest.approx(ref.ts, abs=1e-6)
+    status, _, body = get(srv, "/frame/1?ago=0&proxy=1")
+    assert status == 200 and body == ring.load_jpeg(ring.nearest(ring.latest_ts()), proxy=True)
+
+@pytest.mark.parametrize("path, status", [("/frame/1?ts=abc", 400), ("/frame/9", 404), ("/frame/x", 404),
+                                          ("/nope", 404), ("/control/999?ts=1", 404)])
+def test_bad_requests(served, path, status):
+    srv, _ = served
+    assert get(srv, path)[0] == status
+
+def read_headers(f) -> dict:
+    out = {}
+    while True:
+        line = f.readline().decode("latin-1").strip()
+        if not line: return out
+        k, _, v = line.partition(":"); out[k.strip().lower()] = v.strip()
+
+def test_stream_multipart(served):
+    srv, ring = served
+    with socket.create_connection(("127.0.0.1", srv.port), timeout=5) as s:
+        s.sendall(f"GET /stream/1?ts={ring.oldest_ts()!r}&speed=1 HTTP/1.1\r\n\r\n".encode())
+        f = s.makefile("rb")
+        assert f.readline().startswith(b"HTTP/1.1 200")
+        head = read_headers(f)
+        assert head["content-type"] == "multipart/x-mixed-replace; boundary=frame" and "x-client-id" in head
+        stamps = []
+        for _ in range(3):
+            assert f.readline() == b"--frame\r\n"
+            part = read_headers(f)
+            data = f.read(int(part["content-length"])); f.readline()
+            assert part["content-type"] == "image/jpeg" and data[:2] == b"\xff\xd8"
+            assert data == ring.load_jpeg(ring.nearest(float(part["x-timestamp"])))
+            stamps.append(float(part["x-timestamp"]))
+        assert stamps == sorted(stamps) and len(set(stamps)) == 3
+
+def test_slow_stream_client_drops_instead_of_buffering(served):
+    srv, ring = served
+    dropped, sent = srv.dropped, srv.sent
+    s = socket.socket()
+    s.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    s.connect(("127.0.0.1", srv.port))
+    # 4x com 120 ticks/s: um frame novo a cada tick, ~1 s até o fim do buffer; o cliente não lê nada
+    s.sendall(f"GET /stream/1?ts={ring.oldest_ts()!r}&speed=4&fps=120 HTTP/1.1\r\n\r\n".encode())
+    deadline = time.time() + 10
+    while srv.dropped == dropped and time.time() < deadline: time.sleep(0.05)
+    s.close()
+    assert srv.dropped > dropped
+    assert srv.sent - sent < FRAMES
+
+def ws_connect(srv, path):
+    s = socket.create_connection(("127.0.0.1", srv.port), timeout=5)
+    key = base64.b64encode(os.urandom(16)).decode()
+    s.sendall((f"GET {path} HTTP/1.1\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+               f"Sec-WebSocket-Key: {key}\r\nSec-WebSocket-Version: 13\r\n\r\n").encode())
+    f = s.makefile("rb")
+    assert f.readline().startswith(b"HTTP/1.1 101")
+    read_headers(f)
+    return s, f
+
+def ws_send(s, op: int, payload: bytes, claimed: int = None):
+    n = len(payload) if claimed is None else claimed
+    mask = os.urandom(4)
+    if n < 126: head = struct.pack(">BB", 0x80 | op, 0x80 | n)
+    elif n < 1 << 16: head = struct.pack(">BBH", 0x80 | op, 0x80 | 126, n)
+    else: head = struct.pack(">BBQ", 0x80 | op, 0x80 | 127, n)
+    s.sendall(head + mask + _ws_unmask(payload, mask))
+
+def ws_recv(f):
+    b0, b1 = f.read(2)
+    n = b1 & 0x7F
+    if n == 126: n = struct.unpack(">H", f.read(2))[0]
+    elif n == 127: n = struct.unpack(">Q", f.read(8))[0]
+    return b0 & 0x0F, f.read(n)
+
+def ws_until(f, op: int, pred=lambda p: True):
+    for _ in range(1000):
+        o, p = ws_recv(f)
+        if o == op and pred(p): return p
+    raise AssertionError("mensagem não chegou")
+
+def test_ws_command_and_frames(served):
+    srv, ring = served
+    s, f = ws_connect(srv, f"/ws/1?ts={ring.oldest_ts()!r}&speed=0")
+    with s:
+        meta = json.loads(ws_until(f, 0x1))
+        assert ws_until(f, 0x2) == ring.load_jpeg(ring.nearest(meta["ts"]))
+        ws_send(s, 0x1, json.dumps({"pause": True, "speed": 2}).encode())
+        state = json.loads(ws_until(f, 0x1, lambda p: b"paused" in p))
+        assert state["paused"] is True and state["speed"] == 2.0
+
+@pytest.mark.parametrize("op, claimed", [(0x1, 1 << 63), (0x1, 5000), (0x9, 126)])
+def test_ws_oversized_frame_closes_1009(served, op, claimed):
+    srv, _ = served
+    s, f = ws_connect(srv, "/ws/1?speed=0")
+    with s:
+        ws_send(s, op, b"", claimed=claimed)            # só o cabeçalho: o servidor não pode esperar o corpo
+        assert ws_until(f, 0x8) == struct.pack(">H", 1009)
+
+def test_ws_unmask_matches_bytewise():
+    data, mask = os.urandom(1001), os.urandom(4)
+    assert _ws_unmask(data, mask) == bytes(c ^ mask[i % 4] for i, c in enumerate(data))
+    assert _ws_unmask(b"", mask) == b"" and _ws_unmask(data, b"") == data
@@ -0,0 +1,45 @@
+# tests/test_sources.py
+import cv2
+import numpy as np
+import pytest
+from replay.config import CAPTURE_SIZE, SYNTH_FPS
+from replay.sources import DeviceSource, FileSource, SyntheticSource, open_source
+
+@pytest.mark.parametrize("spec, index", [(0, 0), ("1", 1), (" 2 ", 2), ("-1", -1)])
+def test_device_specs(spec, index):
+    src = open_source(spec)
+    assert isinstance(src, DeviceSource) and src.index == index
+
+@pytest.mark.parametrize("spec, size, fps, realtime, seed", [
+    ("synth", CAPTURE_SIZE, SYNTH_FPS, True, 0),
+    ("synth!", CAPTURE_SIZE, SYNTH_FPS, False, 0),
+    ("synth#3", CAPTURE_SIZE, SYNTH_FPS, True, 3),
+    ("synth:320x240", (320, 240), SYNTH_FPS, True, 0),
+    ("synth:320X240@12.5#7!", (320, 240), 12.5, False, 7),
+    ("synth:@60", CAPTURE_SIZE, 60.0, True, 0),
+])
+def test_synth_specs(spec, size, fps, realtime, seed):
+    src = open_source(spec)
+    assert isinstance(src, SyntheticSource)
+    assert (src.size, src.fps, src.realtime, src.seed) == (size, fps, realtime, seed)
+
+def test_bad_synth_spec_raises():
+    with pytest.raises(ValueError): open_source("synth:320@30")
+
+@pytest.mark.parametrize("spec, realtime", [("file:{}", True), ("file:{}!", False), ("{}", True)])
+def test_file_specs(tmp_path, spec, realtime):
+    for i in range(3): cv2.imwrite(str(tmp_path / f"{i}.png"), np.full((8, 8, 3), i * 50, np.uint8))
+    src = open_source(spec.format(tmp_path))
+    assert isinstance(src, FileSource) and src.realtime == realtime and src.path == str(tmp_path)
+    assert src.open() and [int(src.read()[1].mean()) for _ in range(4)] == [0, 50, 100, 0]
+
+def test_source_instance_passes_through():
+    src = SyntheticSource((16, 16))
+    assert open_source(src) is src
+
+def test_fast_synth_uses_virtual_clock():
+    src = open_source("synth:64x36@10#1!")
+    stamps = []
+    for _ in range(3):
+        src.read(); stamps.append(src.ts)
+    np.testing.assert_allclose(np.diff(stamps), 0.1, atol=1e-6)   # sem dormir: início + i/fps
@@ -0,0 +1,78 @@
+# tests/test_timeline.py
+import numpy as np
+import pytest
+from replay.buffer import DiskRingBuffer
+from replay.timeline import JointTimeline
+
+def jpeg(i: int) -> bytes:
+    return b"\xff\xd8" + i.to_bytes(4, "little") * 8 + b"\xff\xd9"
+
+def ring(tmp_path, label, capacity=1000) -> DiskRingBuffer:
+    return DiskRingBuffer(label, capacity, segment_seconds=1.0, root=str(tmp_path / label), persist=False,
+                          hot_mb=0, max_seconds=0, max_bytes=0)
+
+def feed(r: DiskRingBuffer, ts):
+    for t in ts: r.write_jpeg(jpeg(int(round(t * 1000))), t, (4, 4))
+
+@pytest.fixture
+def two(tmp_path):
+    a, b = ring(tmp_path, "a"), ring(tmp_path, "b")
+    feed(a, np.arange(50) * 0.1)                  # referência a 10 fps
+    feed(b, np.arange(80) * 0.0625 + 0.02)        # 16 fps com atraso de 20 ms
+    yield a, b, JointTimeline([a, b], settle=0.5)
+    a.close(); b.close()
+
+def test_at_matches_each_camera_to_the_reference(two):
+    a, b, tl = two
+    assert tl.update() == 50 and tl.update() == 0
+    for q in (-1.0, 0.0, 0.14, 0.16, 2.51, 9.0):
+        jf = tl.at(q)
+        ra = a.nearest(q)
+        assert jf.ts == ra.ts and jf.refs[0] == ra
+        assert jf.refs[1] == b.nearest(ra.ts)
+        assert jf.skew[0] == 0 and jf.skew[1] == pytest.approx(jf.refs[1].ts - ra.ts, abs=1e-6)
+        assert jf.nos == [int(a.match_many([ra.ts])[0][0]), int(b.match_many([ra.ts])[0][0])]
+
+def test_at_resolves_only_requested_cams(two):
+    _, _, tl = two
+    tl.update()
+    jf = tl.at(1.0, cams=[1])
+    assert jf.refs[0] is None and jf.refs[1] is not None and jf.nos[0] >= 0
+
+def test_step_moves_by_reference_frames_and_clamps(two):
+    a, _, tl = two
+    tl.update()
+    assert tl.step(1.0, 1).ts == pytest.approx(1.1) and tl.step(1.04, -3).ts == pytest.approx(0.7)
+    assert tl.step(0.0, -5).ts == 0.0 and tl.step(4.9, 5).ts == a.latest_ts()
+
+def test_empty_timeline():
+    class Empty:
+        capacity = 10
+        def frame_range(self): return 0, 0
+        def frames_from(self, no): return no, np.zeros(0)
+        def latest_ts(self): return None
+    tl = JointTimeline([Empty()])
+    assert tl.update() == 0 and tl.at(1.0) is None and tl.step(1.0, 1) is None and tl.latest_ts() is None
+
+def test_waits_for_lagging_camera_until_settle(tmp_path):
+    a, b = ring(tmp_path, "a"), ring(tmp_path, "b")
+    feed(a, np.arange(20) * 0.1)
+    feed(b, np.arange(10) * 0.1)                  # b parou em 0.9
+    tl = JointTimeline([a, b], settle=0.5)
+    assert tl.update() == 15 and tl.latest_ts() == pytest.approx(1.4)   # 1.9 - settle
+    feed(b, np.arange(10, 20) * 0.1)
+    feed(a, [2.0])
+    assert tl.update() == 5 and tl.latest_ts() == pytest.approx(1.9)
+    assert tl.at(1.6).refs[1].ts == pytest.approx(1.6)
+    a.close(); b.close()
+
+def test_evicted_reference_rows_leave_the_timeline(tmp_path):
+    a, b = ring(tmp_path, "a", capacity=20), ring(tmp_path, "b")
+    feed(a, np.arange(20) * 0.1); feed(b, np.arange(20) * 0.1)
+    tl = JointTimeline([a, b], settle=0.0)
+    tl.update()
+    feed(a, np.arange(20, 35) * 0.1); feed(b, np.arange(20, 35) * 0.1)
+    tl.update()
+    assert tl.oldest_ts() == pytest.approx(a.oldest_ts()) and len(tl) == len(a)
+    assert tl.at(0.0).refs[0] == a.nearest(a.oldest_ts())
+    a.close(); b.close()
@@ -0,0 +1,12 @@
+# tests/test_widgets.py
+import os, subprocess, sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def test_camera_dialog_import_path_is_numpy_free():
+    # o diálogo de câmeras aparece antes da janela: main + widgets não podem puxar NumPy/OpenCV
+    code = ("import sys; import replay.main, replay.widgets; "
+            "print(sorted(m for m in ('numpy', 'cv2') if m in sys.modules))")
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen")
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, capture_output=True, text=True)
+    assert out.stdout.strip().splitlines()[0] == "[]", out.stderr